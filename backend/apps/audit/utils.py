@@ -15,7 +15,7 @@ def create_audit_log(
     request=None
 ):
     """
-    Create an audit log entry.
+    Create an audit log entry (see build_audit_log).
     
     Args:
         instance: The model instance being audited
@@ -26,6 +26,24 @@ def create_audit_log(
         reason: Reason for the action
         request: HTTP request (optional, for IP and user agent)
     """
+    audit_log = build_audit_log(instance, action, user, before_data, after_data, reason, request)
+    audit_log.save()
+    return audit_log
+
+
+def build_audit_log(
+    instance,
+    action,
+    user=None,
+    before_data=None,
+    after_data=None,
+    reason='',
+    request=None
+):
+    """
+    Build an unsaved audit log entry, e.g. to insert many entries with
+    AuditLog.objects.bulk_create(). Same arguments as create_audit_log.
+    """
     entity_type = ContentType.objects.get_for_model(instance.__class__)
     
     ip_address = None
@@ -38,7 +56,7 @@ def create_audit_log(
     if not user and request and hasattr(request, 'user') and request.user.is_authenticated:
         user = request.user
     
-    audit_log = AuditLog.objects.create(
+    return AuditLog(
         entity_type=entity_type,
         entity_id=instance.pk,
         action=action,
@@ -49,8 +67,6 @@ def create_audit_log(
         ip_address=ip_address,
         user_agent=user_agent
     )
-    
-    return audit_log
 
 
 def get_client_ip(request):
@@ -0,0 +1,109 @@
+"""
+Measure the per-request latency saved by persistent database connections.
+Usage: python manage.py benchmark_connections [--requests N] [--output FILE]
+
+Lightweight endpoints are called in-process with the connection lifecycle of
+a real server (close_old_connections before and after each request), once
+per connection mode: a new connection per request (CONN_MAX_AGE=0), and
+persistent connections with and without health checks. Run it against
+PostgreSQL (or pgbouncer, through POSTGRES_HOST/POSTGRES_PORT): with SQLite
+opening a connection is nearly free.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from apps.benchmarks.utils import BENCH_USERNAME, run_metadata, summarize_timings, write_results
+from apps.users.models import Role, User
+
+ENDPOINTS = [
+    '/api/users/me/',
+    '/api/clients/?page_size=10',
+    '/api/catalog/products/?page_size=10',
+    '/api/dashboard/pending_invoices/',
+]
+
+MODES = {
+    'per-request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+    'persistent+health': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency with per-request and persistent database connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode (default: 200).')
+        parser.add_argument('--endpoint', action='append', help='Endpoint to call (repeatable, default: light API endpoints).')
+        parser.add_argument('--output', help='Results file (default: benchmark_results/connections-<date>-<commit>.json).')
+
+    def handle(self, *args, **options):
+        user = (
+            User.objects.filter(username=BENCH_USERNAME).first()
+            or User.objects.filter(role=Role.SUPER_ADMIN, is_active=True).first()
+        )
+        if user is None:
+            raise CommandError('Aucun utilisateur SUPER_ADMIN : lancer generate_benchmark_data.')
+        client = APIClient()
+        client.force_authenticate(user)
+        endpoints = options['endpoint'] or ENDPOINTS
+
+        opened = []
+
+        def counter(sender, connection=None, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(counter, weak=False)
+        original = {key: connection.settings_dict[key] for key in MODES['per-request']}
+
+        results = {'meta': run_metadata(), 'requests': options['requests'], 'results': {}}
+        try:
+            with override_settings(ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False, QUERY_BUDGET_STRICT=False):
+                for mode, conn_settings in MODES.items():
+                    connection.close()
+                    connection.settings_dict.update(conn_settings)
+                    results['results'][mode] = {}
+                    for path in endpoints:
+                        opened.clear()
+                        durations = self.run_endpoint(client, path, options['requests'])
+                        result = summarize_timings(durations)
+                        result['connections_opened'] = len(opened)
+                        results['results'][mode][path] = result
+                        self.stdout.write(
+                            f'{mode:18} {path:40} p50 {result["p50_ms"]:7.2f} ms  p95 {result["p95_ms"]:7.2f} ms  '
+                            f'{len(opened)} connexions'
+                        )
+        finally:
+            connection_created.disconnect(counter)
+            connection.close()
+            connection.settings_dict.update(original)
+
+        self.report_savings(results['results'], endpoints)
+        path = write_results(results, options['output'], prefix='connections')
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {path}'))
+
+    def run_endpoint(self, client, path, count):
+        """Time `count` requests, opening/closing connections like the request handler does."""
+        durations = []
+        for _ in range(count + 1):
+            start = time.perf_counter()
+            close_old_connections()
+            response = client.get(path)
+            close_old_connections()
+            durations.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise CommandError(f'{path} : HTTP {response.status_code}')
+        return durations[1:]
+
+    def report_savings(self, results, endpoints):
+        self.stdout.write('\nGain par requête (p50) des connexions persistantes :')
+        for path in endpoints:
+            base = results['per-request'][path]['p50_ms']
+            for mode in ('persistent', 'persistent+health'):
+                saved = base - results[mode][path]['p50_ms']
+                self.stdout.write(f'{path:40} {mode:18} {saved:+7.2f} ms ({saved / base:+.0%})' if base else path)
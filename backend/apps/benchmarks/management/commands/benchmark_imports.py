@@ -0,0 +1,114 @@
+"""
+Measure process startup import time and catch heavy imports at startup.
+Usage: python manage.py benchmark_imports [--target web|celery] [--repeat N] [--max-ms MS] [--output FILE]
+
+Each target is started in a fresh interpreter with ``python -X importtime``
+(web: Django setup, WSGI application and URLconf, i.e. every view module;
+celery: the Celery app and all task modules). The command reports the wall
+time, the total import time and the slowest top-level imports, and fails if
+a module that must stay lazy (WeasyPrint and its stack, see gsa_backend.pdf)
+was imported, or if --max-ms is exceeded. Run it in CI to keep startup
+regressions out.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.benchmarks.utils import run_metadata, summarize_timings, write_results
+
+TARGETS = {
+    'web': 'import django; django.setup(); import gsa_backend.wsgi, gsa_backend.urls',
+    'celery': 'from gsa_backend.celery import app; app.loader.import_default_modules()',
+}
+
+# Modules only needed to render PDFs: importing them at startup is a regression
+LAZY_MODULES = ('weasyprint', 'pydyf', 'fontTools', 'tinycss2', 'cssselect2')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(output):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    entries = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+class Command(BaseCommand):
+    help = 'Measure startup import time (python -X importtime) and detect eager PDF imports.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', choices=sorted(TARGETS), help='Target(s) (default: all).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per target (default: 3).')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to show (default: 15).')
+        parser.add_argument('--max-ms', type=float, help='Fail if the median import time exceeds this budget.')
+        parser.add_argument('--output', help='Results file (default: benchmark_results/imports-<date>-<commit>.json).')
+
+    def handle(self, *args, **options):
+        targets = options['target'] or sorted(TARGETS)
+        results = {'meta': run_metadata(), 'results': {}}
+        failures = []
+
+        for target in targets:
+            walls, totals, entries = [], [], []
+            for _ in range(options['repeat']):
+                wall, entries = self.run_target(target)
+                walls.append(wall)
+                totals.append(sum(entry[1] for entry in entries) / 1e6)
+
+            lazy = sorted({m for m, *_ in entries if m.split('.')[0] in LAZY_MODULES})
+            slowest = sorted((e for e in entries if e[3] == 0), key=lambda e: e[2], reverse=True)[:options['top']]
+            result = {
+                'wall': summarize_timings(walls),
+                'imports': summarize_timings(totals),
+                'modules': len(entries),
+                'lazy_modules_imported': lazy,
+                'slowest': [{'module': m, 'cumulative_ms': round(c / 1000, 1)} for m, _, c, _ in slowest],
+            }
+            results['results'][target] = result
+            self.report(target, result)
+
+            if lazy:
+                failures.append(f"{target}: import au démarrage de {', '.join(lazy[:5])}")
+            if options['max_ms'] and result['imports']['p50_ms'] > options['max_ms']:
+                failures.append(f"{target}: {result['imports']['p50_ms']:.0f} ms > budget {options['max_ms']:.0f} ms")
+
+        path = write_results(results, options['output'], prefix='imports')
+        self.stdout.write(f'Résultats enregistrés dans {path}')
+        if failures:
+            raise CommandError('; '.join(failures))
+
+    def run_target(self, target):
+        """Start a fresh interpreter for the target; return (wall seconds, importtime entries)."""
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'gsa_backend.settings')
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', TARGETS[target]],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise CommandError(f'{target}: échec du démarrage\n{completed.stderr[-2000:]}')
+        return wall, parse_importtime(completed.stderr)
+
+    def report(self, target, result):
+        self.stdout.write(
+            f"{target}: démarrage {result['wall']['p50_ms']:.0f} ms, imports {result['imports']['p50_ms']:.0f} ms "
+            f"({result['modules']} modules)"
+        )
+        for item in result['slowest']:
+            self.stdout.write(f"    {item['cumulative_ms']:8.1f} ms  {item['module']}")
+        if result['lazy_modules_imported']:
+            self.stdout.write(self.style.ERROR(
+                f"    importés au démarrage : {', '.join(result['lazy_modules_imported'][:10])}"
+            ))
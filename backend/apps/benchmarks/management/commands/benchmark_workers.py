@@ -0,0 +1,234 @@
+"""
+Compare gunicorn worker models under a mix of API and document requests.
+Usage: python manage.py benchmark_workers [--config NAME=CLASS:WORKERS:THREADS ...] [--duration SECONDS] [--output FILE]
+
+For each configuration a gunicorn server is started on a local port with
+gunicorn_config.py (worker model passed through GUNICORN_WORKER_CLASS,
+GUNICORN_WORKERS and GUNICORN_THREADS). Light API clients and heavy document
+clients then run concurrently for --duration seconds over HTTP while the
+resident memory of the master and its workers is sampled from /proc (Linux).
+
+The report gives, per configuration, the light request throughput and
+p50/p95 latency, the document throughput and 503 rejections, the peak RSS,
+and light requests/s per GB of RSS so configurations can be compared at the
+same memory. Children inherit the environment; DEBUG defaults to True so the
+server does not redirect to HTTPS (use --env to override).
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.benchmarks.management.commands.loadtest import ApiSession
+from apps.benchmarks.utils import disable_api_user, ensure_api_user, run_metadata, summarize_timings, write_results
+
+WORKERS_USERNAME = 'bench-workers'
+DEFAULT_CONFIGS = ['sync=sync:4:1', 'gthread=gthread:2:4', 'gthread-wide=gthread:1:8']
+
+
+def parse_config(value):
+    """Parse NAME=CLASS:WORKERS:THREADS into a dict."""
+    try:
+        name, spec = value.split('=', 1)
+        worker_class, workers, threads = spec.split(':')
+        return {'name': name, 'worker_class': worker_class, 'workers': int(workers), 'threads': int(threads)}
+    except ValueError:
+        raise CommandError(f'Configuration invalide : {value} (attendu NAME=CLASS:WORKERS:THREADS)')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss(pid):
+    """Resident memory (bytes) of a process and its children, or None off Linux."""
+    proc = Path('/proc')
+    if not proc.exists():
+        return None
+    children = defaultdict(list)
+    for stat in proc.glob('[0-9]*/stat'):
+        try:
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+            children[int(fields[1])].append(int(stat.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            for line in (proc / str(current) / 'status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class Command(BaseCommand):
+    help = 'Benchmark gunicorn worker models (sync, gthread, uvicorn) with mixed API and PDF load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config', action='append',
+            help=f'NAME=CLASS:WORKERS:THREADS, repeatable (default: {" ".join(DEFAULT_CONFIGS)}).'
+        )
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of load per configuration (default: 30).')
+        parser.add_argument('--light-clients', type=int, default=8, help='Concurrent API clients (default: 8).')
+        parser.add_argument('--heavy-clients', type=int, default=2, help='Concurrent document clients (default: 2).')
+        parser.add_argument('--light-path', default='/api/clients/', help='API request (default: /api/clients/).')
+        parser.add_argument(
+            '--heavy-path', default=f'/api/stock/movements/print_stock/?date={timezone.now().year}',
+            help='Document request (default: the stock report PDF).'
+        )
+        parser.add_argument('--env', action='append', default=[], help='Extra KEY=VALUE for the servers.')
+        parser.add_argument('--output', help='Results file (default: benchmark_results/workers-<date>-<commit>.json).')
+
+    def handle(self, *args, **options):
+        configs = [parse_config(c) for c in (options['config'] or DEFAULT_CONFIGS)]
+        password = ensure_api_user(WORKERS_USERNAME)
+        try:
+            self.run_configs(configs, options, password)
+        finally:
+            disable_api_user(WORKERS_USERNAME)
+
+    def run_configs(self, configs, options, password):
+        results = {
+            'meta': run_metadata(),
+            'load': {k: options[k] for k in ('duration', 'light_clients', 'heavy_clients', 'light_path', 'heavy_path')},
+            'results': {},
+        }
+        for config in configs:
+            self.stdout.write(
+                f"{config['name']}: {config['worker_class']} x{config['workers']} "
+                f"({config['threads']} threads)..."
+            )
+            result = self.run_config(config, options, password)
+            results['results'][config['name']] = result
+            self.report(config['name'], result)
+
+        path = write_results(results, options['output'], prefix='workers')
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {path}'))
+
+    def server_env(self, config, extra):
+        env = dict(os.environ)
+        env.setdefault('DEBUG', 'True')
+        env.update({
+            'GUNICORN_WORKER_CLASS': config['worker_class'],
+            'GUNICORN_WORKERS': str(config['workers']),
+            'GUNICORN_THREADS': str(config['threads']),
+            'GUNICORN_LOG_LEVEL': 'warning',
+        })
+        if config['worker_class'].startswith('uvicorn'):
+            env.setdefault('GUNICORN_APP', 'gsa_backend.asgi:application')
+        # Keep the benchmark processes out of the shared Prometheus directories
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        env.pop('PROMETHEUS_MULTIPROC_DIRS', None)
+        for item in extra:
+            key, _, value = item.partition('=')
+            env[key] = value
+        return env
+
+    def run_config(self, config, options, password):
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py',
+             '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null'],
+            cwd=settings.BASE_DIR, env=self.server_env(config, options['env']),
+        )
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            self.wait_ready(server, base_url)
+            return self.drive(server.pid, base_url, options, password)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    def wait_ready(self, server, base_url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn s\'est arrêté (code {server.returncode}) : gunicorn est-il installé ?')
+            try:
+                with urllib.request.urlopen(base_url + '/api/health/', timeout=2):
+                    return
+            except OSError:
+                time.sleep(0.5)
+        raise CommandError('gunicorn ne répond pas sur /api/health/')
+
+    def drive(self, pid, base_url, options, password):
+        lock = threading.Lock()
+        timings = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        rss_samples = []
+        deadline = time.perf_counter() + options['duration']
+
+        def client(kind, path):
+            session = ApiSession(base_url)
+            session.login(WORKERS_USERNAME, password)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    status, _ = session.request('get', path)
+                except Exception as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - start
+                with lock:
+                    statuses[kind][str(status)] += 1
+                    if status == 200:
+                        timings[kind].append(elapsed)
+
+        def sample_memory():
+            while time.perf_counter() < deadline:
+                rss = process_tree_rss(pid)
+                if rss is not None:
+                    rss_samples.append(rss)
+                time.sleep(0.5)
+
+        threads = [threading.Thread(target=client, args=('light', options['light_path']))
+                   for _ in range(options['light_clients'])]
+        threads += [threading.Thread(target=client, args=('heavy', options['heavy_path']))
+                    for _ in range(options['heavy_clients'])]
+        threads.append(threading.Thread(target=sample_memory))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        peak_rss = max(rss_samples) if rss_samples else None
+        light_rps = len(timings['light']) / elapsed
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'light': {**summarize_timings(timings['light']), 'rps': round(light_rps, 2)},
+            'heavy': {**summarize_timings(timings['heavy']), 'rps': round(len(timings['heavy']) / elapsed, 2)},
+            'statuses': {kind: dict(codes) for kind, codes in statuses.items()},
+            'peak_rss_mb': round(peak_rss / 2**20, 1) if peak_rss else None,
+            'light_rps_per_gb': round(light_rps / (peak_rss / 2**30), 2) if peak_rss else None,
+        }
+
+    def report(self, name, result):
+        light, heavy = result['light'], result['heavy']
+        if not light['runs']:
+            self.stdout.write(self.style.WARNING(f'{name:16} aucune requête API réussie {result["statuses"]}'))
+            return
+        self.stdout.write(
+            f'{name:16} API {light["rps"]:8.1f} req/s  p50 {light["p50_ms"]:8.1f} ms  p95 {light["p95_ms"]:8.1f} ms  '
+            f'| PDF {heavy["rps"]:6.2f}/s  503: {result["statuses"].get("heavy", {}).get("503", 0)}  '
+            f'| RSS {result["peak_rss_mb"]} Mo  {result["light_rps_per_gb"]} req/s/Go'
+        )
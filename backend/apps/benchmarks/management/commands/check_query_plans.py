@@ -0,0 +1,131 @@
+"""
+Check that the hot report queries can use their indexes.
+Usage: python manage.py check_query_plans [--query NAME] [--show-plans]
+
+Each query below is EXPLAINed and its plan must name one of the expected
+indexes. On PostgreSQL sequential scans are disabled for the check
+(SET LOCAL enable_seqscan = off): on a small database the planner rightly
+prefers them, but a query that still does not use the index cannot use it
+(non-sargable filter such as ``field__date``, partial index condition not
+implied by the query...). Run it in CI against PostgreSQL after migrating:
+other databases (SQLite) only print the plans, their planner cannot be
+forced and does not match partial indexes against query parameters.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.billing.models import Invoice, InvoiceLine, InvoiceStatus
+from apps.billing.reminders import due_reminders
+from apps.catalog.models import Product
+from apps.clients.models import Client
+from apps.stock.models import StockMovement
+from gsa_backend.periods import date_range_q
+
+
+def build_queries(today, client_id, product_id):
+    """Return [(name, queryset, expected index names)]."""
+    start = today - timedelta(days=30)
+    return [
+        (
+            'reminders_due',
+            due_reminders(today).values('pk'),
+            ['invoice_reminder_due_idx'],
+        ),
+        (
+            'client_dues',
+            Invoice.objects.filter(client_id=client_id, statut=InvoiceStatus.VALIDEE, reste__gt=0).values('reste'),
+            ['invoice_open_client_idx'],
+        ),
+        (
+            'revenue_range',
+            Invoice.objects.filter(
+                date_range_q('validated_at', start, today), statut=InvoiceStatus.VALIDEE
+            ).values('total_ttc'),
+            ['invoice_validated_at_idx'],
+        ),
+        (
+            'top_products_range',
+            InvoiceLine.objects.filter(
+                date_range_q('invoice__validated_at', start, today), invoice__statut=InvoiceStatus.VALIDEE
+            ).values('product_id', 'qty'),
+            ['invoice_validated_at_idx'],
+        ),
+        (
+            'invoice_list_client',
+            Invoice.objects.filter(client_id=client_id).order_by('-created_at').values('pk')[:20],
+            ['invoice_client_created_idx'],
+        ),
+        (
+            'invoice_list_statut',
+            Invoice.objects.filter(statut=InvoiceStatus.VALIDEE).order_by('-created_at').values('pk')[:20],
+            ['invoice_statut_created_idx'],
+        ),
+        (
+            'stock_at_date',
+            StockMovement.objects.filter(
+                date_range_q('created_at', end=today), product_id=product_id
+            ).values('qty_signee'),
+            ['stock_stock_product_467980_idx'],
+        ),
+        (
+            'stock_movements_range',
+            StockMovement.objects.filter(date_range_q('created_at', start, today)).values('pk'),
+            ['stock_movement_created_idx', 'stock_stock_product_467980_idx'],
+        ),
+        (
+            'client_dues_at_date',
+            Invoice.objects.filter(
+                date_range_q('validated_at', end=today), client_id=client_id, statut=InvoiceStatus.VALIDEE, reste__gt=0
+            ).values('reste'),
+            ['invoice_open_client_idx', 'invoice_validated_at_idx'],
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot report queries and fail if one cannot use its index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', help='Query to check (repeatable, default: all).')
+        parser.add_argument('--show-plans', action='store_true', help='Print every query plan.')
+
+    def handle(self, *args, **options):
+        client_id = Client.objects.values_list('pk', flat=True).first() or 1
+        product_id = Product.objects.values_list('pk', flat=True).first() or 1
+        queries = build_queries(timezone.now().date(), client_id, product_id)
+        if options['query']:
+            queries = [query for query in queries if query[0] in options['query']]
+            if not queries:
+                raise CommandError('Aucune requête ne correspond à --query.')
+
+        failures = []
+        for name, queryset, expected in queries:
+            plan = self.explain(queryset)
+            used = [index for index in expected if index in plan]
+            if used:
+                self.stdout.write(self.style.SUCCESS(f'OK    {name:22} {used[0]}'))
+            else:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'ÉCHEC {name:22} attendu : {" ou ".join(expected)}'))
+            if options['show_plans'] or not used:
+                self.stdout.write('\n'.join(f'      {line}' for line in plan.splitlines()))
+
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'{connection.vendor} : plans indicatifs, vérification réservée à PostgreSQL.'
+            ))
+            return
+        if failures:
+            raise CommandError(f"Index non utilisé par : {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f'{len(queries)} plans vérifiés ({connection.vendor}).'))
+
+    def explain(self, queryset):
+        """Return the plan of a queryset, with sequential scans disabled on PostgreSQL."""
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
@@ -0,0 +1,411 @@
+"""
+Generate a large, reproducible synthetic dataset for benchmarks.
+Usage: python manage.py generate_benchmark_data [--scale small|medium|large] [--seed N] [--purge]
+
+Every generated row is tagged (BENCH names, BENCH- invoice numbers, BENCH
+movement references, "benchmark" audit reason) so that --purge / --purge-only
+can remove it again. Rows are inserted with bulk_create, so model signals
+are not sent; client balances and the stock valuation are rebuilt at the end.
+The purge deletes through the ORM (signals included), so it is slower than
+the generation on large datasets.
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.audit.models import AuditLog
+from apps.benchmarks.utils import BENCH_PREFIX, BENCH_USERNAME, bench_clients, bench_products
+from apps.billing.models import (
+    CompanySettings, Invoice, InvoiceLine, InvoiceStatus, InvoiceType, Payment, PaymentMode,
+)
+from apps.catalog.models import BasePrice, CategorieProduit, Product, UniteVente
+from apps.clients.models import Client, ClientBalance, ClientPrice
+from apps.stock.models import MovementCost, MovementType, ProductCost, StockMovement
+from apps.stock.valuation import rebuild_valuation
+from apps.users.models import Role, User
+
+BENCH_REASON = 'benchmark'
+
+SCALES = {
+    'small': {
+        'products': 200, 'clients': 500, 'invoices': 10_000, 'lines': 3,
+        'movements': 100_000, 'audit_logs': 20_000,
+    },
+    'medium': {
+        'products': 1_000, 'clients': 2_000, 'invoices': 100_000, 'lines': 3,
+        'movements': 1_000_000, 'audit_logs': 200_000,
+    },
+    'large': {
+        'products': 3_000, 'clients': 5_000, 'invoices': 300_000, 'lines': 4,
+        'movements': 3_000_000, 'audit_logs': 500_000,
+    },
+}
+
+# (status, weight) of generated invoices
+INVOICE_STATUSES = [
+    (InvoiceStatus.BROUILLON, 5),
+    (InvoiceStatus.VALIDEE, 60),
+    (InvoiceStatus.ACCEPTEE, 20),
+    (InvoiceStatus.CONTESTEE, 2),
+    (InvoiceStatus.ANNULEE, 8),
+    (InvoiceStatus.AVOIR, 5),
+]
+MOVEMENT_TYPES = [
+    (MovementType.RECEPTION, 15),
+    (MovementType.VENTE, 78),
+    (MovementType.CASSE, 4),
+    (MovementType.AJUSTEMENT, 3),
+]
+AUDIT_ACTIONS = ['CREATE_INVOICE', 'UPDATE_INVOICE', 'VALIDATE_INVOICE', 'CREATE_PAYMENT', 'REMINDER_SENT']
+
+
+def bulk_create_dated(model, objs, batch_size):
+    """
+    bulk_create `objs` keeping the created_at/updated_at values set on them:
+    auto_now/auto_now_add overwrite them on insert, so they are written back
+    with bulk_update (no signals either way).
+    """
+    fields = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    timestamps = [[getattr(obj, name) for name in fields] for obj in objs]
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    for obj, values in zip(objs, timestamps):
+        for name, value in zip(fields, values):
+            if value is not None:
+                setattr(obj, name, value)
+    model.objects.bulk_update(objs, fields, batch_size=batch_size)
+
+
+def weighted(rng, choices):
+    """Pick a value from [(value, weight), ...]."""
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset (products, clients, invoices, movements, audit logs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Dataset size preset.')
+        parser.add_argument('--products', type=int, help='Number of products (overrides --scale).')
+        parser.add_argument('--clients', type=int, help='Number of clients (overrides --scale).')
+        parser.add_argument('--invoices', type=int, help='Number of invoices (overrides --scale).')
+        parser.add_argument('--lines', type=int, help='Lines per invoice (overrides --scale).')
+        parser.add_argument('--movements', type=int, help='Number of stock movements (overrides --scale).')
+        parser.add_argument('--audit-logs', type=int, dest='audit_logs', help='Number of audit logs (overrides --scale).')
+        parser.add_argument('--days', type=int, default=730, help='History depth in days (default: 730).')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create batch size.')
+        parser.add_argument('--purge', action='store_true', help='Delete previous benchmark data first.')
+        parser.add_argument('--purge-only', action='store_true', help='Only delete benchmark data.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        if options['purge'] or options['purge_only']:
+            self.purge()
+            if options['purge_only']:
+                return
+
+        if bench_products().exists():
+            self.stdout.write(self.style.WARNING(
+                'Des données de benchmark existent déjà. Relancer avec --purge pour les régénérer.'
+            ))
+            return
+
+        size = dict(SCALES[options['scale']])
+        for key in size:
+            if options.get(key) is not None:
+                size[key] = options[key]
+
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.days = options['days']
+        self.user = self.get_user()
+
+        settings_row = CompanySettings.get_settings()
+        self.tva = {
+            CategorieProduit.JUS: Decimal(str(settings_row.tva_jus)) / 100,
+            CategorieProduit.BIERE: Decimal(str(settings_row.tva_biere)) / 100,
+        }
+
+        self.step('produits', self.create_products, size['products'])
+        self.step('clients', self.create_clients, size['clients'])
+        self.step('factures', self.create_invoices, size['invoices'], size['lines'])
+        self.step('mouvements de stock', self.create_movements, size['movements'])
+        self.step("logs d'audit", self.create_audit_logs, size['audit_logs'])
+        self.step('soldes clients', self.rebuild_balances)
+        self.step('valorisation du stock', self.rebuild_valuation)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.stdout.write(self.style.SUCCESS('Jeu de données de benchmark généré.'))
+
+    def step(self, label, func, *args):
+        """Run one generation step and report its duration."""
+        start = time.perf_counter()
+        count = func(*args)
+        self.stdout.write(f'  {label}: {count} en {time.perf_counter() - start:.1f}s')
+
+    def random_datetime(self):
+        """Random timestamp within the configured history window."""
+        return self.now - timedelta(seconds=self.rng.randint(0, self.days * 86400))
+
+    def get_user(self):
+        user, created = User.objects.get_or_create(
+            username=BENCH_USERNAME,
+            defaults={'email': 'bench@example.com', 'role': Role.SUPER_ADMIN}
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+        return user
+
+    def create_products(self, count):
+        products = []
+        for i in range(count):
+            created = self.random_datetime()
+            products.append(Product(
+                nom=f'{BENCH_PREFIX} Produit {i:05d}',
+                unite_vente=self.rng.choice(UniteVente.values),
+                categorie=self.rng.choice(CategorieProduit.values),
+                seuil_stock=self.rng.choice([20, 50, 100, 200]),
+                created_at=created,
+                updated_at=created,
+            ))
+        bulk_create_dated(Product, products, self.batch_size)
+
+        self.products = list(bench_products().values_list('id', 'categorie'))
+        self.prices = {}
+        base_prices = []
+        for product_id, _ in self.products:
+            price = Decimal(self.rng.randint(50, 2500)) / 100
+            self.prices[product_id] = price
+            base_prices.append(BasePrice(product_id=product_id, prix_base=price, created_at=self.now, updated_at=self.now))
+        BasePrice.objects.bulk_create(base_prices, batch_size=self.batch_size)
+        return len(self.products)
+
+    def create_clients(self, count):
+        clients = []
+        for i in range(count):
+            created = self.random_datetime()
+            clients.append(Client(
+                nom=f'{BENCH_PREFIX}{i:05d}',
+                prenom=self.rng.choice(['Awa', 'Moussa', 'Fatou', 'Ibrahima', 'Aminata', 'Cheikh']),
+                entreprise=f'Commerce {i:05d}' if self.rng.random() < 0.7 else '',
+                email=f'bench{i}@example.com',
+                ville=self.rng.choice(['Paris', 'Lyon', 'Marseille', 'Lille', 'Dakar']),
+                created_at=created,
+                updated_at=created,
+            ))
+        bulk_create_dated(Client, clients, self.batch_size)
+        self.client_ids = list(bench_clients().values_list('id', flat=True))
+
+        # Negotiated prices for a fifth of the clients
+        client_prices = []
+        product_ids = [product_id for product_id, _ in self.products]
+        for client_id in self.client_ids[::5]:
+            for product_id in self.rng.sample(product_ids, min(10, len(product_ids))):
+                client_prices.append(ClientPrice(
+                    client_id=client_id,
+                    product_id=product_id,
+                    prix=(self.prices[product_id] * Decimal('0.9')).quantize(Decimal('0.01')),
+                ))
+        ClientPrice.objects.bulk_create(client_prices, batch_size=self.batch_size)
+        return len(self.client_ids)
+
+    def create_invoices(self, count, lines_per_invoice):
+        created_count = 0
+        year = self.now.year
+        for start in range(0, count, self.batch_size):
+            invoices, lines, payments = [], [], []
+            for i in range(start, min(start + self.batch_size, count)):
+                invoice, invoice_lines, invoice_payments = self.build_invoice(i, year, lines_per_invoice)
+                invoices.append(invoice)
+                lines.append(invoice_lines)
+                payments.append(invoice_payments)
+            with transaction.atomic():
+                bulk_create_dated(Invoice, invoices, self.batch_size)
+                for invoice, invoice_lines, invoice_payments in zip(invoices, lines, payments):
+                    for obj in invoice_lines + invoice_payments:
+                        obj.invoice_id = invoice.pk
+                bulk_create_dated(InvoiceLine, [line for group in lines for line in group], self.batch_size)
+                bulk_create_dated(Payment, [p for group in payments for p in group], self.batch_size)
+            created_count += len(invoices)
+        return created_count
+
+    def build_invoice(self, index, year, lines_per_invoice):
+        """Build an invoice with consistent lines, totals and payments (unsaved)."""
+        rng = self.rng
+        created = self.random_datetime()
+        statut = weighted(rng, INVOICE_STATUSES)
+        invoice = Invoice(
+            client_id=rng.choice(self.client_ids),
+            numero=None if statut == InvoiceStatus.BROUILLON else f'{BENCH_PREFIX}-{year}-{index:07d}',
+            type=rng.choice(InvoiceType.values),
+            statut=statut,
+            created_at=created,
+            updated_at=created,
+            tva_incluse=rng.random() < 0.8,
+        )
+        if statut != InvoiceStatus.BROUILLON:
+            invoice.validated_at = created + timedelta(hours=rng.randint(0, 48))
+            invoice.validated_by = self.user
+
+        lines = []
+        totals = {CategorieProduit.JUS: Decimal('0'), CategorieProduit.BIERE: Decimal('0')}
+        for product_id, categorie in rng.sample(self.products, min(lines_per_invoice, len(self.products))):
+            qty = Decimal(rng.randint(1, 48))
+            price = self.prices[product_id]
+            line = InvoiceLine(
+                product_id=product_id, qty=qty, prix_unit_applique=price,
+                total_ligne=qty * price, created_at=created,
+            )
+            totals[categorie] += line.total_ligne
+            lines.append(line)
+
+        invoice.total = sum(totals.values())
+        if invoice.tva_incluse:
+            invoice.tva_jus = (totals[CategorieProduit.JUS] * self.tva[CategorieProduit.JUS]).quantize(Decimal('0.01'))
+            invoice.tva_biere = (totals[CategorieProduit.BIERE] * self.tva[CategorieProduit.BIERE]).quantize(Decimal('0.01'))
+        invoice.total_ttc = invoice.total + invoice.tva_jus + invoice.tva_biere
+
+        payments = []
+        if statut in (InvoiceStatus.VALIDEE, InvoiceStatus.ACCEPTEE, InvoiceStatus.CONTESTEE):
+            roll = rng.random()
+            if roll < 0.6:
+                paid = invoice.total_ttc
+            elif roll < 0.85:
+                paid = (invoice.total_ttc * Decimal(rng.randint(10, 90)) / 100).quantize(Decimal('0.01'))
+            else:
+                paid = Decimal('0')
+            remaining, installments = paid, rng.randint(1, 3)
+            for n in range(installments):
+                amount = remaining if n == installments - 1 else (remaining / (installments - n)).quantize(Decimal('0.01'))
+                if amount <= 0:
+                    continue
+                remaining -= amount
+                payments.append(Payment(
+                    montant=amount,
+                    mode=rng.choice(PaymentMode.values),
+                    date=(invoice.validated_at + timedelta(days=rng.randint(0, 60))).date(),
+                    created_at=invoice.validated_at,
+                ))
+            invoice.paye = paid
+        invoice.reste = invoice.total_ttc - invoice.paye
+        if statut == InvoiceStatus.VALIDEE and invoice.reste > 0:
+            invoice.prochaine_date_relance = (invoice.validated_at + timedelta(days=30)).date()
+        return invoice, lines, payments
+
+    def create_movements(self, count):
+        # Opening stock so that per-product stock stays positive
+        product_ids = [product_id for product_id, _ in self.products]
+        opening = self.now - timedelta(days=self.days + 1)
+        movements = [
+            StockMovement(
+                product_id=product_id, qty_signee=self.rng.randint(500, 5000), type=MovementType.RECEPTION,
+                reference=f'{BENCH_PREFIX}-INIT', reason=BENCH_REASON, created_by=self.user, created_at=opening,
+            )
+            for product_id in product_ids
+        ]
+        bulk_create_dated(StockMovement, movements, self.batch_size)
+
+        created_count = len(movements)
+        for start in range(0, count, self.batch_size):
+            movements = []
+            for _ in range(min(self.batch_size, count - start)):
+                movement_type = weighted(self.rng, MOVEMENT_TYPES)
+                if movement_type == MovementType.RECEPTION:
+                    qty = self.rng.randint(50, 500)
+                elif movement_type == MovementType.VENTE:
+                    qty = -self.rng.randint(1, 24)
+                elif movement_type == MovementType.CASSE:
+                    qty = -self.rng.randint(1, 6)
+                else:
+                    qty = self.rng.randint(-10, 10) or 1
+                movements.append(StockMovement(
+                    product_id=self.rng.choice(product_ids), qty_signee=qty, type=movement_type,
+                    reference=f'{BENCH_PREFIX}-{movement_type}', reason=BENCH_REASON,
+                    created_by=self.user, created_at=self.random_datetime(),
+                ))
+            bulk_create_dated(StockMovement, movements, self.batch_size)
+            created_count += len(movements)
+        return created_count
+
+    def create_audit_logs(self, count):
+        invoice_ids = list(
+            Invoice.objects.filter(numero__startswith=f'{BENCH_PREFIX}-').values_list('id', flat=True)
+        )
+        if not invoice_ids:
+            return 0
+        content_type = ContentType.objects.get_for_model(Invoice)
+        created_count = 0
+        for start in range(0, count, self.batch_size):
+            logs = [
+                AuditLog(
+                    entity_type=content_type,
+                    entity_id=self.rng.choice(invoice_ids),
+                    action=self.rng.choice(AUDIT_ACTIONS),
+                    after_json={'source': BENCH_REASON},
+                    user=self.user,
+                    reason=BENCH_REASON,
+                    created_at=self.random_datetime(),
+                )
+                for _ in range(min(self.batch_size, count - start))
+            ]
+            bulk_create_dated(AuditLog, logs, self.batch_size)
+            created_count += len(logs)
+        return created_count
+
+    def rebuild_balances(self):
+        for client_id in self.client_ids:
+            ClientBalance.refresh_for_client(client_id)
+        return len(self.client_ids)
+
+    def rebuild_valuation(self):
+        _, movement_count = rebuild_valuation(batch_size=self.batch_size)
+        return movement_count
+
+    def purge(self):
+        """Delete all benchmark rows, dependents first, in batches of --batch-size rows."""
+        start = time.perf_counter()
+        bench_invoices = Invoice.objects.filter(numero__startswith=f'{BENCH_PREFIX}-')
+        clients = bench_clients()
+        products = bench_products()
+        draft_invoices = Invoice.objects.filter(client__in=clients)
+
+        with transaction.atomic():
+            for queryset in (
+                AuditLog.objects.filter(reason=BENCH_REASON),
+                Payment.objects.filter(invoice__client__in=clients),
+                InvoiceLine.objects.filter(invoice__client__in=clients),
+                bench_invoices,
+                draft_invoices,
+                MovementCost.objects.filter(product__in=products),
+                ProductCost.objects.filter(product__in=products),
+                StockMovement.objects.filter(product__in=products),
+                ClientBalance.objects.filter(client__in=clients),
+                ClientPrice.objects.filter(client__in=clients),
+                BasePrice.objects.filter(product__in=products),
+                clients,
+                products,
+            ):
+                self.delete_in_batches(queryset)
+        self.stdout.write(f'Données de benchmark supprimées en {time.perf_counter() - start:.1f}s.')
+
+    def delete_in_batches(self, queryset):
+        """Delete the rows of `queryset` a batch at a time (bounded memory)."""
+        while True:
+            ids = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+            if not ids:
+                return
+            queryset.model.objects.filter(pk__in=ids).delete()
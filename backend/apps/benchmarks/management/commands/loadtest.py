@@ -0,0 +1,303 @@
+"""
+Load test: concurrent sales staff creating, validating and paying invoices.
+Usage: python manage.py loadtest [--users N] [--duration SECONDS] [--base-url URL] [--output FILE]
+
+Each simulated user logs in (JWT) and loops over the scenario
+create draft -> add lines -> validate -> pay, with an occasional stock
+adjustment. By default requests go in-process through the Django test client
+(one DB connection per thread); with --base-url they are sent over HTTP to a
+running server (e.g. gunicorn against the docker/dev Postgres and Redis).
+
+At the end the command reports throughput and p50/p95/p99 latency per
+operation, and checks the invariants: stock never negative, unique invoice
+numbers and reste == total_ttc - paye (with paye == sum of payments).
+It only uses the clients and products of generate_benchmark_data (BENCH
+rows) and refuses to run without them: the invoices it creates are kept, the
+generated loadtest account is deactivated.
+"""
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count, F, Sum, Window
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.benchmarks.utils import (
+    bench_clients, bench_products, disable_api_user, ensure_api_user, run_metadata, summarize_timings, write_results,
+)
+from apps.billing.models import Invoice, InvoiceStatus, PaymentMode
+from apps.stock.models import StockMovement
+
+LOADTEST_USERNAME = 'loadtest'
+
+
+class ApiSession:
+    """Minimal JSON API client, in-process or over HTTP."""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.client = None if base_url else Client()
+        self.token = None
+
+    def request(self, method, path, payload=None):
+        """Return (status, json body) for one API call."""
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        body = json.dumps(payload) if payload is not None else None
+
+        if self.client is not None:
+            response = getattr(self.client, method)(
+                path, data=body, content_type='application/json',
+                headers={k: v for k, v in headers.items() if k != 'Content-Type'}
+            )
+            try:
+                return response.status_code, response.json()
+            except ValueError:
+                return response.status_code, None
+
+        request = urllib.request.Request(
+            self.base_url + path, data=body.encode() if body else None, headers=headers, method=method.upper()
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b'null')
+            except ValueError:
+                return e.code, None
+
+    def login(self, username, password):
+        status, data = self.request('post', '/api/auth/login/', {'username': username, 'password': password})
+        if status != 200:
+            raise CommandError(f'Login failed for {username}: HTTP {status}')
+        self.token = data['access']
+
+
+class Recorder:
+    """Thread-safe latency and error collection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.scenarios = 0
+        self.invoice_ids = []
+        self.product_ids = set()
+
+    def call(self, session, op, method, path, payload=None, expected=(200, 201)):
+        start = time.perf_counter()
+        try:
+            status, data = session.request(method, path, payload)
+        except Exception as e:
+            status, data = type(e).__name__, None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.timings[op].append(elapsed)
+            if status not in expected:
+                self.errors[op][str(status)] += 1
+        return status in expected, data
+
+
+class Command(BaseCommand):
+    help = 'Drive concurrent invoice creation, validation and payments; report latency and invariants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users (default: 10).')
+        parser.add_argument('--duration', type=float, default=60, help='Test duration in seconds (default: 60).')
+        parser.add_argument('--max-lines', type=int, default=3, help='Maximum lines per invoice (default: 3).')
+        parser.add_argument('--adjust-ratio', type=float, default=0.1, help='Share of iterations doing a stock adjustment.')
+        parser.add_argument('--products', type=int, default=20, help='Size of the product pool (default: 20).')
+        parser.add_argument('--base-url', help='Target a running server instead of the in-process client.')
+        parser.add_argument('--username', help='Existing account to use (default: a generated loadtest user).')
+        parser.add_argument('--password', help='Password of --username.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1).')
+        parser.add_argument('--output', help='Results file (default: benchmark_results/loadtest-<date>-<commit>.json).')
+
+    def handle(self, *args, **options):
+        username, password = options['username'], options['password']
+        if username:
+            return self.run_load(options, username, password)
+        # Generated SUPER_ADMIN account: never left usable in the target database
+        try:
+            return self.run_load(options, LOADTEST_USERNAME, ensure_api_user(LOADTEST_USERNAME))
+        finally:
+            disable_api_user(LOADTEST_USERNAME)
+
+    def run_load(self, options, username, password):
+        products = self.pick_products(options['products'])
+        # Benchmark rows only: never invoice, remind or move the stock of real customers and products
+        clients = list(bench_clients().filter(actif=True).values_list('pk', flat=True)[:500])
+        if not products or not clients:
+            raise CommandError('Pas de produits en stock ou de clients de benchmark : lancer generate_benchmark_data.')
+
+        recorder = Recorder()
+        started_at = timezone.now()
+        deadline = time.perf_counter() + options['duration']
+        self.stdout.write(
+            f"{options['users']} utilisateurs pendant {options['duration']:.0f}s "
+            f"({'HTTP ' + options['base_url'] if options['base_url'] else 'in-process'})..."
+        )
+
+        with override_settings(ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False, QUERY_BUDGET_STRICT=False):
+            threads = [
+                threading.Thread(
+                    target=self.virtual_user,
+                    args=(n, options, username, password, products, clients, recorder, deadline),
+                )
+                for n in range(options['users'])
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+        invariants = self.check_invariants(recorder, started_at)
+        results = {
+            'meta': run_metadata(),
+            'config': {k: options[k] for k in ('users', 'duration', 'max_lines', 'adjust_ratio', 'base_url', 'seed')},
+            'elapsed_s': round(elapsed, 2),
+            'scenarios': recorder.scenarios,
+            'throughput': {
+                'scenarios_per_s': round(recorder.scenarios / elapsed, 2),
+                'requests_per_s': round(sum(len(t) for t in recorder.timings.values()) / elapsed, 2),
+            },
+            'operations': {op: summarize_timings(t) for op, t in recorder.timings.items()},
+            'errors': {op: dict(codes) for op, codes in recorder.errors.items()},
+            'invariants': invariants,
+        }
+        self.report(results)
+        path = write_results(results, options['output'], prefix='loadtest')
+        self.stdout.write(f'Résultats enregistrés dans {path}')
+
+        violations = [name for name, check in invariants.items() if not check['ok']]
+        if violations:
+            raise CommandError(f"Invariants violés : {', '.join(violations)}")
+
+    def pick_products(self, count):
+        """Active, priced benchmark products with the most stock."""
+        stock = StockMovement.get_stock_by_product()
+        priced = set(bench_products().filter(actif=True, base_price__isnull=False).values_list('pk', flat=True))
+        ranked = sorted((pk for pk in priced if stock.get(pk, 0) > 0), key=lambda pk: -stock[pk])
+        return ranked[:count]
+
+    def virtual_user(self, n, options, username, password, products, clients, recorder, deadline):
+        """One simulated sales person looping over the invoice scenario."""
+        rng = random.Random(options['seed'] * 1000 + n)
+        session = ApiSession(options['base_url'])
+        try:
+            session.login(username, password)
+            while time.perf_counter() < deadline:
+                self.invoice_scenario(session, rng, options, products, clients, recorder)
+                if rng.random() < options['adjust_ratio']:
+                    product = rng.choice(products)
+                    recorder.call(session, 'stock.adjust', 'post', '/api/stock/movements/adjust/', {
+                        'product': product, 'qty_signee': -1, 'type': 'CASSE', 'reason': 'loadtest',
+                    })
+                    with recorder.lock:
+                        recorder.product_ids.add(product)
+        except CommandError as e:
+            self.stderr.write(str(e))
+        finally:
+            connections.close_all()
+
+    def invoice_scenario(self, session, rng, options, products, clients, recorder):
+        ok, invoice = recorder.call(session, 'invoice.create', 'post', '/api/billing/invoices/', {
+            'client': rng.choice(clients), 'type': 'LIVRAISON',
+        })
+        if not ok:
+            return
+        with recorder.lock:
+            recorder.invoice_ids.append(invoice['id'])
+
+        lines = rng.sample(products, min(rng.randint(1, options['max_lines']), len(products)))
+        for product in lines:
+            recorder.call(session, 'invoice_line.create', 'post', '/api/billing/invoice-lines/', {
+                'invoice': invoice['id'], 'product': product, 'qty': str(rng.randint(1, 5)),
+            })
+        with recorder.lock:
+            recorder.product_ids.update(lines)
+
+        ok, data = recorder.call(session, 'invoice.validate', 'post', f"/api/billing/invoices/{invoice['id']}/validate/")
+        if not ok:
+            return
+
+        reste = Decimal(str(data['invoice']['reste']))
+        if reste > 0:
+            amount = reste if rng.random() < 0.7 else (reste / 2).quantize(Decimal('0.01'))
+            recorder.call(session, 'payment.create', 'post', '/api/billing/payments/', {
+                'invoice': invoice['id'], 'montant': str(amount), 'mode': rng.choice(PaymentMode.values),
+                'date': timezone.localdate().isoformat(),  # as the frontend sends it
+            })
+        with recorder.lock:
+            recorder.scenarios += 1
+
+    def check_invariants(self, recorder, started_at):
+        """Check database invariants on the rows touched by the run."""
+        invoices = Invoice.objects.filter(pk__in=recorder.invoice_ids).annotate(payments_total=Sum('payments__montant'))
+        bad_totals = [
+            inv.pk for inv in invoices
+            if inv.reste != inv.total_ttc - inv.paye or inv.paye != (inv.payments_total or 0)
+        ]
+
+        duplicates = list(
+            Invoice.objects.filter(numero__isnull=False).values('numero')
+            .annotate(n=Count('id')).filter(n__gt=1).values_list('numero', flat=True)[:20]
+        )
+
+        # The run window is checked in Python: a created_at filter next to the window
+        # filter would be applied before the running sum and drop the opening stock
+        negative = sorted({
+            product_id for product_id, created_at in StockMovement.objects.filter(
+                product__in=recorder.product_ids
+            ).annotate(
+                running=Window(
+                    expression=Sum('qty_signee'),
+                    partition_by=[F('product_id')],
+                    order_by=[F('created_at').asc(), F('id').asc()],
+                )
+            ).filter(running__lt=0).values_list('product_id', 'created_at')
+            if created_at >= started_at
+        })
+
+        validated = Invoice.objects.filter(pk__in=recorder.invoice_ids, statut=InvoiceStatus.VALIDEE)
+        references = set(
+            StockMovement.objects.filter(reference__in=[f'FACT-{n}' for n in validated.values_list('numero', flat=True)])
+            .values_list('reference', flat=True)
+        )
+        missing_movements = [n for n in validated.values_list('numero', flat=True) if f'FACT-{n}' not in references]
+
+        return {
+            'reste_equals_total_minus_paye': {'ok': not bad_totals, 'invoices': bad_totals[:20]},
+            'unique_invoice_numbers': {'ok': not duplicates, 'duplicates': duplicates},
+            'stock_never_negative': {'ok': not negative, 'products': sorted(set(negative))[:20]},
+            'validated_invoices_have_movements': {'ok': not missing_movements, 'invoices': missing_movements[:20]},
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"\n{results['scenarios']} scénarios en {results['elapsed_s']}s : "
+            f"{results['throughput']['scenarios_per_s']} scénarios/s, "
+            f"{results['throughput']['requests_per_s']} requêtes/s"
+        )
+        for op, stats in sorted(results['operations'].items()):
+            errors = sum(results['errors'].get(op, {}).values())
+            self.stdout.write(
+                f"{op:22} n={stats['runs']:6}  p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                f"p99 {stats['p99_ms']:8.1f} ms  erreurs {errors} {dict(results['errors'].get(op, {}))}"
+            )
+        for name, check in results['invariants'].items():
+            style = self.style.SUCCESS if check['ok'] else self.style.ERROR
+            self.stdout.write(style(f"{'OK ' if check['ok'] else 'KO '} {name}"))
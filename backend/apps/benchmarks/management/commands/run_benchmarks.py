@@ -0,0 +1,227 @@
+"""
+Time the key API endpoints and PDF generation against the current database.
+Usage: python manage.py run_benchmarks [--repeat N] [--only NAME ...] [--output FILE] [--compare FILE]
+
+Run generate_benchmark_data first. Each scenario is executed in-process
+through the DRF test client (authenticated as the benchmark user); its wall
+time and SQL query count are recorded and written to a JSON file
+(benchmark_results/ by default) tagged with the git commit, so runs can be
+compared across commits with --compare. Mutating scenarios (invoice
+validation) run inside a transaction that is rolled back.
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.benchmarks.utils import (
+    BENCH_USERNAME, dataset_counts, load_results, run_metadata, summarize_timings, write_results,
+)
+from apps.billing.models import Invoice, InvoiceLine, InvoiceStatus
+from apps.clients.models import Client
+from apps.stock.models import StockMovement
+from apps.users.models import Role, User
+
+
+class Scenario:
+    """One benchmarked operation."""
+
+    def __init__(self, name, path=None, method='get', setup=None, call=None, mutating=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.setup = setup
+        self.call = call
+        self.mutating = mutating
+
+
+def build_scenarios():
+    """Return the list of scenarios, in execution order."""
+    today = timezone.now().date()
+    year_ago = today - timedelta(days=365)
+    return [
+        # Dashboard widgets
+        Scenario('dashboard.stock_value', '/api/dashboard/stock_value/'),
+        Scenario('dashboard.company_status', '/api/dashboard/company_status/'),
+        Scenario('dashboard.sales_revenue', f'/api/dashboard/sales_revenue/?start_date={year_ago}&end_date={today}'),
+        Scenario('dashboard.sales_period', f'/api/dashboard/sales_period/?start_date={year_ago}&end_date={today}'),
+        Scenario('dashboard.top_products', '/api/dashboard/top_products/'),
+        Scenario('dashboard.urgent_actions', '/api/dashboard/urgent_actions/'),
+        Scenario('dashboard.pending_invoices', '/api/dashboard/pending_invoices/'),
+        Scenario('dashboard.unpaid_invoices', '/api/dashboard/unpaid_invoices/'),
+        Scenario('dashboard.critical_stock', '/api/dashboard/critical_stock/'),
+        Scenario('dashboard.recent_sales', '/api/dashboard/recent_sales/'),
+        Scenario('dashboard.containers_status', '/api/dashboard/containers_status/'),
+        Scenario('dashboard.pending_reminders', '/api/dashboard/pending_reminders/'),
+        Scenario('dashboard.recent_activities', '/api/dashboard/recent_activities/'),
+        # Stock
+        Scenario('stock.current', '/api/stock/movements/current/'),
+        Scenario('stock.current_product', lambda ctx: f'/api/stock/movements/current/?product_id={ctx["product"]}'),
+        Scenario('stock.history', lambda ctx: f'/api/stock/movements/history/?product_id={ctx["product"]}'),
+        # Invoices
+        Scenario('invoices.list', '/api/billing/invoices/'),
+        Scenario('invoices.list_filtered', lambda ctx: f'/api/billing/invoices/?client={ctx["client"]}&statut=VALIDEE'),
+        Scenario('invoices.detail', lambda ctx: f'/api/billing/invoices/{ctx["invoice"]}/'),
+        Scenario(
+            'invoices.validate', lambda ctx: f'/api/billing/invoices/{ctx["draft"]}/validate/',
+            method='post', setup=create_draft_invoice, mutating=True
+        ),
+        # Client dues
+        Scenario('clients.list', '/api/clients/'),
+        Scenario('clients.total_due', lambda ctx: f'/api/clients/{ctx["client"]}/total_due/'),
+        Scenario('clients.total_owed', lambda ctx: f'/api/clients/{ctx["client"]}/total_owed_to_client/'),
+        Scenario('purchases.supplier_debts', '/api/stock/purchases/supplier_debts/'),
+        # PDF generation
+        Scenario('pdf.invoice', call=render_invoice_pdf),
+    ]
+
+
+def create_draft_invoice(ctx):
+    """Create a draft invoice copying the lines of a sample invoice."""
+    source = Invoice.objects.get(pk=ctx['invoice'])
+    draft = Invoice.objects.create(client_id=ctx['client'])
+    for line in source.invoice_lines.all():
+        InvoiceLine.objects.create(
+            invoice=draft, product_id=line.product_id, qty=1, prix_unit_applique=line.prix_unit_applique
+        )
+    ctx['draft'] = draft.pk
+
+
+def render_invoice_pdf(ctx):
+    """
+    Render the sample invoice PDF into a temporary file (raises if WeasyPrint is
+    unavailable). The stored PDF of the invoice is immutable: never written here.
+    """
+    from apps.billing.utils import render_invoice_html
+    from gsa_backend.pdf import is_pdf_available, render_pdf
+
+    if not is_pdf_available():
+        raise CommandError('WeasyPrint unavailable')
+    fd, tmp_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        render_pdf(render_invoice_html(Invoice.objects.get(pk=ctx['invoice'])), tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark dashboard, stock, invoice, client dues and PDF endpoints; save results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per scenario (default: 5).')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per scenario (default: 1).')
+        parser.add_argument('--only', action='append', help='Run only scenarios starting with this name.')
+        parser.add_argument('--output', help='Results file (default: benchmark_results/bench-<date>-<commit>.json).')
+        parser.add_argument('--compare', help='Previous results file to compare against.')
+        parser.add_argument('--list', action='store_true', help='List scenarios and exit.')
+
+    def handle(self, *args, **options):
+        scenarios = build_scenarios()
+        if options['only']:
+            scenarios = [s for s in scenarios if s.name.startswith(tuple(options['only']))]
+        if options['list']:
+            for scenario in scenarios:
+                self.stdout.write(scenario.name)
+            return
+
+        ctx = self.build_context()
+        self.client = APIClient()
+        self.client.force_authenticate(ctx['user'])
+
+        results = {'meta': run_metadata(), 'dataset': dataset_counts(), 'results': {}}
+        with override_settings(ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False, QUERY_BUDGET_STRICT=False):
+            for scenario in scenarios:
+                result = self.run_scenario(scenario, ctx, options['warmup'], options['repeat'])
+                results['results'][scenario.name] = result
+                self.report(scenario.name, result)
+
+        path = write_results(results, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {path}'))
+        if options['compare']:
+            self.compare(load_results(options['compare']), results)
+
+    def build_context(self):
+        """Pick representative rows (busiest product, client and invoice)."""
+        user = (
+            User.objects.filter(username=BENCH_USERNAME).first()
+            or User.objects.filter(role=Role.SUPER_ADMIN, is_active=True).first()
+        )
+        if user is None:
+            raise CommandError('Aucun utilisateur SUPER_ADMIN : lancer generate_benchmark_data.')
+        product = (
+            StockMovement.objects.values('product').annotate(n=Count('id')).order_by('-n').first()
+        )
+        client = (
+            Client.objects.annotate(n=Count('invoices')).order_by('-n').values_list('pk', flat=True).first()
+        )
+        invoice = (
+            Invoice.objects.filter(client_id=client, statut=InvoiceStatus.VALIDEE)
+            .values_list('pk', flat=True).first()
+        )
+        if not (product and client and invoice):
+            raise CommandError('Base vide : lancer generate_benchmark_data.')
+        return {'user': user, 'product': product['product'], 'client': client, 'invoice': invoice}
+
+    def run_scenario(self, scenario, ctx, warmup, repeat):
+        durations, queries, statuses = [], [], set()
+        try:
+            for run in range(warmup + repeat):
+                with transaction.atomic():
+                    if scenario.setup:
+                        scenario.setup(ctx)
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        status = self.run_once(scenario, ctx)
+                        elapsed = time.perf_counter() - start
+                    if scenario.mutating:
+                        transaction.set_rollback(True)
+                if run >= warmup:
+                    durations.append(elapsed)
+                    queries.append(len(captured))
+                    statuses.add(status)
+        except CommandError as e:
+            return {'skipped': str(e)}
+
+        result = summarize_timings(durations)
+        result['queries'] = max(queries) if queries else None
+        result['status'] = sorted(statuses)
+        return result
+
+    def run_once(self, scenario, ctx):
+        if scenario.call:
+            scenario.call(ctx)
+            return 'ok'
+        path = scenario.path(ctx) if callable(scenario.path) else scenario.path
+        response = getattr(self.client, scenario.method)(path)
+        return response.status_code
+
+    def report(self, name, result):
+        if 'skipped' in result:
+            self.stdout.write(f'{name:32} ignoré ({result["skipped"]})')
+            return
+        self.stdout.write(
+            f'{name:32} p50 {result["p50_ms"]:9.1f} ms  p95 {result["p95_ms"]:9.1f} ms  '
+            f'{result["queries"]:5} requêtes  {result["status"]}'
+        )
+
+    def compare(self, previous, current):
+        """Print p50 and query count deltas against a previous run."""
+        old_commit = (previous['meta'].get('git', {}).get('commit') or '?')[:10]
+        self.stdout.write(f'\nComparaison avec {old_commit}:')
+        for name, result in current['results'].items():
+            old = previous['results'].get(name)
+            if not old or 'p50_ms' not in old or 'p50_ms' not in result:
+                continue
+            delta = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+            self.stdout.write(
+                f'{name:32} p50 {old["p50_ms"]:9.1f} -> {result["p50_ms"]:9.1f} ms ({delta:+6.1f}%)  '
+                f'requêtes {old["queries"]} -> {result["queries"]}'
+            )
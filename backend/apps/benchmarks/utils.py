@@ -0,0 +1,147 @@
+"""
+Utilities for benchmarks app - timing statistics and result files.
+"""
+import json
+import math
+import platform
+import secrets
+import subprocess
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+BENCH_PREFIX = 'BENCH'
+BENCH_USERNAME = 'bench'
+RESULTS_DIR = Path(settings.BASE_DIR) / 'benchmark_results'
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (nearest rank) of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize_timings(durations):
+    """Summary statistics (milliseconds) for a list of durations in seconds."""
+    if not durations:
+        return {'runs': 0}
+    ms = [d * 1000 for d in durations]
+    return {
+        'runs': len(ms),
+        'min_ms': round(min(ms), 2),
+        'mean_ms': round(sum(ms) / len(ms), 2),
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'max_ms': round(max(ms), 2),
+    }
+
+
+def git_revision():
+    """Return the current git commit and branch, if available."""
+    def run(*args):
+        try:
+            return subprocess.check_output(
+                ['git', *args], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': run('rev-parse', 'HEAD'),
+        'branch': run('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(run('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def run_metadata():
+    """Describe the environment of a benchmark run."""
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'host': platform.node(),
+    }
+
+
+def dataset_counts():
+    """Row counts of the main tables, stored alongside the results."""
+    from apps.audit.models import AuditLog
+    from apps.billing.models import Invoice, InvoiceLine, Payment
+    from apps.catalog.models import Product
+    from apps.clients.models import Client
+    from apps.stock.models import StockMovement
+
+    return {
+        'products': Product.objects.count(),
+        'clients': Client.objects.count(),
+        'invoices': Invoice.objects.count(),
+        'invoice_lines': InvoiceLine.objects.count(),
+        'payments': Payment.objects.count(),
+        'stock_movements': StockMovement.objects.count(),
+        'audit_logs': AuditLog.objects.count(),
+    }
+
+
+def bench_products():
+    """Products created by generate_benchmark_data."""
+    from apps.catalog.models import Product
+    return Product.objects.filter(nom__startswith=f'{BENCH_PREFIX} ')
+
+
+def bench_clients():
+    """Clients created by generate_benchmark_data."""
+    from apps.clients.models import Client
+    return Client.objects.filter(nom__startswith=BENCH_PREFIX, email__startswith='bench')
+
+
+def ensure_api_user(username):
+    """Create (or reset) a SUPER_ADMIN benchmark account; return its fresh password."""
+    from apps.users.models import Role, User
+
+    password = secrets.token_urlsafe(16)
+    user, _ = User.objects.get_or_create(
+        username=username,
+        defaults={'email': f'{username}@example.com', 'role': Role.SUPER_ADMIN}
+    )
+    user.role = Role.SUPER_ADMIN
+    user.is_active = True
+    user.set_password(password)
+    user.save()
+    return password
+
+
+def disable_api_user(username):
+    """Deactivate a benchmark account once its run is over (its invoices and movements keep it)."""
+    from apps.users.models import User
+
+    for user in User.objects.filter(username=username):
+        user.is_active = False
+        user.set_unusable_password()
+        user.save()
+
+
+def write_results(results, output=None, prefix='bench'):
+    """Write a results dict as JSON and return the file path."""
+    if output:
+        path = Path(output)
+    else:
+        commit = (results.get('meta', {}).get('git', {}).get('commit') or 'nogit')[:10]
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+        path = RESULTS_DIR / f'{prefix}-{stamp}-{commit}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, default=str))
+    return path
+
+
+def load_results(path):
+    """Load a results file written by write_results."""
+    return json.loads(Path(path).read_text())
@@ -2,7 +2,7 @@
 Admin configuration for billing app.
 """
 from django.contrib import admin
-from .models import Invoice, InvoiceLine, Payment, CompanySettings
+from .models import Invoice, InvoiceLine, Payment, CompanySettings, InvoiceExport
 
 
 @admin.register(Invoice)
@@ -12,7 +12,7 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_filter = ['statut', 'type', 'created_at', 'validated_at']
     search_fields = ['numero', 'client__nom', 'client__entreprise']
     ordering = ['-created_at']
-    readonly_fields = ['numero', 'validated_at', 'validated_by', 'pdf_path']
+    readonly_fields = ['numero', 'validated_at', 'validated_by', 'pdf_path', 'pdf_hash', 'pdf_generated_at']
 
 
 @admin.register(InvoiceLine)
@@ -34,6 +34,16 @@ class PaymentAdmin(admin.ModelAdmin):
     ordering = ['-date', '-created_at']
 
 
+@admin.register(InvoiceExport)
+class InvoiceExportAdmin(admin.ModelAdmin):
+    """Admin interface for InvoiceExport model."""
+    list_display = ['id', 'created_by', 'statut', 'total', 'archived', 'failed', 'created_at', 'finished_at']
+    list_filter = ['statut', 'created_at']
+    ordering = ['-created_at']
+    readonly_fields = ['filters', 'total', 'to_render', 'rendered', 'archived', 'failed', 'errors',
+                       'file_path', 'file_size', 'started_at', 'finished_at']
+
+
 @admin.register(CompanySettings)
 class CompanySettingsAdmin(admin.ModelAdmin):
     """Admin interface for CompanySettings model."""
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.8 on 2026-10-19 06:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('billing', '0009_add_tva_incluse_to_invoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Filtres')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20, verbose_name='Statut')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Factures')),
+                ('to_render', models.PositiveIntegerField(default=0, verbose_name='PDF à générer')),
+                ('rendered', models.PositiveIntegerField(default=0, verbose_name='PDF générés')),
+                ('archived', models.PositiveIntegerField(default=0, verbose_name='PDF archivés')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Échecs')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('file_path', models.CharField(blank=True, max_length=500, verbose_name='Archive')),
+                ('file_size', models.PositiveBigIntegerField(default=0, verbose_name='Taille (octets)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Début')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoice_exports', to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Export de factures',
+                'verbose_name_plural': 'Exports de factures',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-19 06:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0010_invoiceexport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_generated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de génération du PDF'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash PDF (SHA-256)'),
+        ),
+    ]
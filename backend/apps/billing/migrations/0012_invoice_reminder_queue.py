@@ -0,0 +1,41 @@
+# Generated by Django 4.2.8 on 2026-10-19 06:51
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def schedule_missing_reminders(apps, schema_editor):
+    """Give unpaid validated invoices without a reminder date their first one (validation + 30 days)."""
+    Invoice = apps.get_model('billing', 'Invoice')
+    invoices = Invoice.objects.filter(
+        statut='VALIDEE', reste__gt=0, prochaine_date_relance__isnull=True, validated_at__isnull=False
+    ).only('id', 'validated_at')
+    for invoice in invoices.iterator():
+        invoice.prochaine_date_relance = (invoice.validated_at + timedelta(days=30)).date()
+        invoice.save(update_fields=['prochaine_date_relance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0011_invoice_pdf_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='derniere_relance',
+            field=models.DateField(blank=True, null=True, verbose_name='Dernière relance'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='nb_relances',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Nombre de relances'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('reste__gt', 0), ('statut', 'VALIDEE')), fields=['prochaine_date_relance'], name='invoice_reminder_due_idx'),
+        ),
+        migrations.RunPython(schedule_missing_reminders, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0012_invoice_reminder_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('reste__gt', 0), ('statut', 'VALIDEE')), fields=['client'], include=('reste',), name='invoice_open_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('statut', 'VALIDEE')), fields=['validated_at'], include=('total_ttc',), name='invoice_validated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', '-created_at'], name='invoice_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['statut', '-created_at'], name='invoice_statut_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.8 on 2026-10-19 07:42
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def flag_undeliverable_reminders(apps, schema_editor):
+    """Suspend the open invoices already taken out of the queue as undeliverable (REMINDER_UNDELIVERABLE)."""
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Invoice = apps.get_model('billing', 'Invoice')
+    content_type = ContentType.objects.filter(app_label='billing', model='invoice').first()
+    if content_type is None:
+        return
+    invoice_ids = AuditLog.objects.filter(
+        entity_type=content_type, action='REMINDER_UNDELIVERABLE'
+    ).values('entity_id')
+    Invoice.objects.filter(
+        pk__in=invoice_ids, statut='VALIDEE', reste__gt=0, prochaine_date_relance__isnull=True
+    ).update(relances_suspendues=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('billing', '0013_invoice_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='relances_suspendues',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Relances suspendues le'),
+        ),
+        migrations.RunPython(flag_undeliverable_reminders, reverse_code=migrations.RunPython.noop),
+    ]
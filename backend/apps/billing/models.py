@@ -6,6 +6,7 @@ from django.db.models import Sum, F
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 from apps.catalog.models import Product
 from apps.clients.models import Client
 
@@ -64,6 +65,10 @@ class CompanySettings(models.Model):
         return settings
 
 
+# Invoice fields computed by Invoice.calculate_totals()
+TOTAL_FIELDS = ['total', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste']
+
+
 class Invoice(models.Model):
     """Invoice model."""
     client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='invoices')
@@ -88,20 +93,54 @@ class Invoice(models.Model):
     
     # Payment tracking
     prochaine_date_relance = models.DateField(null=True, blank=True)
+    nb_relances = models.PositiveSmallIntegerField(default=0, verbose_name='Nombre de relances')
+    derniere_relance = models.DateField(null=True, blank=True, verbose_name='Dernière relance')
+    # Set when the client cannot be reminded (no email address); cleared when its email changes
+    relances_suspendues = models.DateTimeField(null=True, blank=True, verbose_name='Relances suspendues le')
     
-    # PDF
+    # PDF (rendered once, never overwritten: the hash is the one the client accepts)
     pdf_path = models.CharField(max_length=500, blank=True, null=True)
+    pdf_hash = models.CharField(max_length=64, blank=True, null=True, verbose_name='Hash PDF (SHA-256)')
+    pdf_generated_at = models.DateTimeField(null=True, blank=True, verbose_name='Date de génération du PDF')
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
+        indexes = [
+            # Open receivables (validated, not fully paid): reminder due queue, dues per client
+            models.Index(
+                fields=['prochaine_date_relance'],
+                condition=models.Q(statut=InvoiceStatus.VALIDEE, reste__gt=0),
+                name='invoice_reminder_due_idx',
+            ),
+            models.Index(
+                fields=['client'],
+                include=['reste'],
+                condition=models.Q(statut=InvoiceStatus.VALIDEE, reste__gt=0),
+                name='invoice_open_client_idx',
+            ),
+            # Revenue reports: validated invoices by validation date, covering the summed amount
+            models.Index(
+                fields=['validated_at'],
+                include=['total_ttc'],
+                condition=models.Q(statut=InvoiceStatus.VALIDEE),
+                name='invoice_validated_at_idx',
+            ),
+            # Invoice list filtered by client or status, newest first
+            models.Index(fields=['client', '-created_at'], name='invoice_client_created_idx'),
+            models.Index(fields=['statut', '-created_at'], name='invoice_statut_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.numero or 'Brouillon'} - {self.client.nom_complet}"
     
     def calculate_totals(self):
-        """Calculate invoice totals from lines."""
+        """
+        Calculate invoice totals from lines. Saved only when a total changed, so
+        the client balance (clients/signals.py) is not refreshed for nothing.
+        """
+        previous = self._totals()
         lines = self.invoice_lines.all()
         self.total = sum(line.total_ligne for line in lines)
         
@@ -132,17 +171,33 @@ class Invoice(models.Model):
         self.paye = self.payments.aggregate(total=Sum('montant'))['total'] or 0
         self.reste = self.total_ttc - self.paye
         
-        self.save()
+        if self._totals() != previous:
+            self.save(update_fields=TOTAL_FIELDS + ['updated_at'])
+    
+    def _totals(self):
+        """Computed totals rounded as stored (2 decimal places)."""
+        return [Decimal(str(getattr(self, field))).quantize(Decimal('0.01')) for field in TOTAL_FIELDS]
     
     def update_payment_status(self):
-        """Update payment status and reminder date."""
+        """Update payment status and reminder date (saves the reminder fields only, when they changed)."""
+        from django.conf import settings
+        previous = (self.prochaine_date_relance, self.relances_suspendues)
         if self.reste > 0:
-            # Set reminder date to 30 days from validation
-            if self.validated_at:
-                self.prochaine_date_relance = (self.validated_at + timedelta(days=30)).date()
+            # Schedule the first reminder after validation; keep an escalation in progress,
+            # never restart a finished one (INVOICE_REMINDER_MAX reminders sent) nor a suspended one
+            if self.validated_at and not self.prochaine_date_relance and not self.relances_suspendues:
+                if self.nb_relances == 0:
+                    delay = timedelta(days=settings.INVOICE_REMINDER_FIRST_DELAY)
+                    self.prochaine_date_relance = (self.validated_at + delay).date()
+                elif self.nb_relances < settings.INVOICE_REMINDER_MAX:
+                    # Paid then unpaid again (payment removed): resume the escalation
+                    from .reminders import next_reminder_date
+                    self.prochaine_date_relance = next_reminder_date(self.nb_relances, timezone.now().date())
         else:
             self.prochaine_date_relance = None
-        self.save()
+            self.relances_suspendues = None
+        if (self.prochaine_date_relance, self.relances_suspendues) != previous:
+            self.save(update_fields=['prochaine_date_relance', 'relances_suspendues', 'updated_at'])
     
     @staticmethod
     def generate_invoice_number():
@@ -317,3 +372,84 @@ class InvoiceContestation(models.Model):
     
     def __str__(self):
         return f"Contestation {self.invoice.numero} - {self.contested_at}"
+
+
+class ExportStatus(models.TextChoices):
+    """Invoice export job status choices."""
+    EN_ATTENTE = 'EN_ATTENTE', 'En attente'
+    EN_COURS = 'EN_COURS', 'En cours'
+    TERMINE = 'TERMINE', 'Terminé'
+    ECHEC = 'ECHEC', 'Échec'
+
+
+class InvoiceExport(models.Model):
+    """Background export of many invoice PDFs into a single ZIP archive."""
+    created_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='invoice_exports',
+        verbose_name='Demandé par'
+    )
+    filters = models.JSONField(default=dict, blank=True, verbose_name='Filtres')
+    statut = models.CharField(
+        max_length=20, choices=ExportStatus.choices, default=ExportStatus.EN_ATTENTE, verbose_name='Statut'
+    )
+
+    # Progress
+    total = models.PositiveIntegerField(default=0, verbose_name='Factures')
+    to_render = models.PositiveIntegerField(default=0, verbose_name='PDF à générer')
+    rendered = models.PositiveIntegerField(default=0, verbose_name='PDF générés')
+    archived = models.PositiveIntegerField(default=0, verbose_name='PDF archivés')
+    failed = models.PositiveIntegerField(default=0, verbose_name='Échecs')
+    errors = models.JSONField(default=list, blank=True, verbose_name='Erreurs')
+
+    # Result
+    file_path = models.CharField(max_length=500, blank=True, verbose_name='Archive')
+    file_size = models.PositiveBigIntegerField(default=0, verbose_name='Taille (octets)')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Début')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+
+    class Meta:
+        verbose_name = 'Export de factures'
+        verbose_name_plural = 'Exports de factures'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.get_statut_display()})"
+
+    @property
+    def progress(self):
+        """Completion percentage: rendering the missing PDFs, then archiving all of them."""
+        steps = self.to_render + self.total
+        if self.statut == ExportStatus.TERMINE or not steps:
+            return 100 if self.statut == ExportStatus.TERMINE else 0
+        done = self.rendered + self.failed + self.archived
+        return min(99, int(done * 100 / steps))
+
+    def filtered_invoices(self):
+        """Invoices matching the export filters, oldest first (by validation, else creation date)."""
+        from django.db.models import Q
+        from django.db.models.functions import Coalesce
+        from gsa_backend.periods import date_range_q, parse_date
+
+        queryset = Invoice.objects.exclude(numero__isnull=True).exclude(numero='')
+        filters = self.filters or {}
+        date_from = parse_date(filters['date_from']) if filters.get('date_from') else None
+        date_to = parse_date(filters['date_to']) if filters.get('date_to') else None
+        if date_from or date_to:
+            # Range on the raw columns (validated_at indexes), not on a computed date
+            queryset = queryset.filter(
+                date_range_q('validated_at', date_from, date_to)
+                | (Q(validated_at__isnull=True) & date_range_q('created_at', date_from, date_to))
+            )
+        if filters.get('client'):
+            queryset = queryset.filter(client_id=filters['client'])
+        if filters.get('statut'):
+            queryset = queryset.filter(statut__in=filters['statut'])
+        else:
+            queryset = queryset.exclude(statut__in=[InvoiceStatus.BROUILLON, InvoiceStatus.ANNULEE])
+        return queryset.order_by(Coalesce('validated_at', 'created_at'), 'numero')
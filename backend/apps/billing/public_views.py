@@ -7,7 +7,6 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.utils import timezone
 from django.db import transaction
-from django.http import FileResponse
 from django.conf import settings
 import os
 from datetime import timedelta
@@ -15,7 +14,7 @@ from datetime import timedelta
 from .models import Invoice, InvoiceAcceptance, InvoiceAcceptanceToken, InvoiceStatus
 from .serializers import PublicInvoiceSummarySerializer
 from .utils import (
-    hash_token, verify_token, calculate_pdf_hash, get_client_ip, get_invoice_pdf_path
+    hash_token, verify_token, get_client_ip, get_invoice_pdf_path, get_invoice_pdf_hash, invoice_pdf_response
 )
 from apps.audit.utils import create_audit_log
 
@@ -100,7 +99,7 @@ def invoice_acceptance(request, token):
         
         accepted_name = request.data.get('accepted_name', '').strip() or None
         
-        # Get PDF path and calculate hash
+        # Get PDF path and its hash (computed when the PDF was rendered)
         pdf_path = get_invoice_pdf_path(invoice)
         if not pdf_path or not os.path.exists(pdf_path):
             return Response(
@@ -108,7 +107,7 @@ def invoice_acceptance(request, token):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        pdf_hash = calculate_pdf_hash(pdf_path)
+        pdf_hash = get_invoice_pdf_hash(invoice)
         
         # Get client info
         ip_address = get_client_ip(request)
@@ -256,7 +255,7 @@ def invoice_acceptance(request, token):
     
     accepted_name = request.data.get('accepted_name', '').strip() or None
     
-    # Get PDF path and calculate hash
+    # Get PDF path and its hash (computed when the PDF was rendered)
     pdf_path = get_invoice_pdf_path(invoice)
     if not pdf_path or not os.path.exists(pdf_path):
         return Response(
@@ -264,7 +263,7 @@ def invoice_acceptance(request, token):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
     
-    pdf_hash = calculate_pdf_hash(pdf_path)
+    pdf_hash = get_invoice_pdf_hash(invoice)
     
     # Get client info
     ip_address = get_client_ip(request)
@@ -333,14 +332,8 @@ def download_pdf(request, token):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Stream PDF file
-    filename = os.path.basename(pdf_path)
-    response = FileResponse(
-        open(pdf_path, 'rb'),
-        content_type='application/pdf'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    # Stream PDF file (304 if the client already has this exact document)
+    return invoice_pdf_response(request, invoice, os.path.basename(pdf_path))
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
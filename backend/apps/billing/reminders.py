@@ -0,0 +1,242 @@
+"""
+Invoice reminder engine for billing app.
+
+Due reminders are read from the (statut, reste > 0, prochaine_date_relance)
+partial index in batches of ``settings.INVOICE_REMINDER_BATCH_SIZE``. Each
+batch is locked and moved to its next escalation date (one bulk_update) in a
+short transaction, and only handed to the configured transport once that is
+committed: a rollback can never re-send mail that already went out. The
+invoices the transport could not reach are put back to their previous state,
+the sent ones get their audit rows with one bulk_create. An invoice is
+reminded at most once per escalation step: after
+``settings.INVOICE_REMINDER_MAX`` reminders it leaves the queue.
+
+Invoices the transport can never reach (EmailTransport: client without an
+email address) leave the queue with an audit row and are flagged
+``relances_suspendues`` instead of failing every day. They come back when the
+client's email changes (``resume_reminders``) or when the reminder is
+postponed (InvoiceViewSet.postpone_reminder).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection, EmailMessage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.audit.models import AuditLog
+from apps.audit.utils import build_audit_log
+from .models import Invoice, InvoiceStatus
+
+logger = logging.getLogger(__name__)
+
+# Wording of each escalation level (the last one repeats)
+REMINDER_LEVELS = ['Rappel de paiement', 'Relance', 'Dernière relance avant mise en demeure']
+
+
+def reminder_level_label(level):
+    """Return the label of a reminder level (1 = first reminder)."""
+    return REMINDER_LEVELS[min(level, len(REMINDER_LEVELS)) - 1]
+
+
+def next_reminder_date(reminder_count, from_date):
+    """
+    Date of the next reminder after `reminder_count` reminders were sent,
+    or None once INVOICE_REMINDER_MAX is reached.
+    """
+    if reminder_count >= settings.INVOICE_REMINDER_MAX:
+        return None
+    intervals = settings.INVOICE_REMINDER_INTERVALS
+    days = intervals[min(reminder_count, len(intervals)) - 1]
+    return from_date + timedelta(days=days)
+
+
+class ReminderTransport:
+    """Delivers the reminders of a batch of invoices."""
+    name = 'base'
+
+    def undeliverable(self, invoice):
+        """Reason why `invoice` can never be reminded with this transport, or None."""
+        return None
+
+    def send(self, reminders):
+        """
+        Send [(invoice, level)] reminders.
+        Returns {invoice_id: error} for the reminders that could not be sent.
+        """
+        raise NotImplementedError
+
+
+class LogTransport(ReminderTransport):
+    """Local stand-in: reminders are only logged (and audited)."""
+    name = 'log'
+
+    def send(self, reminders):
+        for invoice, level in reminders:
+            logger.info(
+                f"{reminder_level_label(level)} for invoice {invoice.numero} - Reste: {invoice.reste} €"
+            )
+        return {}
+
+
+class EmailTransport(ReminderTransport):
+    """Emails the client of each invoice over a single SMTP connection."""
+    name = 'email'
+
+    def undeliverable(self, invoice):
+        return None if invoice.client.email else 'Client sans adresse email'
+
+    def send(self, reminders):
+        failures = {}
+        connection = get_connection()
+        with connection:
+            for invoice, level in reminders:
+                try:
+                    self.build_message(invoice, level, connection).send()
+                except Exception as e:
+                    failures[invoice.pk] = str(e)
+        return failures
+
+    def build_message(self, invoice, level, connection):
+        body = (
+            f"Bonjour {invoice.client.nom_complet},\n\n"
+            f"Sauf erreur de notre part, la facture {invoice.numero} présente un solde impayé "
+            f"de {invoice.reste} €. Nous vous remercions de procéder à son règlement.\n\n"
+            f"Cordialement,\n"
+        )
+        return EmailMessage(
+            subject=f"{reminder_level_label(level)} - Facture {invoice.numero}",
+            body=body,
+            to=[invoice.client.email],
+            connection=connection,
+        )
+
+
+def get_transport():
+    """Instantiate the transport configured in INVOICE_REMINDER_TRANSPORT."""
+    return import_string(settings.INVOICE_REMINDER_TRANSPORT)()
+
+
+def due_reminders(today=None):
+    """Unpaid validated invoices whose reminder date is reached (index scan)."""
+    today = today or timezone.now().date()
+    return Invoice.objects.filter(
+        statut=InvoiceStatus.VALIDEE,
+        reste__gt=0,
+        prochaine_date_relance__lte=today,
+        relances_suspendues__isnull=True
+    )
+
+
+def resume_reminders(client_id, today=None):
+    """Put the suspended reminders of a client back in the queue, due today. Returns the count."""
+    today = today or timezone.now().date()
+    return Invoice.objects.filter(client_id=client_id, relances_suspendues__isnull=False).update(
+        relances_suspendues=None, prochaine_date_relance=today
+    )
+
+
+REMINDER_FIELDS = ['nb_relances', 'derniere_relance', 'prochaine_date_relance', 'relances_suspendues']
+
+
+def _reminder_state(invoice):
+    return {field: getattr(invoice, field) for field in REMINDER_FIELDS}
+
+
+def _reminder_audit_log(invoice, action, after_data, reason):
+    return build_audit_log(
+        instance=invoice,
+        action=action,
+        user=None,  # System action
+        after_data=dict({'invoice_numero': invoice.numero, 'reste': str(invoice.reste)}, **after_data),
+        reason=reason,
+    )
+
+
+def process_due_reminders(today=None, batch_size=None, transport=None):
+    """
+    Send every due reminder, batch by batch.
+    Returns {'sent': n, 'failed': n, 'undeliverable': n, 'completed': n}
+    (completed: escalation finished; undeliverable: left the queue, see module doc).
+    """
+    today = today or timezone.now().date()
+    batch_size = batch_size or settings.INVOICE_REMINDER_BATCH_SIZE
+    transport = transport or get_transport()
+    stats = {'sent': 0, 'failed': 0, 'undeliverable': 0, 'completed': 0}
+    now = timezone.now()
+    failed_ids = []
+
+    while True:
+        # Claim the batch: move it to its next escalation date and commit before sending
+        with transaction.atomic():
+            # skip_locked: a concurrent run never sends the same reminder twice
+            batch = list(
+                due_reminders(today).exclude(pk__in=failed_ids)
+                .select_related('client').select_for_update(skip_locked=True, of=('self',))
+                .order_by('prochaine_date_relance', 'pk')[:batch_size]
+            )
+            if not batch:
+                break
+
+            reminders, previous, audit_logs = [], {}, []
+            for invoice in batch:
+                reason = transport.undeliverable(invoice)
+                previous[invoice.pk] = _reminder_state(invoice)
+                if reason:
+                    invoice.prochaine_date_relance = None
+                    invoice.relances_suspendues = now
+                    audit_logs.append(_reminder_audit_log(
+                        invoice, 'REMINDER_UNDELIVERABLE',
+                        {'reminder_date': str(previous[invoice.pk]['prochaine_date_relance']), 'error': reason},
+                        f'Relance impossible facture {invoice.numero} : {reason} (relances suspendues)'
+                    ))
+                    stats['undeliverable'] += 1
+                    continue
+                level = invoice.nb_relances + 1
+                invoice.nb_relances = level
+                invoice.derniere_relance = today
+                invoice.prochaine_date_relance = next_reminder_date(level, today)
+                reminders.append((invoice, level))
+
+            Invoice.objects.bulk_update(batch, REMINDER_FIELDS)
+            AuditLog.objects.bulk_create(audit_logs)
+
+        try:
+            failures = transport.send(reminders) if reminders else {}
+        except Exception as e:
+            # Transport down (e.g. SMTP server unreachable): nothing was sent, put the batch back
+            logger.error(f"Reminder transport {transport.name} failed: {e}")
+            failures = {invoice.pk: str(e) for invoice, _ in reminders}
+
+        failed, audit_logs = [], []
+        for invoice, level in reminders:
+            if invoice.pk in failures:
+                # Not sent: back to its previous state, due again on the next run
+                for field, value in previous[invoice.pk].items():
+                    setattr(invoice, field, value)
+                failed.append(invoice)
+                failed_ids.append(invoice.pk)
+                logger.error(f"Error sending reminder for invoice {invoice.numero}: {failures[invoice.pk]}")
+                continue
+            audit_logs.append(_reminder_audit_log(
+                invoice, 'REMINDER_SENT',
+                {
+                    'reminder_date': str(previous[invoice.pk]['prochaine_date_relance']),
+                    'level': level,
+                    'transport': transport.name,
+                    'next_reminder_date': str(invoice.prochaine_date_relance) if invoice.prochaine_date_relance else None,
+                },
+                f'{reminder_level_label(level)} facture {invoice.numero} - Reste: {invoice.reste} €'
+            ))
+            if invoice.prochaine_date_relance is None:
+                stats['completed'] += 1
+
+        with transaction.atomic():
+            Invoice.objects.bulk_update(failed, REMINDER_FIELDS)
+            AuditLog.objects.bulk_create(audit_logs)
+        stats['sent'] += len(audit_logs)
+        stats['failed'] += len(failed)
+
+    return stats
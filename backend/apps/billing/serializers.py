@@ -2,10 +2,11 @@
 Serializers for billing app.
 """
 from rest_framework import serializers
-from .models import Invoice, InvoiceLine, Payment, CompanySettings, InvoiceStatus, InvoiceType, PaymentMode, InvoiceAcceptance, InvoiceAcceptanceToken, InvoiceContestation
+from .models import Invoice, InvoiceLine, Payment, CompanySettings, InvoiceStatus, InvoiceType, PaymentMode, InvoiceAcceptance, InvoiceAcceptanceToken, InvoiceContestation, InvoiceExport, ExportStatus
 from apps.clients.serializers import ClientSerializer
 from apps.catalog.serializers import ProductSerializer
 from apps.users.serializers import UserListSerializer
+from gsa_backend.expansion import Expandable, SparseFieldsMixin
 
 
 class InvoiceLineSerializer(serializers.ModelSerializer):
@@ -34,25 +35,28 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
-    """Serializer for Invoice model."""
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Invoice model (?expand=client_detail)."""
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     type_display = serializers.CharField(source='get_type_display', read_only=True)
-    client_detail = ClientSerializer(source='client', read_only=True)
+    client_nom = serializers.CharField(source='client.nom_complet', read_only=True)
     validated_by_username = serializers.CharField(source='validated_by.username', read_only=True)
 
     class Meta:
         model = Invoice
         fields = [
-            'id', 'numero', 'client', 'client_detail', 'statut', 'statut_display',
+            'id', 'numero', 'client', 'client_nom', 'statut', 'statut_display',
             'type', 'type_display', 'total', 'tva_incluse', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste',
-            'prochaine_date_relance', 'pdf_path', 'validated_at', 'validated_by',
+            'prochaine_date_relance', 'pdf_path', 'pdf_hash', 'validated_at', 'validated_by',
             'validated_by_username', 'created_at', 'updated_at'
         ]
         read_only_fields = [
-            'id', 'numero', 'total', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste', 'pdf_path',
+            'id', 'numero', 'total', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste', 'pdf_path', 'pdf_hash',
             'validated_at', 'validated_by', 'created_at', 'updated_at'
         ]
+        expandable_fields = {
+            'client_detail': Expandable(ClientSerializer, 'client'),
+        }
 
 
 class InvoiceContestationSerializer(serializers.ModelSerializer):
@@ -84,13 +88,13 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'numero', 'client', 'client_detail', 'statut', 'statut_display',
             'type', 'type_display', 'total', 'tva_incluse', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste',
-            'prochaine_date_relance', 'pdf_path', 'invoice_lines', 'payments',
+            'prochaine_date_relance', 'relances_suspendues', 'pdf_path', 'pdf_hash', 'invoice_lines', 'payments',
             'validated_at', 'validated_by', 'validated_by_username',
             'contestation', 'created_at', 'updated_at'
         ]
         read_only_fields = [
-            'id', 'numero', 'total', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste', 'pdf_path',
-            'validated_at', 'validated_by', 'created_at', 'updated_at'
+            'id', 'numero', 'total', 'tva_jus', 'tva_biere', 'total_ttc', 'paye', 'reste', 'pdf_path', 'pdf_hash',
+            'relances_suspendues', 'validated_at', 'validated_by', 'created_at', 'updated_at'
         ]
 
 
@@ -179,3 +183,50 @@ class PublicInvoiceSummarySerializer(serializers.Serializer):
     accepted_name = serializers.CharField(required=False, allow_null=True, allow_blank=True)
     pdf_download_url = serializers.CharField()
     invoice_lines = PublicInvoiceLineSerializer(many=True, required=False)
+
+
+class InvoiceExportRequestSerializer(serializers.Serializer):
+    """Filters of a batch PDF export request."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    client = serializers.IntegerField(required=False)
+    statut = serializers.ListField(
+        child=serializers.ChoiceField(choices=InvoiceStatus.choices), required=False, allow_empty=False
+    )
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError('La date de début doit précéder la date de fin.')
+        return data
+
+    def to_filters(self):
+        """Return the validated filters as JSON-serializable values."""
+        return {
+            key: value.isoformat() if hasattr(value, 'isoformat') else value
+            for key, value in self.validated_data.items()
+        }
+
+
+class InvoiceExportSerializer(serializers.ModelSerializer):
+    """Serializer for InvoiceExport (progress and download link)."""
+    statut_display = serializers.CharField(source='get_statut_display', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    progress = serializers.IntegerField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InvoiceExport
+        fields = [
+            'id', 'filters', 'statut', 'statut_display', 'progress', 'total', 'to_render', 'rendered',
+            'archived', 'failed', 'errors', 'file_size', 'download_url', 'created_by', 'created_by_username',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.statut != ExportStatus.TERMINE or not obj.file_path:
+            return None
+        from django.urls import reverse
+        url = reverse('invoice-export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -1,12 +1,18 @@
 """
-Celery tasks for billing app - automatic reminders.
+Celery tasks for billing app - automatic reminders, batch PDF exports.
 """
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
-from datetime import date
-from .models import Invoice, InvoiceStatus
-from apps.audit.utils import create_audit_log
+from datetime import timedelta
+from .models import Invoice, InvoiceStatus, InvoiceExport, ExportStatus
+import csv
+import io
 import logging
+import os
+import zipfile
 
 logger = logging.getLogger(__name__)
 
@@ -14,43 +20,163 @@ logger = logging.getLogger(__name__)
 @shared_task
 def send_invoice_reminders():
     """
-    Check for unpaid invoices with reminder date reached and send reminders.
+    Send the due invoice reminders (see apps.billing.reminders) and move each
+    invoice to its next escalation date.
     This task is called by Celery Beat.
     """
-    today = date.today()
-    
-    # Find invoices that need reminders
-    invoices = Invoice.objects.filter(
-        statut=InvoiceStatus.VALIDEE,
-        reste__gt=0,
-        prochaine_date_relance__lte=today
-    ).select_related('client')
-    
-    reminders_sent = 0
-    
-    for invoice in invoices:
+    from .reminders import process_due_reminders
+
+    stats = process_due_reminders()
+    logger.info(
+        f"Reminder task completed. {stats['sent']} reminders sent, {stats['failed']} failed, "
+        f"{stats['undeliverable']} undeliverable, {stats['completed']} escalations completed."
+    )
+    return f"{stats['sent']} reminders sent"
+
+
+def _invoice_pdf_exists(invoice):
+    return bool(invoice.pdf_path) and os.path.exists(os.path.join(settings.MEDIA_ROOT, invoice.pdf_path))
+
+
+def _fail_export(export_id, message):
+    InvoiceExport.objects.filter(pk=export_id).update(
+        statut=ExportStatus.ECHEC, errors=[message], finished_at=timezone.now()
+    )
+
+
+@shared_task
+def export_invoices_pdf(export_id):
+    """
+    Start an invoice export: render the missing PDFs in parallel chunks
+    (one Celery task each), then build the archive once all chunks are done.
+    """
+    export = InvoiceExport.objects.get(pk=export_id)
+    invoices = list(export.filtered_invoices().only('id', 'pdf_path'))
+    missing = [invoice.pk for invoice in invoices if not _invoice_pdf_exists(invoice)]
+    InvoiceExport.objects.filter(pk=export_id).update(
+        statut=ExportStatus.EN_COURS, started_at=timezone.now(), total=len(invoices), to_render=len(missing)
+    )
+
+    if not missing:
+        build_invoice_export_archive.delay(export_id)
+        return f"Export {export_id}: {len(invoices)} invoices, nothing to render"
+
+    from gsa_backend.pdf import is_pdf_available
+    if not is_pdf_available():
+        _fail_export(export_id, f"{len(missing)} PDF à générer mais WeasyPrint n'est pas disponible")
+        return f"Export {export_id}: WeasyPrint unavailable"
+
+    size = settings.INVOICE_EXPORT_CHUNK_SIZE
+    chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+    # A chunk failing outside its per-invoice handling (worker lost, database
+    # error) skips the archive: the errback fails the export instead
+    chord(
+        render_invoice_pdfs.s(export_id, chunk) for chunk in chunks
+    )(build_invoice_export_archive.si(export_id).on_error(fail_invoice_export.s(export_id)))
+    return f"Export {export_id}: rendering {len(missing)} PDFs in {len(chunks)} chunks"
+
+
+@shared_task
+def render_invoice_pdfs(export_id, invoice_ids):
+    """Render the PDFs of a chunk of invoices and record the progress of the export."""
+    from .utils import store_invoice_pdf
+
+    for invoice in Invoice.objects.filter(pk__in=invoice_ids).select_related('client'):
         try:
-            # Log reminder in audit
-            create_audit_log(
-                instance=invoice,
-                action='REMINDER_SENT',
-                user=None,  # System action
-                after_data={
-                    'invoice_numero': invoice.numero,
-                    'reste': str(invoice.reste),
-                    'reminder_date': str(invoice.prochaine_date_relance)
-                },
-                reason=f'Relance automatique facture {invoice.numero} - Reste: {invoice.reste} €'
-            )
-            
-            # Here you could send email, SMS, etc.
-            # For now, we just log it in audit
-            
-            logger.info(f"Reminder sent for invoice {invoice.numero} - Reste: {invoice.reste} €")
-            reminders_sent += 1
-            
+            store_invoice_pdf(invoice)
+            InvoiceExport.objects.filter(pk=export_id).update(rendered=F('rendered') + 1)
         except Exception as e:
-            logger.error(f"Error sending reminder for invoice {invoice.numero}: {str(e)}")
-    
-    logger.info(f"Reminder task completed. {reminders_sent} reminders sent.")
-    return f"{reminders_sent} reminders sent"
+            logger.error(f"Export {export_id}: error generating PDF for invoice {invoice.numero}: {str(e)}")
+            with transaction.atomic():
+                export = InvoiceExport.objects.select_for_update().get(pk=export_id)
+                export.failed += 1
+                export.errors = (export.errors or [])[:99] + [f"{invoice.numero}: {e}"]
+                export.save(update_fields=['failed', 'errors'])
+
+
+@shared_task
+def fail_invoice_export(request, exc, traceback, export_id):
+    """Errback of the export chord: fail the export if it is still running."""
+    logger.error(f"Export {export_id}: task {request.id} failed: {exc}")
+    InvoiceExport.objects.filter(pk=export_id, statut=ExportStatus.EN_COURS).update(
+        statut=ExportStatus.ECHEC, errors=[f"Erreur lors de la génération des PDF : {exc}"],
+        finished_at=timezone.now()
+    )
+
+
+@shared_task
+def build_invoice_export_archive(export_id):
+    """Write every available invoice PDF of an export into a ZIP archive, with an index.csv."""
+    export = InvoiceExport.objects.get(pk=export_id)
+    exports_dir = os.path.join(settings.MEDIA_ROOT, 'exports')
+    os.makedirs(exports_dir, exist_ok=True)
+    filename = f"factures_{export.pk}_{timezone.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    filepath = os.path.join(exports_dir, filename)
+    tmp_path = f"{filepath}.tmp"
+
+    index = io.StringIO()
+    writer = csv.writer(index, delimiter=';')
+    writer.writerow(['numero', 'date', 'client', 'statut', 'total_ttc', 'paye', 'reste', 'fichier'])
+    archived = 0
+    try:
+        # PDFs are already compressed: store them as-is
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for invoice in export.filtered_invoices().select_related('client').iterator(chunk_size=500):
+                pdf_file = ''
+                if _invoice_pdf_exists(invoice):
+                    pdf_file = f"{invoice.numero}.pdf"
+                    archive.write(os.path.join(settings.MEDIA_ROOT, invoice.pdf_path), arcname=pdf_file)
+                    archived += 1
+                    if archived % 50 == 0:
+                        InvoiceExport.objects.filter(pk=export_id).update(archived=archived)
+                writer.writerow([
+                    invoice.numero, invoice.invoice_date, invoice.client.nom_complet, invoice.statut,
+                    invoice.total_ttc, invoice.paye, invoice.reste, pdf_file,
+                ])
+            archive.writestr('index.csv', index.getvalue())
+        os.replace(tmp_path, filepath)
+    except Exception as e:
+        logger.error(f"Export {export_id}: error building archive: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _fail_export(export_id, f"Erreur lors de la création de l'archive : {e}")
+        raise
+
+    InvoiceExport.objects.filter(pk=export_id).update(
+        statut=ExportStatus.TERMINE, archived=archived, file_path=f"exports/{filename}",
+        file_size=os.path.getsize(filepath), finished_at=timezone.now()
+    )
+    logger.info(f"Export {export_id} completed: {archived} PDFs in {filename}")
+    return f"Export {export_id}: {archived} PDFs archived"
+
+
+@shared_task
+def fail_stale_invoice_exports():
+    """Fail the exports still pending or running INVOICE_EXPORT_TIMEOUT_MINUTES after their creation."""
+    limit = timezone.now() - timedelta(minutes=settings.INVOICE_EXPORT_TIMEOUT_MINUTES)
+    failed = InvoiceExport.objects.filter(
+        statut__in=[ExportStatus.EN_ATTENTE, ExportStatus.EN_COURS], created_at__lt=limit
+    ).update(
+        statut=ExportStatus.ECHEC,
+        errors=[f"Export interrompu : non terminé après {settings.INVOICE_EXPORT_TIMEOUT_MINUTES} minutes"],
+        finished_at=timezone.now()
+    )
+    if failed:
+        logger.warning(f"{failed} stale invoice exports marked as failed")
+    return f"{failed} stale exports failed"
+
+
+@shared_task
+def purge_invoice_exports():
+    """Delete export archives older than INVOICE_EXPORT_RETENTION_DAYS."""
+    limit = timezone.now() - timedelta(days=settings.INVOICE_EXPORT_RETENTION_DAYS)
+    deleted = 0
+    for export in InvoiceExport.objects.filter(created_at__lt=limit):
+        if export.file_path:
+            full_path = os.path.join(settings.MEDIA_ROOT, export.file_path)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+        export.delete()
+        deleted += 1
+    return f"{deleted} exports deleted"
+
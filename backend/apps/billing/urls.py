@@ -3,7 +3,7 @@ URLs for billing app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import InvoiceViewSet, InvoiceLineViewSet, PaymentViewSet, CompanySettingsViewSet
+from .views import InvoiceViewSet, InvoiceLineViewSet, PaymentViewSet, CompanySettingsViewSet, InvoiceExportViewSet
 from .public_views import invoice_acceptance, download_pdf, contest_invoice
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'invoices', InvoiceViewSet, basename='invoice')
 router.register(r'invoice-lines', InvoiceLineViewSet, basename='invoice-line')
 router.register(r'payments', PaymentViewSet, basename='payment')
 router.register(r'company-settings', CompanySettingsViewSet, basename='company-settings')
+router.register(r'invoice-exports', InvoiceExportViewSet, basename='invoice-export')
 
 urlpatterns = [
     path('', include(router.urls)),
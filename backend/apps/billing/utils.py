@@ -4,43 +4,19 @@ Utilities for billing app - PDF generation and invoice acceptance.
 import os
 import secrets
 import hashlib
+import tempfile
 from django.conf import settings
 from django.template.loader import render_to_string
-from .models import Invoice
+from gsa_backend.metrics import track_pdf_render
+from gsa_backend.pdf import PDFUnavailable, is_pdf_available, render_pdf, unavailable_reason
+from .models import Invoice, InvoiceAcceptance
 
-# Try to import WeasyPrint, but make it optional
-try:
-    from weasyprint import HTML, CSS
-    from weasyprint.text.fonts import FontConfiguration
-    WEASYPRINT_AVAILABLE = True
-except (ImportError, OSError) as e:
-    WEASYPRINT_AVAILABLE = False
-    WEASYPRINT_ERROR = str(e)
-
-
-def generate_invoice_pdf(invoice):
-    """
-    Generate PDF for an invoice.
-    Returns the file path relative to MEDIA_ROOT.
-    Raises Exception if WeasyPrint is not available.
-    """
-    if not WEASYPRINT_AVAILABLE:
-        raise Exception(
-            f"PDF generation is not available. WeasyPrint dependencies are missing. "
-            f"Error: {WEASYPRINT_ERROR if 'WEASYPRINT_ERROR' in globals() else 'Unknown error'}"
-        )
-    
-    # Ensure invoices directory exists
-    invoices_dir = os.path.join(settings.MEDIA_ROOT, 'invoices')
-    os.makedirs(invoices_dir, exist_ok=True)
-    
+def render_invoice_html(invoice):
+    """Render the HTML of an invoice PDF (template, company settings, logo, due date)."""
     # Get company settings
     from .models import CompanySettings
     company_settings = CompanySettings.get_settings()
     
-    # Ensure invoice totals are up to date (recalculate if needed)
-    invoice.calculate_totals()
-    
     # Build logo URL if exists (WeasyPrint needs file:// URL)
     logo_url = None
     if company_settings.logo:
@@ -57,7 +33,7 @@ def generate_invoice_pdf(invoice):
     
     # Render HTML template
     try:
-        html_content = render_to_string('billing/invoice_template.html', {
+        return render_to_string('billing/invoice_template.html', {
             'invoice': invoice,
             'lines': invoice.invoice_lines.select_related('product').all(),
             'payments': invoice.payments.all(),
@@ -67,30 +43,47 @@ def generate_invoice_pdf(invoice):
         })
     except Exception as e:
         raise Exception(f"Error rendering invoice template: {str(e)}")
+
+
+@track_pdf_render('invoice')
+def generate_invoice_pdf(invoice):
+    """
+    Generate PDF for an invoice.
+    Returns the file path relative to MEDIA_ROOT.
+    Raises Exception if WeasyPrint is not available.
+    """
+    if not is_pdf_available():
+        raise PDFUnavailable(
+            f"PDF generation is not available. WeasyPrint dependencies are missing. "
+            f"Error: {unavailable_reason() or 'Unknown error'}"
+        )
     
-    # Generate PDF
-    try:
-        font_config = FontConfiguration()
-        pdf_file = HTML(string=html_content)
-    except Exception as e:
-        raise Exception(f"Error creating HTML object for PDF: {str(e)}")
+    # Ensure invoices directory exists
+    invoices_dir = os.path.join(settings.MEDIA_ROOT, 'invoices')
+    os.makedirs(invoices_dir, exist_ok=True)
+    
+    # Ensure invoice totals are up to date (recalculate if needed)
+    invoice.calculate_totals()
+    html_content = render_invoice_html(invoice)
     
     # File path - use invoice number or ID as fallback
     invoice_number = invoice.numero or f"Brouillon-{invoice.id}"
     filename = f"{invoice_number}.pdf"
     filepath = os.path.join(invoices_dir, filename)
+    # Unique temporary file next to the target: concurrent renders of the same invoice never share it
+    fd, tmp_path = tempfile.mkstemp(dir=invoices_dir, prefix=f".{filename}.", suffix='.tmp')
+    os.close(fd)
     
-    # Generate PDF - use target parameter instead of positional argument
+    # Generate PDF into a temporary file, then move it in place: readers never see a partial file
     try:
-        pdf_file.write_pdf(
-            target=filepath,
-            font_config=font_config
-        )
+        render_pdf(html_content, tmp_path)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, filepath)
     except Exception as e:
         # Clean up if file was partially created
-        if os.path.exists(filepath):
+        if os.path.exists(tmp_path):
             try:
-                os.remove(filepath)
+                os.remove(tmp_path)
             except:
                 pass
         raise Exception(f"Error writing PDF file: {str(e)}")
@@ -107,6 +100,59 @@ def get_invoice_pdf_path(invoice):
     return os.path.join(settings.MEDIA_ROOT, invoice.pdf_path)
 
 
+class InvoicePDFMissing(Exception):
+    """Raised when the PDF of an accepted invoice is missing: it cannot be rendered again."""
+
+
+def store_invoice_pdf(invoice):
+    """
+    Return the PDF path of an invoice, rendering it only if it does not exist yet.
+    The SHA-256 hash is computed once, right after rendering, and saved with the path.
+    """
+    full_path = get_invoice_pdf_path(invoice)
+    if full_path and os.path.exists(full_path):
+        get_invoice_pdf_hash(invoice)
+        return invoice.pdf_path
+
+    if invoice.pdf_hash and InvoiceAcceptance.objects.filter(invoice=invoice).exists():
+        # A new rendering would not be the document the client accepted
+        raise InvoicePDFMissing(f"Accepted PDF of invoice {invoice.numero} is missing")
+
+    from django.utils import timezone
+    invoice.pdf_path = generate_invoice_pdf(invoice)
+    invoice.pdf_hash = calculate_pdf_hash(get_invoice_pdf_path(invoice))
+    invoice.pdf_generated_at = timezone.now()
+    Invoice.objects.filter(pk=invoice.pk).update(
+        pdf_path=invoice.pdf_path, pdf_hash=invoice.pdf_hash, pdf_generated_at=invoice.pdf_generated_at
+    )
+    return invoice.pdf_path
+
+
+def get_invoice_pdf_hash(invoice):
+    """Return the stored PDF hash, hashing (once) PDFs generated before hashes were stored."""
+    if not invoice.pdf_hash:
+        invoice.pdf_hash = calculate_pdf_hash(get_invoice_pdf_path(invoice))
+        Invoice.objects.filter(pk=invoice.pk).update(pdf_hash=invoice.pdf_hash)
+    return invoice.pdf_hash
+
+
+def invoice_pdf_response(request, invoice, filename):
+    """
+    Serve the stored PDF of an invoice with its hash as ETag.
+    Returns 304 Not Modified if the client already has this exact document.
+    """
+    from django.utils.cache import get_conditional_response
+    from gsa_backend.sendfile import file_response
+
+    etag = f'"{get_invoice_pdf_hash(invoice)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = file_response(get_invoice_pdf_path(invoice), 'application/pdf', filename)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 def generate_acceptance_token():
     """Generate a secure token for invoice acceptance."""
     return secrets.token_urlsafe(32)
@@ -123,12 +169,9 @@ def verify_token(token, token_hash):
 
 
 def calculate_pdf_hash(pdf_path):
-    """Calculate SHA-256 hash of a PDF file."""
-    sha256_hash = hashlib.sha256()
+    """Calculate SHA-256 hash of a PDF file (streamed with a large buffer, no copy)."""
     with open(pdf_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+        return hashlib.file_digest(f, 'sha256').hexdigest()
 
 
 def get_client_ip(request):
@@ -10,24 +10,26 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from datetime import timedelta
 import os
-from .models import Invoice, InvoiceLine, Payment, CompanySettings, InvoiceStatus, InvoiceAcceptanceToken
+from .models import Invoice, InvoiceLine, Payment, CompanySettings, InvoiceStatus, InvoiceAcceptanceToken, InvoiceExport, ExportStatus
 from .utils import generate_acceptance_token, hash_token, get_invoice_pdf_path
 from .serializers import (
     InvoiceSerializer,
     InvoiceDetailSerializer,
     InvoiceLineSerializer,
     PaymentSerializer,
-    CompanySettingsSerializer
+    CompanySettingsSerializer,
+    InvoiceExportRequestSerializer,
+    InvoiceExportSerializer
 )
 from apps.users.permissions import IsReadOnlyOrAuthenticated, IsCommercial, IsAdminGSA, HasCustomPermission
-from apps.users.utils import user_has_permission
 from apps.audit.utils import create_audit_log
-from apps.clients.models import ClientPrice
-from apps.catalog.models import Product, BasePrice
+from apps.clients.pricing import get_price
 from apps.stock.models import StockMovement, MovementType
+from gsa_backend.concurrency import document_slot, DocumentSlotBusy, slot_busy_response
+from gsa_backend.expansion import ExpandableQuerysetMixin
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet for Invoice management."""
     queryset = Invoice.objects.select_related('client', 'validated_by').all()
     serializer_class = InvoiceSerializer
@@ -48,16 +50,14 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         """Set permissions based on action."""
         if self.action in ['create']:
             # Check custom permission for creating invoices
-            class CanCreateInvoices(HasCustomPermission):
-                permission_name = 'can_create_invoices'
-            return [IsAuthenticated(), CanCreateInvoices()]
+            return [IsAuthenticated(), HasCustomPermission('can_create_invoices')]
         elif self.action in ['validate']:
             # Check custom permission for validating invoices
-            class CanValidateInvoices(HasCustomPermission):
-                permission_name = 'can_validate_invoices'
-            return [IsAuthenticated(), CanValidateInvoices()]
+            return [IsAuthenticated(), HasCustomPermission('can_validate_invoices')]
         elif self.action in ['update', 'partial_update', 'cancel', 'create_avoir']:
             return [IsAuthenticated(), IsCommercial()]
+        elif self.action in ['export_pdfs']:
+            return [IsAuthenticated(), HasCustomPermission('can_export_data')]
         return [IsReadOnlyOrAuthenticated()]
 
     def perform_create(self, serializer):
@@ -179,12 +179,16 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         )
         
         # Generate PDF AFTER status update and audit log (optional)
-        from .utils import generate_invoice_pdf, WEASYPRINT_AVAILABLE
+        from .utils import store_invoice_pdf
+        from gsa_backend.pdf import is_pdf_available
         pdf_error = None
-        if WEASYPRINT_AVAILABLE:
+        if is_pdf_available():
             try:
-                invoice.pdf_path = generate_invoice_pdf(invoice)
-                invoice.save()
+                # Don't wait for a busy render slot: download_pdf generates it on demand
+                with document_slot(wait=0):
+                    store_invoice_pdf(invoice)
+            except DocumentSlotBusy:
+                pdf_error = "PDF generation deferred: all render slots busy"
             except Exception as e:
                 # Log error but don't fail validation - PDF can be generated later
                 import logging
@@ -303,11 +307,14 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def download_pdf(self, request, pk=None):
-        """Download invoice PDF. Generate if not exists."""
-        from django.http import FileResponse
-        from django.conf import settings
-        from .utils import generate_invoice_pdf, WEASYPRINT_AVAILABLE
-        import os
+        """
+        Download invoice PDF. Generate if not exists (once: the stored PDF is never replaced).
+        Only the generation takes a document slot; a stored PDF is streamed directly.
+        """
+        from .utils import store_invoice_pdf, invoice_pdf_response, InvoicePDFMissing
+        from gsa_backend.pdf import is_pdf_available
+        import logging
+        logger = logging.getLogger(__name__)
         
         invoice = self.get_object()
         
@@ -318,42 +325,30 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if WeasyPrint is available
-        if not WEASYPRINT_AVAILABLE:
-            return Response(
-                {
-                    'error': 'PDF generation is not available. WeasyPrint system dependencies are missing. '
-                             'Please install: apt-get install -y libpango-1.0-0 libpangoft2-1.0-0 libgobject-2.0-0'
-                },
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-        
-        # Generate PDF if it doesn't exist
-        if not invoice.pdf_path:
-            try:
-                invoice.pdf_path = generate_invoice_pdf(invoice)
-                invoice.save()
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error generating PDF for invoice {invoice.numero}: {str(e)}")
+        # Generate PDF if it doesn't exist (WeasyPrint is only needed then)
+        pdf_path = get_invoice_pdf_path(invoice)
+        if not pdf_path or not os.path.exists(pdf_path):
+            if not is_pdf_available():
                 return Response(
-                    {'error': f'Error generating PDF: {str(e)}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    {
+                        'error': 'PDF generation is not available. WeasyPrint system dependencies are missing. '
+                                 'Please install: apt-get install -y libpango-1.0-0 libpangoft2-1.0-0 libgobject-2.0-0'
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
                 )
-        
-        pdf_path = os.path.join(settings.MEDIA_ROOT, invoice.pdf_path)
-        
-        # Regenerate if file doesn't exist
-        if not os.path.exists(pdf_path):
             try:
-                invoice.pdf_path = generate_invoice_pdf(invoice)
-                invoice.save()
-                pdf_path = os.path.join(settings.MEDIA_ROOT, invoice.pdf_path)
+                with document_slot():
+                    store_invoice_pdf(invoice)
+            except DocumentSlotBusy:
+                return slot_busy_response('invoice')
+            except InvoicePDFMissing as e:
+                logger.error(str(e))
+                return Response(
+                    {'error': 'Le PDF accepté par le client est introuvable et ne peut pas être régénéré.'},
+                    status=status.HTTP_410_GONE
+                )
             except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error regenerating PDF for invoice {invoice.numero}: {str(e)}")
+                logger.error(f"Error generating PDF for invoice {invoice.numero}: {str(e)}")
                 return Response(
                     {'error': f'Error generating PDF: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -361,22 +356,14 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         
         try:
             invoice_number = invoice.numero or f"Brouillon-{invoice.id}"
-            return FileResponse(
-                open(pdf_path, 'rb'),
-                content_type='application/pdf',
-                filename=f"{invoice_number}.pdf"
-            )
+            return invoice_pdf_response(request, invoice, f"{invoice_number}.pdf")
         except FileNotFoundError:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"PDF file not found for invoice {invoice.numero}: {pdf_path}")
             return Response(
                 {'error': 'Le fichier PDF est introuvable. Veuillez régénérer le PDF.'},
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Error reading PDF file for invoice {invoice.numero}: {str(e)}", exc_info=True)
             return Response(
                 {'error': f'Erreur lors de la lecture du fichier PDF: {str(e)}'},
@@ -406,6 +393,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             invoice.prochaine_date_relance = invoice.prochaine_date_relance + timedelta(days=days)
         else:
             invoice.prochaine_date_relance = timezone.now().date() + timedelta(days=days)
+        invoice.relances_suspendues = None  # Postponing also resumes suspended reminders
         invoice.save()
         
         create_audit_log(
@@ -604,6 +592,66 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             'invoice': serializer.data
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def export_pdfs(self, request):
+        """
+        Queue a ZIP export of the PDFs of many invoices (filters: date_from, date_to,
+        client, statut). Returns 202 with the export; poll /invoice-exports/<id>/.
+        """
+        from django.db import transaction
+        from .tasks import export_invoices_pdf
+
+        serializer = InvoiceExportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        export = InvoiceExport.objects.create(created_by=request.user, filters=serializer.to_filters())
+        create_audit_log(
+            instance=export,
+            action='EXPORT_INVOICES',
+            user=request.user,
+            after_data={'filters': export.filters},
+            reason='Export PDF des factures',
+            request=request
+        )
+        transaction.on_commit(lambda: export_invoices_pdf.delay(export.pk))
+        return Response(
+            InvoiceExportSerializer(export, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class InvoiceExportViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for batch invoice PDF exports (progress and download)."""
+    serializer_class = InvoiceExportSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Users only see their own exports; admins see all of them."""
+        queryset = InvoiceExport.objects.select_related('created_by')
+        user = self.request.user
+        if user.is_super_admin() or user.is_admin_gsa():
+            return queryset
+        return queryset.filter(created_by=user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the ZIP archive of a finished export."""
+        from django.conf import settings
+        from gsa_backend.sendfile import file_response
+
+        export = self.get_object()
+        if export.statut != ExportStatus.TERMINE or not export.file_path:
+            return Response(
+                {'error': "L'export n'est pas terminé"},
+                status=status.HTTP_409_CONFLICT
+            )
+        file_path = os.path.join(settings.MEDIA_ROOT, export.file_path)
+        if not os.path.exists(file_path):
+            return Response(
+                {'error': "L'archive a expiré. Veuillez relancer l'export."},
+                status=status.HTTP_410_GONE
+            )
+        return file_response(file_path, 'application/zip')
+
 
 class InvoiceLineViewSet(viewsets.ModelViewSet):
     """ViewSet for InvoiceLine management."""
@@ -637,23 +685,14 @@ class InvoiceLineViewSet(viewsets.ModelViewSet):
                 'Cannot add lines to a validated invoice'
             )
         
-        # Get price: ClientPrice if exists, else BasePrice
-        prix_unit = None
-        try:
-            client_price = ClientPrice.objects.get(
-                client=invoice.client,
-                product=product
+        # Get price: ClientPrice if exists, else BasePrice (cached price list of the client)
+        price = get_price(invoice.client_id, product.id)
+        if price is None:
+            from rest_framework import serializers as drf_serializers
+            raise drf_serializers.ValidationError(
+                f'No price found for product {product.nom}'
             )
-            prix_unit = client_price.prix
-        except ClientPrice.DoesNotExist:
-            try:
-                base_price = product.base_price
-                prix_unit = base_price.prix_base
-            except BasePrice.DoesNotExist:
-                from rest_framework import serializers as drf_serializers
-                raise drf_serializers.ValidationError(
-                    f'No price found for product {product.nom}'
-                )
+        prix_unit = price[0]
         
         # Create line with snapshot price
         instance = serializer.save(
@@ -0,0 +1,61 @@
+"""
+Product name resolution for catalog app.
+
+Bulk imports name products the way users write them: by id, by name, by name
+and sales unit, or as "Nom (Unité)" as displayed by the application. The
+index loads the catalog with one query and resolves every row in memory.
+"""
+import re
+
+from gsa_backend.tabular import normalize, parse_integer
+from .models import Product, UniteVente
+
+
+class ProductIndex:
+    """In-memory lookup of catalog products by id, name, or name and sales unit."""
+
+    def __init__(self):
+        units = {normalize(label): code for code, label in UniteVente.choices}
+        units.update({normalize(code): code for code, _ in UniteVente.choices})
+        self.units = units
+        self.by_id = {}
+        self.by_name = {}
+        for product_id, nom, unite in Product.objects.values_list('id', 'nom', 'unite_vente'):
+            self.by_id[product_id] = nom
+            self.by_name.setdefault(normalize(nom), {})[unite] = product_id
+
+    def resolve(self, product_id=None, name=None, unite=None):
+        """Return (product_id, error)."""
+        if product_id not in (None, ''):
+            try:
+                product_id = parse_integer(product_id, minimum=1)
+            except ValueError:
+                return None, f"Identifiant produit invalide : {product_id}"
+            if product_id not in self.by_id:
+                return None, f"Produit {product_id} introuvable"
+            return product_id, None
+
+        if not name:
+            return None, 'Produit manquant'
+        key = normalize(name)
+        unit_code = None
+        if unite:
+            unit_code = self.units.get(normalize(unite))
+            if unit_code is None:
+                return None, f"Unité de vente inconnue : {unite}"
+        else:
+            # "Nom (Unité)" as displayed by the application
+            match = re.match(r'^(.*)\((.+)\)$', key)
+            if match and match.group(1).strip() in self.by_name and normalize(match.group(2)) in self.units:
+                key, unit_code = match.group(1).strip(), self.units[normalize(match.group(2))]
+
+        candidates = self.by_name.get(key)
+        if not candidates:
+            return None, f"Produit inconnu : {name}"
+        if unit_code:
+            if unit_code not in candidates:
+                return None, f"Produit inconnu : {name} ({unite or unit_code})"
+            return candidates[unit_code], None
+        if len(candidates) > 1:
+            return None, f"Produit ambigu : {name} existe en plusieurs unités, précisez la colonne unite"
+        return next(iter(candidates.values())), None
@@ -2,10 +2,11 @@
 Serializers for catalog app.
 """
 from rest_framework import serializers
+from gsa_backend.expansion import SparseFieldsMixin
 from .models import Product, BasePrice, UniteVente
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Product model."""
     unite_vente_display = serializers.CharField(source='get_unite_vente_display', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
@@ -12,11 +12,12 @@ from .serializers import (
     ProductWithPriceSerializer
 )
 from apps.users.permissions import IsReadOnlyOrAuthenticated
+from gsa_backend.expansion import ExpandableQuerysetMixin
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet for Product management."""
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('base_price').all()
     serializer_class = ProductSerializer
     permission_classes = [IsReadOnlyOrAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
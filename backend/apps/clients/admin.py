@@ -2,7 +2,7 @@
 Admin configuration for clients app.
 """
 from django.contrib import admin
-from .models import Client, ClientPrice
+from .models import Client, ClientPrice, ClientPriceBatch, ClientBalance
 
 
 @admin.register(Client)
@@ -21,3 +21,25 @@ class ClientPriceAdmin(admin.ModelAdmin):
     list_filter = ['created_at', 'updated_at']
     search_fields = ['client__nom', 'client__entreprise', 'product__nom']
     ordering = ['client__nom', 'product__nom']
+
+
+@admin.register(ClientPriceBatch)
+class ClientPriceBatchAdmin(admin.ModelAdmin):
+    """Admin interface for ClientPriceBatch model (read-only history)."""
+    list_display = ['type', 'nb_crees', 'nb_modifies', 'created_by', 'created_at']
+    list_filter = ['type', 'created_at']
+    ordering = ['-created_at']
+    readonly_fields = ['type', 'parametres', 'nb_crees', 'nb_modifies', 'changements', 'created_by', 'created_at']
+
+
+@admin.register(ClientBalance)
+class ClientBalanceAdmin(admin.ModelAdmin):
+    """Admin interface for ClientBalance model (read-only, maintained by signals)."""
+    list_display = ['client', 'receivables', 'unpaid_invoice_count', 'avoirs', 'purchase_debts', 'updated_at']
+    search_fields = ['client__nom', 'client__entreprise']
+    ordering = ['client__nom']
+    readonly_fields = [
+        'client', 'receivables', 'unpaid_invoice_count', 'purchase_overpayments',
+        'avoirs', 'avoir_count', 'invoice_overpayments', 'purchase_debts',
+        'unpaid_purchase_count', 'purchase_count', 'updated_at'
+    ]
@@ -5,3 +5,7 @@ class ClientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.clients'
     verbose_name = 'Clients'
+
+    def ready(self):
+        """Import signals when app is ready."""
+        import apps.clients.signals  # noqa
@@ -0,0 +1,32 @@
+"""
+Rebuild client running accounts (ClientBalance) from invoices and purchases.
+Usage: python manage.py rebuild_client_balances [--client ID ...]
+"""
+from django.core.management.base import BaseCommand
+from apps.clients.models import Client, ClientBalance
+
+
+class Command(BaseCommand):
+    help = 'Recompute ClientBalance rows from invoices, payments, avoirs and purchases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--client',
+            type=int,
+            action='append',
+            dest='client_ids',
+            help='Only rebuild the balance of this client (can be repeated).'
+        )
+
+    def handle(self, *args, **options):
+        client_ids = options.get('client_ids')
+        queryset = Client.objects.order_by('pk')
+        if client_ids:
+            queryset = queryset.filter(pk__in=client_ids)
+
+        count = 0
+        for client_id in queryset.values_list('pk', flat=True).iterator():
+            ClientBalance.refresh_for_client(client_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{count} soldes clients recalculés.'))
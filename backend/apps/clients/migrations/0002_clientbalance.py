@@ -0,0 +1,35 @@
+# Generated by Django 4.2.8 on 2026-10-19 06:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receivables', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Factures impayées')),
+                ('unpaid_invoice_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de factures impayées')),
+                ('purchase_overpayments', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Excédents de paiements achats')),
+                ('avoirs', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Avoirs')),
+                ('avoir_count', models.PositiveIntegerField(default=0, verbose_name="Nombre d'avoirs")),
+                ('invoice_overpayments', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Excédents de paiements factures')),
+                ('purchase_debts', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Achats impayés')),
+                ('unpaid_purchase_count', models.PositiveIntegerField(default=0, verbose_name="Nombre d'achats impayés")),
+                ('purchase_count', models.PositiveIntegerField(default=0, verbose_name="Nombre d'achats validés")),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='clients.client', verbose_name='Client')),
+            ],
+            options={
+                'verbose_name': 'Solde client',
+                'verbose_name_plural': 'Soldes clients',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-19 07:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clients', '0002_clientbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientPriceBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('IMPORT', 'Import de fichier'), ('AJUSTEMENT', 'Ajustement en masse')], max_length=20, verbose_name='Type')),
+                ('parametres', models.JSONField(blank=True, default=dict, verbose_name='Paramètres')),
+                ('nb_crees', models.PositiveIntegerField(default=0, verbose_name='Prix créés')),
+                ('nb_modifies', models.PositiveIntegerField(default=0, verbose_name='Prix modifiés')),
+                ('changements', models.JSONField(blank=True, default=list, verbose_name='Changements')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='client_price_batches', to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Modification groupée de prix clients',
+                'verbose_name_plural': 'Modifications groupées de prix clients',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
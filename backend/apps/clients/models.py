@@ -79,3 +79,169 @@ class ClientPrice(models.Model):
 
     def __str__(self):
         return f"{self.client} - {self.product} : {self.prix} €"
+
+
+class PriceBatchType(models.TextChoices):
+    """Bulk client price change types."""
+    IMPORT = 'IMPORT', 'Import de fichier'
+    AJUSTEMENT = 'AJUSTEMENT', 'Ajustement en masse'
+
+
+class ClientPriceBatch(models.Model):
+    """
+    Bulk change of client prices (file import or mass adjustment).
+
+    One row per applied batch: the parameters, the counts and the list of
+    changed prices (before / after), referenced by a single audit entry
+    instead of one entry per price.
+    """
+    type = models.CharField(max_length=20, choices=PriceBatchType.choices, verbose_name='Type')
+    parametres = models.JSONField(default=dict, blank=True, verbose_name='Paramètres')
+    nb_crees = models.PositiveIntegerField(default=0, verbose_name='Prix créés')
+    nb_modifies = models.PositiveIntegerField(default=0, verbose_name='Prix modifiés')
+    changements = models.JSONField(default=list, blank=True, verbose_name='Changements')
+    created_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='client_price_batches',
+        verbose_name='Créé par'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+
+    class Meta:
+        verbose_name = 'Modification groupée de prix clients'
+        verbose_name_plural = 'Modifications groupées de prix clients'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_type_display()} - {self.created_at} ({self.nb_crees} créés, {self.nb_modifies} modifiés)"
+
+
+class ClientBalance(models.Model):
+    """
+    Running account of a client (receivables, credits and supplier debts).
+
+    Maintained by the signals in apps.clients.signals whenever an invoice,
+    payment or purchase of the client changes, so that dues lookups read a
+    single row instead of re-aggregating invoices and purchases.
+    """
+    client = models.OneToOneField(
+        Client,
+        on_delete=models.CASCADE,
+        related_name='balance',
+        verbose_name='Client'
+    )
+    # What the client owes us
+    receivables = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Factures impayées')
+    unpaid_invoice_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de factures impayées')
+    purchase_overpayments = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Excédents de paiements achats')
+    # What we owe the client
+    avoirs = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Avoirs')
+    avoir_count = models.PositiveIntegerField(default=0, verbose_name='Nombre d\'avoirs')
+    invoice_overpayments = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Excédents de paiements factures')
+    purchase_debts = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Achats impayés')
+    unpaid_purchase_count = models.PositiveIntegerField(default=0, verbose_name='Nombre d\'achats impayés')
+    purchase_count = models.PositiveIntegerField(default=0, verbose_name='Nombre d\'achats validés')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')
+
+    class Meta:
+        verbose_name = 'Solde client'
+        verbose_name_plural = 'Soldes clients'
+
+    def __str__(self):
+        return f"Solde {self.client} : dû {self.total_due} € / à rendre {self.total_owed} €"
+
+    @property
+    def total_due(self):
+        """Total the client owes us (unpaid invoices + excess paid on their purchases)."""
+        return self.receivables + self.purchase_overpayments
+
+    @property
+    def total_owed(self):
+        """Total we owe the client (avoirs + invoice overpayments + purchase debts)."""
+        return self.avoirs + self.invoice_overpayments + self.purchase_debts + self.purchase_overpayments
+
+    @classmethod
+    def for_client(cls, client):
+        """
+        Get the balance of a client (no query when loaded with select_related('balance')).
+        Without a stored row (client created before the running accounts, see
+        rebuild_client_balances) the balance is computed but not saved: reads never write.
+        """
+        from gsa_backend.metrics import record_cache_access
+
+        try:
+            balance = client.balance
+        except cls.DoesNotExist:
+            record_cache_access('client_balance', hit=False)
+            balance = cls(client=client)
+            balance._compute_invoice_totals()
+            balance._compute_purchase_totals()
+            return balance
+        record_cache_access('client_balance', hit=True)
+        return balance
+
+    @classmethod
+    def refresh_for_client(cls, client_id):
+        """
+        Recompute the balance of a client from its invoices and purchases.
+        The balance row is locked for the duration of the current transaction
+        so that concurrent refreshes are serialized and the last writer always
+        sees the data committed by the previous one.
+        """
+        from django.db import transaction
+
+        with transaction.atomic():
+            cls.objects.get_or_create(client_id=client_id)
+            balance = cls.objects.select_for_update().get(client_id=client_id)
+            balance._compute_invoice_totals()
+            balance._compute_purchase_totals()
+            balance.save()
+        return balance
+
+    def _compute_invoice_totals(self):
+        """Aggregate invoice figures in a single query."""
+        from django.db.models import Count, F, Q, Sum
+        from apps.billing.models import Invoice, InvoiceStatus
+
+        unpaid = Q(statut=InvoiceStatus.VALIDEE, reste__gt=0)
+        avoir = Q(statut=InvoiceStatus.AVOIR)
+        overpaid = Q(
+            statut__in=[InvoiceStatus.VALIDEE, InvoiceStatus.ACCEPTEE],
+            paye__gt=F('total_ttc')
+        )
+        totals = Invoice.objects.filter(client_id=self.client_id).aggregate(
+            receivables=Sum('reste', filter=unpaid),
+            unpaid_invoice_count=Count('id', filter=unpaid),
+            avoirs=Sum('total_ttc', filter=avoir),
+            avoir_count=Count('id', filter=avoir),
+            invoice_overpayments=Sum(F('paye') - F('total_ttc'), filter=overpaid),
+        )
+        self.receivables = totals['receivables'] or 0
+        self.unpaid_invoice_count = totals['unpaid_invoice_count']
+        self.avoirs = totals['avoirs'] or 0
+        self.avoir_count = totals['avoir_count']
+        self.invoice_overpayments = totals['invoice_overpayments'] or 0
+
+    def _compute_purchase_totals(self):
+        """Aggregate validated purchase figures (client acting as supplier)."""
+        from apps.stock.models import Purchase, PurchaseStatus
+
+        purchases = Purchase.objects.filter(
+            fournisseur_id=self.client_id,
+            statut=PurchaseStatus.VALIDE
+        ).order_by().with_totals().values_list('annotated_total', 'annotated_paye')
+
+        self.purchase_debts = 0
+        self.purchase_overpayments = 0
+        self.unpaid_purchase_count = 0
+        self.purchase_count = 0
+        for total, paid in purchases:
+            self.purchase_count += 1
+            if total > paid:
+                self.purchase_debts += total - paid
+                self.unpaid_purchase_count += 1
+            elif paid > total:
+                self.purchase_overpayments += paid - total
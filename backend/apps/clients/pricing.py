@@ -0,0 +1,102 @@
+"""
+Effective price lists for clients app.
+
+The price of a product for a client is the client's ClientPrice when one
+exists, else the product's BasePrice. The whole price list of a client is
+loaded in one query (products left-joined to the client's overrides and to
+their base price) and cached as {product_id: (prix, is_base_price)}.
+
+The cache key carries two versions: one per client, replaced when a
+ClientPrice of that client changes, and a global one replaced when any
+BasePrice changes (signals.py). Stale lists are never read again and simply
+expire. Bulk writes that bypass signals (queryset.update, bulk_create) must
+call the invalidate functions themselves.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FilteredRelation, Q
+
+from apps.catalog.models import Product
+
+logger = logging.getLogger(__name__)
+
+BASE_VERSION_KEY = 'price_list_version:base'
+
+
+def _client_version_key(client_id):
+    return f'price_list_version:client:{client_id}'
+
+
+def _price_list_key(client_id, base_version, client_version):
+    return f'price_list:{client_id}:{base_version}:{client_version}'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # No version yet (or evicted): start a new one so older entries are never reused
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def load_price_list(client_id):
+    """Compute the effective price list of a client from the database (one query)."""
+    rows = (
+        Product.objects
+        .annotate(override=FilteredRelation('client_prices', condition=Q(client_prices__client_id=client_id)))
+        .filter(Q(override__prix__isnull=False) | Q(base_price__isnull=False))
+        .order_by()
+        .values_list('id', 'override__prix', 'base_price__prix_base')
+    )
+    return {
+        product_id: (prix, False) if prix is not None else (prix_base, True)
+        for product_id, prix, prix_base in rows
+    }
+
+
+def get_price_list(client_id):
+    """Return {product_id: (prix, is_base_price)} for a client, from the cache when possible."""
+    from gsa_backend.metrics import record_cache_access
+
+    prices = None
+    try:
+        versions = cache.get_many([BASE_VERSION_KEY, _client_version_key(client_id)])
+        base_version = versions.get(BASE_VERSION_KEY) or _version(BASE_VERSION_KEY)
+        client_version = versions.get(_client_version_key(client_id)) or _version(_client_version_key(client_id))
+        key = _price_list_key(client_id, base_version, client_version)
+        prices = cache.get(key)
+        record_cache_access('price_list', hit=prices is not None)
+        if prices is None:
+            prices = load_price_list(client_id)
+            cache.set(key, prices, settings.PRICE_LIST_CACHE_TIMEOUT)
+    except Exception as e:
+        # Cache unavailable: fall back to the database
+        logger.warning(f"Price list cache unavailable: {e}")
+        if prices is None:
+            prices = load_price_list(client_id)
+    return prices
+
+
+def get_price(client_id, product_id):
+    """Return (prix, is_base_price) of a product for a client, or None if the product has no price."""
+    return get_price_list(client_id).get(product_id)
+
+
+def invalidate_client_prices(client_id):
+    """Start a new price list version for a client."""
+    try:
+        cache.set(_client_version_key(client_id), uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not invalidate the price list of client {client_id}: {e}")
+
+
+def invalidate_base_prices():
+    """Start a new base price version: every client price list is reloaded."""
+    try:
+        cache.set(BASE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not invalidate the price lists: {e}")
@@ -0,0 +1,276 @@
+"""
+Bulk client pricing for clients app.
+
+Two ways to change many ClientPrice rows at once:
+
+- a file import (CSV/XLSX: client, product, prix) creating or updating the
+  price of each (client, product) pair;
+- a mass adjustment (percentage or amount) of the existing prices matching
+  a filter (product category, sales unit, clients, products).
+
+Both build a plan first (every row validated, nothing written), which is
+either returned as a preview or applied in one transaction with
+bulk_create / bulk_update. The rows to update are locked when the plan is
+applied: if any of them changed since the plan was built (or a row to create
+appeared), nothing is written and PlanConflict is raised. An applied plan is
+recorded as one ClientPriceBatch, and the cached price lists of the affected
+clients are invalidated (bulk writes do not send signals).
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.catalog.models import Product
+from apps.catalog.product_index import ProductIndex
+from gsa_backend.tabular import normalize, parse_integer, read_rows
+from .models import Client, ClientPrice, ClientPriceBatch
+from .pricing import invalidate_client_prices
+
+CENT = Decimal('0.01')
+_PRIX_FIELD = ClientPrice._meta.get_field('prix')
+# Largest price ClientPrice.prix can store (max_digits / decimal_places)
+MAX_PRICE = Decimal(10) ** (_PRIX_FIELD.max_digits - _PRIX_FIELD.decimal_places) - CENT
+
+# Accepted column names (normalized) for each value
+COLUMNS = {
+    'client_id': {'client_id', 'id_client'},
+    'client': {'client', 'nom_client', 'entreprise'},
+    'product_id': {'product_id', 'id_produit'},
+    'product': {'produit', 'product', 'designation', 'article'},
+    'unite': {'unite', 'unite_vente', 'unite_de_vente'},
+    'prix': {'prix', 'prix_client', 'price', 'tarif'},
+}
+REQUIRED_COLUMNS = [
+    (('client', 'client_id'), 'Colonne client introuvable (client ou client_id)'),
+    (('product', 'product_id'), 'Colonne produit introuvable (produit ou product_id)'),
+    (('prix',), 'Colonne prix introuvable'),
+]
+
+
+class PlanConflict(Exception):
+    """Raised when client prices of a plan changed between planning and applying it."""
+
+
+class ClientIndex:
+    """In-memory lookup of clients by id, company name or full name."""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_name = {}
+        for client_id, nom, prenom, entreprise in Client.objects.values_list('id', 'nom', 'prenom', 'entreprise'):
+            self.by_id[client_id] = entreprise or f"{nom} {prenom}".strip()
+            names = {normalize(f"{nom} {prenom}"), normalize(nom)}
+            if entreprise:
+                names.add(normalize(entreprise))
+            for name in names:
+                self.by_name.setdefault(name, set()).add(client_id)
+
+    def resolve(self, client_id=None, name=None):
+        """Return (client_id, error)."""
+        if client_id not in (None, ''):
+            try:
+                number = parse_integer(client_id, minimum=1)
+            except ValueError:
+                return None, f"Identifiant client invalide : {client_id}"
+            if number not in self.by_id:
+                return None, f"Client {number} introuvable"
+            return number, None
+        if not name:
+            return None, 'Client manquant'
+        candidates = self.by_name.get(normalize(name))
+        if not candidates:
+            return None, f"Client inconnu : {name}"
+        if len(candidates) > 1:
+            return None, f"Client ambigu : {name}, utilisez la colonne client_id"
+        return next(iter(candidates)), None
+
+
+def parse_price(raw):
+    """Return (Decimal rounded to the cent, error)."""
+    if raw in (None, ''):
+        return None, 'Prix manquant'
+    try:
+        prix = Decimal(str(raw).replace(',', '.').replace('€', '').replace(' ', ''))
+        if not prix.is_finite() or prix < 0:
+            return None, f'Prix invalide : {raw}'
+        if prix >= MAX_PRICE + CENT / 2:  # would round above MAX_PRICE
+            return None, f'Prix trop élevé : {raw} (maximum {MAX_PRICE})'
+        return prix.quantize(CENT, rounding=ROUND_HALF_UP), None
+    except InvalidOperation:
+        return None, f'Prix invalide : {raw}'
+
+
+def parse_price_file(uploaded_file):
+    """
+    Validate every row of a price file. Returns ({(client_id, product_id): prix},
+    [{'line': n, 'error': message}]). Raises ImportFileError.
+    """
+    clients, products = ClientIndex(), ProductIndex()
+    prices, errors, seen = {}, [], {}
+    rows = read_rows(uploaded_file, COLUMNS, REQUIRED_COLUMNS, settings.CLIENT_PRICE_IMPORT_MAX_ROWS)
+    for line_number, values in rows:
+        client_id, error = clients.resolve(values.get('client_id'), values.get('client'))
+        if not error:
+            product_id, error = products.resolve(values.get('product_id'), values.get('product'), values.get('unite'))
+        if not error:
+            prix, error = parse_price(values.get('prix'))
+        if not error and (client_id, product_id) in seen:
+            error = f'Prix déjà présent ligne {seen[(client_id, product_id)]}'
+        if error:
+            errors.append({'line': line_number, 'error': error})
+            continue
+        seen[(client_id, product_id)] = line_number
+        prices[(client_id, product_id)] = prix
+    return prices, errors
+
+
+def plan_import(prices):
+    """Diff imported prices against the existing ClientPrice rows."""
+    client_ids = {client_id for client_id, _ in prices}
+    existing = {
+        (price.client_id, price.product_id): price
+        for price in ClientPrice.objects.filter(client_id__in=client_ids).only('id', 'client_id', 'product_id', 'prix')
+    }
+    plan = {'create': [], 'update': [], 'unchanged': 0}
+    for (client_id, product_id), prix in prices.items():
+        price = existing.get((client_id, product_id))
+        if price is None:
+            plan['create'].append(ClientPrice(client_id=client_id, product_id=product_id, prix=prix))
+        elif price.prix != prix:
+            plan['update'].append((price, price.prix))
+            price.prix = prix
+        else:
+            plan['unchanged'] += 1
+    return plan
+
+
+def adjustable_prices(categories=None, unites=None, clients=None, products=None):
+    """ClientPrice rows matching the filters of a mass adjustment (None: no filter)."""
+    prices = ClientPrice.objects.all()
+    if categories:
+        prices = prices.filter(product__categorie__in=categories)
+    if unites:
+        prices = prices.filter(product__unite_vente__in=unites)
+    if clients:
+        prices = prices.filter(client_id__in=clients)
+    if products:
+        prices = prices.filter(product_id__in=products)
+    return prices.only('id', 'client_id', 'product_id', 'prix').order_by()
+
+
+def adjusted_price(prix, mode, value):
+    """New price after a percentage or amount adjustment, rounded to the cent."""
+    if mode == 'percent':
+        prix = prix * (1 + value / 100)
+    else:
+        prix = prix + value
+    return prix.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def plan_adjustment(prices, mode, value):
+    """Return (plan, errors) for a mass adjustment; a negative or too large result is an error."""
+    plan = {'create': [], 'update': [], 'unchanged': 0}
+    errors = []
+    for price in prices:
+        prix = adjusted_price(price.prix, mode, value)
+        if prix < 0:
+            errors.append({
+                'client': price.client_id, 'product': price.product_id,
+                'error': f'Prix négatif après ajustement ({price.prix} → {prix})'
+            })
+        elif prix > MAX_PRICE:
+            errors.append({
+                'client': price.client_id, 'product': price.product_id,
+                'error': f'Prix trop élevé après ajustement ({price.prix} → {prix}, maximum {MAX_PRICE})'
+            })
+        elif prix == price.prix:
+            plan['unchanged'] += 1
+        else:
+            plan['update'].append((price, price.prix))
+            price.prix = prix
+    return plan, errors
+
+
+def _changes(plan):
+    """(price, previous price or None) of every created or updated row of a plan."""
+    return [(price, None) for price in plan['create']] + plan['update']
+
+
+def _change_data(price, before):
+    return {
+        'client': price.client_id,
+        'product': price.product_id,
+        'avant': str(before) if before is not None else None,
+        'apres': str(price.prix),
+    }
+
+
+def describe_plan(plan):
+    """JSON-friendly list of the price changes of a plan (names loaded in two queries)."""
+    changes = _changes(plan)
+    client_names = {
+        client.id: str(client) for client in Client.objects.filter(id__in={price.client_id for price, _ in changes})
+    }
+    product_names = dict(
+        Product.objects.filter(id__in={price.product_id for price, _ in changes}).values_list('id', 'nom')
+    )
+    return [
+        dict(
+            _change_data(price, before),
+            client_nom=client_names.get(price.client_id),
+            product_nom=product_names.get(price.product_id),
+        )
+        for price, before in changes
+    ]
+
+
+def summarize_plan(plan):
+    """Counts of a plan."""
+    return {'created': len(plan['create']), 'updated': len(plan['update']), 'unchanged': plan['unchanged']}
+
+
+def _invalidate(client_ids):
+    for client_id in client_ids:
+        invalidate_client_prices(client_id)
+
+
+def apply_plan(plan, batch_type, parametres, user=None):
+    """
+    Write a plan and its ClientPriceBatch in one transaction. Returns the batch.
+    Raises PlanConflict (nothing written) when a price changed since the plan was built.
+    """
+    now = timezone.now()
+    updated = [price for price, _ in plan['update']]
+    for price in updated:
+        price.updated_at = now  # bulk_update skips auto_now
+    client_ids = {price.client_id for price, _ in _changes(plan)}
+    try:
+        with transaction.atomic():
+            # Lock the rows to update: a concurrent single-price edit is never silently overwritten
+            current = dict(
+                ClientPrice.objects.select_for_update().filter(pk__in=[price.pk for price in updated])
+                .order_by('pk').values_list('pk', 'prix')
+            )
+            conflicts = sum(1 for price, before in plan['update'] if current.get(price.pk) != before)
+            if conflicts:
+                raise PlanConflict(
+                    f'{conflicts} prix modifié(s) ou supprimé(s) entre-temps : aucune modification enregistrée, '
+                    "relancez l'opération"
+                )
+            ClientPrice.objects.bulk_create(plan['create'], batch_size=500)
+            ClientPrice.objects.bulk_update(updated, ['prix', 'updated_at'], batch_size=500)
+            batch = ClientPriceBatch.objects.create(
+                type=batch_type,
+                parametres=parametres,
+                nb_crees=len(plan['create']),
+                nb_modifies=len(updated),
+                changements=[_change_data(price, before) for price, before in _changes(plan)],
+                created_by=user,
+            )
+            transaction.on_commit(lambda: _invalidate(client_ids))
+    except IntegrityError:
+        # A (client, product) price of the plan was created concurrently (unique_together)
+        raise PlanConflict("Prix client créé entre-temps : aucune modification enregistrée, relancez l'opération")
+    return batch
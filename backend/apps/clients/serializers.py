@@ -2,11 +2,13 @@
 Serializers for clients app.
 """
 from rest_framework import serializers
-from .models import Client, ClientPrice
+from .models import Client, ClientPrice, ClientPriceBatch, ClientBalance
+from apps.catalog.models import CategorieProduit, UniteVente
 from apps.catalog.serializers import ProductSerializer
+from gsa_backend.expansion import Expandable, SparseFieldsMixin
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Client model."""
     nom_complet = serializers.CharField(read_only=True)
 
@@ -21,24 +23,48 @@ class ClientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class ClientPriceSerializer(serializers.ModelSerializer):
-    """Serializer for ClientPrice model."""
+class ClientPriceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for ClientPrice model (?expand=product_detail)."""
     client_nom = serializers.CharField(source='client.nom_complet', read_only=True)
-    product_detail = ProductSerializer(source='product', read_only=True)
+    product_nom = serializers.CharField(source='product.nom', read_only=True)
+    product_unite_vente_display = serializers.CharField(source='product.get_unite_vente_display', read_only=True)
 
     class Meta:
         model = ClientPrice
         fields = [
-            'id', 'client', 'client_nom', 'product', 'product_detail',
+            'id', 'client', 'client_nom', 'product', 'product_nom', 'product_unite_vente_display',
             'prix', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = {
+            'product_detail': Expandable(ProductSerializer, 'product', related=['product__base_price']),
+        }
+
+
+class ClientBalanceSerializer(serializers.ModelSerializer):
+    """Serializer for ClientBalance model (read-only)."""
+    total_due = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    total_owed = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = ClientBalance
+        fields = [
+            'total_due', 'total_owed', 'receivables', 'unpaid_invoice_count',
+            'purchase_overpayments', 'avoirs', 'avoir_count', 'invoice_overpayments',
+            'purchase_debts', 'unpaid_purchase_count', 'purchase_count', 'updated_at'
+        ]
+        read_only_fields = fields
 
 
 class ClientDetailSerializer(serializers.ModelSerializer):
-    """Serializer for Client with embedded prices."""
+    """Serializer for Client with embedded prices and running account."""
     nom_complet = serializers.CharField(read_only=True)
     client_prices = ClientPriceSerializer(many=True, read_only=True)
+    balance = serializers.SerializerMethodField()
+
+    def get_balance(self, obj):
+        """Get the client running account."""
+        return ClientBalanceSerializer(ClientBalance.for_client(obj)).data
 
     class Meta:
         model = Client
@@ -46,6 +72,51 @@ class ClientDetailSerializer(serializers.ModelSerializer):
             'id', 'nom', 'prenom', 'nom_complet', 'entreprise', 'email',
             'telephone', 'adresse', 'code_postal', 'ville', 'pays',
             'siret', 'tva_intracommunautaire', 'notes', 'actif',
-            'client_prices', 'created_at', 'updated_at'
+            'client_prices', 'balance', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class ClientPriceImportSerializer(serializers.Serializer):
+    """Upload of a client price file (CSV or XLSX)."""
+    file = serializers.FileField()
+    dry_run = serializers.BooleanField(default=False)
+
+
+class ClientPriceAdjustmentSerializer(serializers.Serializer):
+    """Mass adjustment of the client prices matching the filters (no filter: every price)."""
+    mode = serializers.ChoiceField(choices=['percent', 'amount'])
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+    categories = serializers.ListField(child=serializers.ChoiceField(choices=CategorieProduit.choices), required=False)
+    unites = serializers.ListField(child=serializers.ChoiceField(choices=UniteVente.choices), required=False)
+    clients = serializers.ListField(child=serializers.IntegerField(), required=False)
+    products = serializers.ListField(child=serializers.IntegerField(), required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data['mode'] == 'percent' and data['value'] <= -100:
+            raise serializers.ValidationError('Une baisse doit être inférieure à 100 %.')
+        if data['value'] == 0:
+            raise serializers.ValidationError("La valeur de l'ajustement ne peut pas être nulle.")
+        return data
+
+    def to_parameters(self):
+        """Return the validated parameters as JSON-serializable values."""
+        return {
+            key: str(value) if key == 'value' else value
+            for key, value in self.validated_data.items() if key != 'dry_run'
+        }
+
+
+class ClientPriceBatchSerializer(serializers.ModelSerializer):
+    """Serializer for ClientPriceBatch (without the list of changes)."""
+    type_display = serializers.CharField(source='get_type_display', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = ClientPriceBatch
+        fields = [
+            'id', 'type', 'type_display', 'parametres', 'nb_crees', 'nb_modifies',
+            'created_by', 'created_by_username', 'created_at'
+        ]
+        read_only_fields = fields
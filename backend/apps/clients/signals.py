@@ -0,0 +1,113 @@
+"""
+Signals for clients app - keep ClientBalance in sync with billing and purchases.
+
+Payments are not listened to directly: saving or deleting a Payment always
+goes through Invoice.calculate_totals(), which saves the invoice totals (once,
+and only when they changed) and triggers the invoice handler below. Saves of
+the reminder fields alone (update_payment_status) do not refresh the balance.
+
+Client and base price writes invalidate the cached price lists (pricing.py).
+A client email change resumes its suspended invoice reminders (billing/reminders.py).
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from apps.billing.models import Invoice, InvoiceStatus
+from apps.billing.reminders import resume_reminders
+from apps.catalog.models import BasePrice
+from apps.stock.models import Purchase, PurchaseLine, PurchasePayment, PurchaseStatus
+from .models import Client, ClientBalance, ClientPrice
+from .pricing import invalidate_base_prices, invalidate_client_prices
+
+# Invoice fields that have an impact on the client balance
+INVOICE_BALANCE_FIELDS = {'client', 'statut', 'total_ttc', 'paye', 'reste'}
+
+
+@receiver(pre_save, sender=Client)
+def client_saving(sender, instance, **kwargs):
+    """Remember the email of a client before it is saved (see client_saved)."""
+    if instance.pk:
+        instance._previous_email = Client.objects.filter(pk=instance.pk).values_list('email', flat=True).first()
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, created=False, **kwargs):
+    """
+    Give a new client its (empty) running account, so reads never have to build it.
+    A changed email puts the reminders suspended for lack of an address back in the queue.
+    """
+    if created:
+        ClientBalance.objects.get_or_create(client=instance)
+    elif instance.email != getattr(instance, '_previous_email', instance.email):
+        resume_reminders(instance.pk)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, update_fields=None, **kwargs):
+    """Refresh the client balance when a non-draft invoice changes."""
+    if instance.statut == InvoiceStatus.BROUILLON:
+        # Drafts never count in the balance
+        return
+    if update_fields and not INVOICE_BALANCE_FIELDS.intersection(update_fields):
+        return
+    ClientBalance.refresh_for_client(instance.client_id)
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    """Refresh the client balance when an invoice is deleted."""
+    ClientBalance.refresh_for_client(instance.client_id)
+
+
+@receiver(pre_save, sender=Purchase)
+def purchase_saving(sender, instance, **kwargs):
+    """Remember the supplier and status of a purchase before it is saved (see purchase_changed)."""
+    if instance.pk:
+        instance._balance_previous = (
+            Purchase.objects.filter(pk=instance.pk).values_list('fournisseur_id', 'statut').first()
+        )
+
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def purchase_changed(sender, instance, **kwargs):
+    """
+    Refresh the supplier balance when a validated purchase changes, and the
+    previous supplier's when the purchase changed supplier or left VALIDE.
+    """
+    suppliers = set()
+    if instance.fournisseur_id and instance.statut == PurchaseStatus.VALIDE:
+        suppliers.add(instance.fournisseur_id)
+    previous = getattr(instance, '_balance_previous', None)
+    if previous and previous[0] and previous[1] == PurchaseStatus.VALIDE:
+        suppliers.add(previous[0])
+    for supplier_id in suppliers:
+        ClientBalance.refresh_for_client(supplier_id)
+
+
+@receiver(post_save, sender=PurchaseLine)
+@receiver(post_delete, sender=PurchaseLine)
+@receiver(post_save, sender=PurchasePayment)
+@receiver(post_delete, sender=PurchasePayment)
+def purchase_detail_changed(sender, instance, **kwargs):
+    """Refresh the supplier balance when a line or payment of a validated purchase changes."""
+    try:
+        purchase = instance.purchase
+    except Purchase.DoesNotExist:
+        return
+    purchase_changed(Purchase, purchase)
+
+
+@receiver(post_save, sender=ClientPrice)
+@receiver(post_delete, sender=ClientPrice)
+def client_price_changed(sender, instance, **kwargs):
+    """Invalidate the cached price list of the client."""
+    client_id = instance.client_id
+    transaction.on_commit(lambda: invalidate_client_prices(client_id))
+
+
+@receiver(post_save, sender=BasePrice)
+@receiver(post_delete, sender=BasePrice)
+def base_price_changed(sender, instance, **kwargs):
+    """Invalidate every cached price list."""
+    transaction.on_commit(invalidate_base_prices)
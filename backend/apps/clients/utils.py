@@ -6,7 +6,10 @@ from datetime import datetime, date
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.db.models import Sum, Q
-from .models import Client
+from gsa_backend.metrics import track_pdf_render
+from gsa_backend.pdf import PDFUnavailable, is_pdf_available, render_pdf, unavailable_reason
+from gsa_backend.periods import date_range_q
+from .models import Client, ClientBalance
 from apps.billing.models import Invoice, InvoiceStatus
 
 
@@ -21,10 +24,10 @@ def get_clients_with_dues_at_date(target_date):
     for client in clients:
         # Get all validated invoices with remaining balance up to target date
         invoices = Invoice.objects.filter(
+            date_range_q('validated_at', end=target_date),
             client=client,
             statut=InvoiceStatus.VALIDEE,
-            reste__gt=0,
-            validated_at__date__lte=target_date
+            reste__gt=0
         )
         total_due = invoices.aggregate(total=Sum('reste'))['total'] or 0
         
@@ -41,26 +44,17 @@ def get_clients_with_dues_at_date(target_date):
     return clients_data
 
 
-# Try to import WeasyPrint, but make it optional
-try:
-    from weasyprint import HTML, CSS
-    from weasyprint.text.fonts import FontConfiguration
-    WEASYPRINT_AVAILABLE = True
-except (ImportError, OSError) as e:
-    WEASYPRINT_AVAILABLE = False
-    WEASYPRINT_ERROR = str(e)
-
-
+@track_pdf_render('clients_report')
 def generate_clients_pdf(target_date):
     """
     Generate PDF for clients report with dues at a specific date.
     Returns the file path relative to MEDIA_ROOT.
     Raises Exception if WeasyPrint is not available.
     """
-    if not WEASYPRINT_AVAILABLE:
-        raise Exception(
+    if not is_pdf_available():
+        raise PDFUnavailable(
             f"PDF generation is not available. WeasyPrint dependencies are missing. "
-            f"Error: {WEASYPRINT_ERROR if 'WEASYPRINT_ERROR' in globals() else 'Unknown error'}"
+            f"Error: {unavailable_reason() or 'Unknown error'}"
         )
     
     # Ensure reports directory exists
@@ -87,30 +81,24 @@ def generate_clients_pdf(target_date):
     })
     
     # Generate PDF
-    font_config = FontConfiguration()
-    pdf_file = HTML(string=html_content)
-    
-    # Generate PDF
-    pdf_file.write_pdf(
-        target=filepath,
-        font_config=font_config
-    )
+    render_pdf(html_content, filepath)
     
     # Return relative path
     relative_path = f"reports/{filename}"
     return relative_path
 
 
+@track_pdf_render('client_detail')
 def generate_client_detail_pdf(client):
     """
     Generate PDF for client detail with invoices, payments, purchases, and financial summary.
     Returns the file path relative to MEDIA_ROOT.
     Raises Exception if WeasyPrint is not available.
     """
-    if not WEASYPRINT_AVAILABLE:
-        raise Exception(
+    if not is_pdf_available():
+        raise PDFUnavailable(
             f"PDF generation is not available. WeasyPrint dependencies are missing. "
-            f"Error: {WEASYPRINT_ERROR if 'WEASYPRINT_ERROR' in globals() else 'Unknown error'}"
+            f"Error: {unavailable_reason() or 'Unknown error'}"
         )
     
     from apps.billing.models import Invoice, InvoiceStatus, Payment, CompanySettings
@@ -138,36 +126,27 @@ def generate_client_detail_pdf(client):
     invoices = Invoice.objects.filter(client=client).order_by('-created_at')
     
     # Calculate invoice totals
-    total_invoices = invoices.aggregate(total=Sum('total_ttc'))['total'] or 0
-    total_paid = invoices.aggregate(total=Sum('paye'))['total'] or 0
-    total_due = invoices.filter(statut=InvoiceStatus.VALIDEE, reste__gt=0).aggregate(total=Sum('reste'))['total'] or 0
-    
-    # Calculate excess payments on invoices
-    excess_invoice_payments = 0
-    for invoice in invoices.filter(statut__in=[InvoiceStatus.VALIDEE, InvoiceStatus.ACCEPTEE]):
-        if float(invoice.paye) > float(invoice.total_ttc):
-            excess_invoice_payments += (float(invoice.paye) - float(invoice.total_ttc))
+    totals = invoices.aggregate(total_invoices=Sum('total_ttc'), total_paid=Sum('paye'))
+    total_invoices = totals['total_invoices'] or 0
+    total_paid = totals['total_paid'] or 0
+    
+    # Dues, credits and supplier debts come from the client running account
+    balance = ClientBalance.for_client(client)
+    total_due = balance.receivables
+    excess_invoice_payments = float(balance.invoice_overpayments)
+    total_avoirs = balance.avoirs
+    total_unpaid_purchases = float(balance.purchase_debts)
+    excess_purchase_payments = float(balance.purchase_overpayments)
+    total_owed = float(balance.total_owed)
     
     # Get avoirs
     avoirs = Invoice.objects.filter(client=client, statut=InvoiceStatus.AVOIR)
-    total_avoirs = avoirs.aggregate(total=Sum('total_ttc'))['total'] or 0
     
     # Get all payments for this client's invoices
-    payments = Payment.objects.filter(invoice__client=client).order_by('-date')
-    
-    # Calculate purchases (if client is also a supplier)
-    purchases = Purchase.objects.filter(fournisseur=client, statut=PurchaseStatus.VALIDE)
-    total_unpaid_purchases = 0
-    excess_purchase_payments = 0
-    for purchase in purchases:
-        purchase_rest = float(purchase.reste)
-        if purchase_rest > 0:
-            total_unpaid_purchases += purchase_rest
-        if float(purchase.paye) > float(purchase.total):
-            excess_purchase_payments += (float(purchase.paye) - float(purchase.total))
-    
-    # Calculate total owed to client
-    total_owed = float(total_avoirs) + excess_invoice_payments + float(total_unpaid_purchases) + float(excess_purchase_payments)
+    payments = Payment.objects.filter(invoice__client=client).select_related('invoice').order_by('-date')
+    
+    # Get purchases (if client is also a supplier)
+    purchases = Purchase.objects.filter(fournisseur=client, statut=PurchaseStatus.VALIDE).with_totals()
     
     # Format filename
     filename = f"client_{client.id}_{client.nom_complet.replace(' ', '_')}.pdf"
@@ -193,14 +172,7 @@ def generate_client_detail_pdf(client):
     })
     
     # Generate PDF
-    font_config = FontConfiguration()
-    pdf_file = HTML(string=html_content)
-    
-    # Generate PDF
-    pdf_file.write_pdf(
-        target=filepath,
-        font_config=font_config
-    )
+    render_pdf(html_content, filepath)
     
     # Return relative path
     relative_path = f"reports/{filename}"
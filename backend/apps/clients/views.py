@@ -6,17 +6,24 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from .models import Client, ClientPrice
+from .models import Client, ClientPrice, ClientBalance
 from .serializers import (
     ClientSerializer,
     ClientPriceSerializer,
+    ClientPriceImportSerializer,
+    ClientPriceAdjustmentSerializer,
+    ClientPriceBatchSerializer,
     ClientDetailSerializer
 )
 from apps.users.permissions import IsReadOnlyOrAuthenticated, IsCommercial
 from apps.audit.utils import create_audit_log
+from gsa_backend.concurrency import document_endpoint
+from gsa_backend.expansion import ExpandableQuerysetMixin
 from apps.catalog.models import Product
+from .pricing import get_price, get_price_list
 from .utils import generate_client_detail_pdf
-from django.http import FileResponse
+from gsa_backend.periods import report_date_param
+from gsa_backend.sendfile import file_response
 from django.conf import settings
 import os
 
@@ -32,6 +39,15 @@ class ClientViewSet(viewsets.ModelViewSet):
     ordering_fields = ['nom', 'created_at', 'updated_at']
     ordering = ['nom']
 
+    def get_queryset(self):
+        """Prefetch the client prices only where they are serialized, join the running account where it is read."""
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('client_prices__product')
+        if self.action in ('retrieve', 'total_due', 'total_owed_to_client'):
+            queryset = queryset.select_related('balance')
+        return queryset
+
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == 'retrieve':
@@ -72,9 +88,32 @@ class ClientViewSet(viewsets.ModelViewSet):
         serializer = ClientPriceSerializer(prices, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def price_list(self, request, pk=None):
+        """
+        Effective price of every product for a client (client price, else base price),
+        from the cached price list. Optional filter: products=1,2,3
+        """
+        client = self.get_object()
+        prices = get_price_list(client.id)
+        products = request.query_params.get('products')
+        if products:
+            try:
+                wanted = {int(product_id) for product_id in products.split(',') if product_id.strip()}
+            except ValueError:
+                return Response({'error': 'products must be a comma-separated list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+            prices = {product_id: price for product_id, price in prices.items() if product_id in wanted}
+        return Response({
+            'client': client.id,
+            'prices': [
+                {'product': product_id, 'prix': str(prix), 'is_base_price': is_base_price}
+                for product_id, (prix, is_base_price) in sorted(prices.items())
+            ],
+        })
+
     @action(detail=False, methods=['get'])
     def price_for_product(self, request):
-        """Get client price for a specific product."""
+        """Get client price for a specific product (client price, else base price)."""
         client_id = request.query_params.get('client_id')
         product_id = request.query_params.get('product_id')
         
@@ -83,159 +122,64 @@ class ClientViewSet(viewsets.ModelViewSet):
                 {'error': 'client_id and product_id are required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        try:
-            client_price = ClientPrice.objects.get(
-                client_id=client_id,
-                product_id=product_id
+        if not client_id.isdigit() or not product_id.isdigit():
+            return Response(
+                {'error': 'client_id and product_id must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            serializer = ClientPriceSerializer(client_price)
-            return Response(serializer.data)
-        except ClientPrice.DoesNotExist:
-            # Return base price if no client-specific price
-            try:
-                product = Product.objects.get(pk=product_id)
-                base_price = product.base_price.prix_base if hasattr(product, 'base_price') else None
-                return Response({
-                    'client': int(client_id),
-                    'product': int(product_id),
-                    'prix': base_price,
-                    'is_base_price': True
-                })
-            except Product.DoesNotExist:
+        
+        price = get_price(int(client_id), int(product_id))
+        if price is None:
+            if not Product.objects.filter(pk=product_id).exists():
                 return Response(
                     {'error': 'Product not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            price = (None, True)
+        return Response({
+            'client': int(client_id),
+            'product': int(product_id),
+            'prix': str(price[0]) if price[0] is not None else None,
+            'is_base_price': price[1]
+        })
 
     @action(detail=True, methods=['get'])
     def total_due(self, request, pk=None):
         """Get total amount due for unpaid invoices of this client.
         Also includes excess payments on purchases (if we paid more than purchase amount)."""
-        from django.db.models import Sum
-        from apps.billing.models import Invoice, InvoiceStatus
-        from apps.stock.models import Purchase, PurchaseStatus
-        
         client = self.get_object()
-        
-        # Calculate total due from validated invoices with reste > 0
-        unpaid_invoices = Invoice.objects.filter(
-            client=client,
-            statut=InvoiceStatus.VALIDEE,
-            reste__gt=0
-        )
-        total_due_invoices = unpaid_invoices.aggregate(
-            total=Sum('reste')
-        )['total'] or 0
-        
-        # Calculate excess payments on purchases (if client is also a supplier)
-        # Si on a payé plus que le montant de l'achat, l'excédent est ce que le client nous doit
-        purchases = Purchase.objects.filter(
-            fournisseur=client,
-            statut=PurchaseStatus.VALIDE
-        )
-        excess_purchase_payments = 0
-        
-        for purchase in purchases:
-            purchase_total = purchase.total
-            purchase_paid = purchase.paye
-            
-            # Si on a payé plus que le montant de l'achat, l'excédent est ce que le client nous doit
-            if purchase_paid > purchase_total:
-                excess_purchase_payments += (purchase_paid - purchase_total)
+        balance = ClientBalance.for_client(client)
         
         # Total dû = factures impayées + excédents de paiements sur purchases
-        total_due = float(total_due_invoices) + float(excess_purchase_payments)
-        
-        # Count unpaid invoices
-        unpaid_count = unpaid_invoices.count()
-        
         return Response({
             'client_id': client.id,
-            'total_due': total_due,
-            'unpaid_count': unpaid_count,
-            'total_due_invoices': float(total_due_invoices),
-            'excess_purchase_payments': float(excess_purchase_payments)
+            'total_due': float(balance.total_due),
+            'unpaid_count': balance.unpaid_invoice_count,
+            'total_due_invoices': float(balance.receivables),
+            'excess_purchase_payments': float(balance.purchase_overpayments)
         })
 
     @action(detail=True, methods=['get'])
     def total_owed_to_client(self, request, pk=None):
         """Get total amount that the company owes to this client (credits/avoirs + unpaid purchases + excess payments on purchases)."""
-        from django.db.models import Sum
-        from apps.billing.models import Invoice, InvoiceStatus
-        from apps.stock.models import Purchase, PurchaseStatus
-        
         client = self.get_object()
-        
-        # Calculate total from avoir invoices (credit notes)
-        avoir_invoices = Invoice.objects.filter(
-            client=client,
-            statut=InvoiceStatus.AVOIR
-        )
-        total_avoirs = avoir_invoices.aggregate(
-            total=Sum('total_ttc')
-        )['total'] or 0
-        
-        # Calculate excess payments on invoices (facture par facture)
-        # Si le client a payé plus que le montant d'une facture, l'excédent est un crédit
-        validated_invoices = Invoice.objects.filter(
-            client=client,
-            statut__in=[InvoiceStatus.VALIDEE, InvoiceStatus.ACCEPTEE]
-        )
-        
-        excess_invoice_payments = 0
-        for invoice in validated_invoices:
-            invoice_total = float(invoice.total_ttc)
-            invoice_paid = float(invoice.paye)
-            # Si le client a payé plus que le montant de la facture, l'excédent est un crédit
-            if invoice_paid > invoice_total:
-                excess_invoice_payments += (invoice_paid - invoice_total)
-        
-        # Calculate purchases (if client is also a supplier)
-        purchases = Purchase.objects.filter(
-            fournisseur=client,
-            statut=PurchaseStatus.VALIDE
-        ).prefetch_related('payments')
-        
-        total_unpaid_purchases = 0
-        excess_purchase_payments = 0
-        purchase_count = 0
-        
-        for purchase in purchases:
-            purchase_total = float(purchase.total)
-            purchase_paid = float(purchase.paye)
-            purchase_rest = float(purchase.reste)
-            
-            # Reste à payer sur les purchases
-            if purchase_rest > 0:
-                total_unpaid_purchases += purchase_rest
-                purchase_count += 1
-            
-            # Excédents de paiements sur purchases (si on a payé plus que le montant de l'achat)
-            # Ces excédents sont des crédits qu'on doit au client/fournisseur
-            if purchase_paid > purchase_total:
-                excess = purchase_paid - purchase_total
-                excess_purchase_payments += excess
+        balance = ClientBalance.for_client(client)
         
         # What we owe = avoirs + excess payments on invoices + unpaid purchases + excess payments on purchases
-        total_owed = float(total_avoirs) + excess_invoice_payments + float(total_unpaid_purchases) + float(excess_purchase_payments)
-        
-        # Count avoir invoices
-        avoir_count = avoir_invoices.count()
-        
         return Response({
             'client_id': client.id,
-            'total_owed': total_owed,
-            'avoir_count': avoir_count,
-            'avoirs_amount': float(total_avoirs),
-            'excess_invoice_payments': excess_invoice_payments,
-            'unpaid_purchases_amount': float(total_unpaid_purchases),
-            'excess_purchase_payments': float(excess_purchase_payments),
-            'unpaid_purchases_count': purchase_count,
-            'has_purchases': purchases.exists()
+            'total_owed': float(balance.total_owed),
+            'avoir_count': balance.avoir_count,
+            'avoirs_amount': float(balance.avoirs),
+            'excess_invoice_payments': float(balance.invoice_overpayments),
+            'unpaid_purchases_amount': float(balance.purchase_debts),
+            'excess_purchase_payments': float(balance.purchase_overpayments),
+            'unpaid_purchases_count': balance.unpaid_purchase_count,
+            'has_purchases': balance.purchase_count > 0
         })
 
     @action(detail=True, methods=['get'])
+    @document_endpoint('client_detail')
     def print_client_detail(self, request, pk=None):
         """Generate and download PDF for client detail with invoices."""
         client = self.get_object()
@@ -250,10 +194,11 @@ class ClientViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            return FileResponse(
-                open(full_path, 'rb'),
-                content_type='application/pdf',
-                filename=f"client_{client.id}_{client.nom_complet.replace(' ', '_')}.pdf"
+            return file_response(
+                full_path,
+                'application/pdf',
+                filename=f"client_{client.id}_{client.nom_complet.replace(' ', '_')}.pdf",
+                as_attachment=False
             )
         except Exception as e:
             return Response(
@@ -262,50 +207,23 @@ class ClientViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @document_endpoint('clients_report')
     def print_clients(self, request):
         """Generate PDF report of clients with dues at a specific date."""
         from .utils import generate_clients_pdf
-        from django.http import FileResponse
         from django.conf import settings
-        from datetime import datetime
-        from calendar import monthrange
         import os
         
         date_param = request.query_params.get('date', None)
-        if not date_param:
-            return Response(
-                {'error': 'Date parameter is required (format: YYYY-MM-DD, YYYY-MM, or YYYY)'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Parse date parameter
-        try:
-            if len(date_param) == 4:  # YYYY
-                target_date = datetime.strptime(date_param, '%Y').date().replace(month=12, day=31)
-            elif len(date_param) == 7:  # YYYY-MM
-                target_date = datetime.strptime(date_param, '%Y-%m').date()
-                # Get last day of month
-                last_day = monthrange(target_date.year, target_date.month)[1]
-                target_date = target_date.replace(day=last_day)
-            elif len(date_param) == 10:  # YYYY-MM-DD
-                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-            else:
-                raise ValueError("Invalid date format")
-        except ValueError as e:
-            return Response(
-                {'error': f'Invalid date format: {str(e)}. Use YYYY-MM-DD, YYYY-MM, or YYYY'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        target_date, error_response = report_date_param(request)
+        if error_response:
+            return error_response
         
         try:
             pdf_path = generate_clients_pdf(target_date)
             full_path = os.path.join(settings.MEDIA_ROOT, pdf_path)
             
-            return FileResponse(
-                open(full_path, 'rb'),
-                content_type='application/pdf',
-                filename=f"clients_{date_param}.pdf"
-            )
+            return file_response(full_path, 'application/pdf', f"clients_{date_param}.pdf", as_attachment=False)
         except Exception as e:
             return Response(
                 {'error': f'Error generating PDF: {str(e)}'},
@@ -313,7 +231,7 @@ class ClientViewSet(viewsets.ModelViewSet):
             )
 
 
-class ClientPriceViewSet(viewsets.ModelViewSet):
+class ClientPriceViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet for ClientPrice management."""
     queryset = ClientPrice.objects.select_related('client', 'product').all()
     serializer_class = ClientPriceSerializer
@@ -363,3 +281,96 @@ class ClientPriceViewSet(viewsets.ModelViewSet):
             request=self.request
         )
         instance.delete()
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_prices(self, request):
+        """
+        Create or update client prices from a CSV/XLSX file (client, produit, prix).
+        All rows are validated first: any error rejects the whole file.
+        dry_run=true returns the changes without writing them.
+        """
+        from gsa_backend.tabular import ImportFileError
+        from .models import PriceBatchType
+        from .repricing import describe_plan, parse_price_file, plan_import, summarize_plan
+
+        serializer = ClientPriceImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        uploaded_file = serializer.validated_data['file']
+        try:
+            prices, errors = parse_price_file(uploaded_file)
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if errors:
+            return Response(
+                {'error': f'{len(errors)} ligne(s) invalide(s) : aucune modification enregistrée', 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        plan = plan_import(prices)
+        if serializer.validated_data['dry_run']:
+            return Response({'dry_run': True, 'summary': summarize_plan(plan), 'changes': describe_plan(plan)})
+        return self._apply_batch(
+            plan, PriceBatchType.IMPORT, {'file': uploaded_file.name}, f'Import prix clients ({uploaded_file.name})'
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk_adjust(self, request):
+        """
+        Increase or decrease by a percentage or an amount every client price matching
+        the filters (categories, unites, clients, products).
+        dry_run=true returns the changes without writing them.
+        """
+        from .models import PriceBatchType
+        from .repricing import adjustable_prices, describe_plan, plan_adjustment, summarize_plan
+
+        serializer = ClientPriceAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        prices = adjustable_prices(
+            categories=data.get('categories'),
+            unites=data.get('unites'),
+            clients=data.get('clients'),
+            products=data.get('products'),
+        )
+        plan, errors = plan_adjustment(prices, data['mode'], data['value'])
+        if errors:
+            return Response(
+                {'error': f'{len(errors)} prix invalide(s) après ajustement : aucune modification enregistrée', 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if data['dry_run']:
+            return Response({'dry_run': True, 'summary': summarize_plan(plan), 'changes': describe_plan(plan)})
+        unit = '%' if data['mode'] == 'percent' else '€'
+        return self._apply_batch(
+            plan, PriceBatchType.AJUSTEMENT, serializer.to_parameters(),
+            f'Ajustement prix clients {data["value"]:+} {unit}'
+        )
+
+    @action(detail=False, methods=['get'])
+    def batches(self, request):
+        """History of the bulk client price changes."""
+        from .models import ClientPriceBatch
+
+        batches = ClientPriceBatch.objects.select_related('created_by').defer('changements')[:100]
+        return Response(ClientPriceBatchSerializer(batches, many=True).data)
+
+    def _apply_batch(self, plan, batch_type, parametres, reason):
+        """Apply a plan and log its single audit entry in one transaction; return its summary."""
+        from django.db import transaction
+        from .repricing import PlanConflict, apply_plan, summarize_plan
+
+        summary = summarize_plan(plan)
+        try:
+            with transaction.atomic():
+                batch = apply_plan(plan, batch_type, parametres, self.request.user)
+                create_audit_log(
+                    instance=batch,
+                    action=f'BULK_CLIENT_PRICES_{batch.type}',
+                    user=self.request.user,
+                    after_data={'batch': batch.id, 'parametres': batch.parametres, **summary},
+                    reason=reason,
+                    request=self.request
+                )
+        except PlanConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'dry_run': False, 'batch': batch.id, 'summary': summary})
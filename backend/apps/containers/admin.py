@@ -2,7 +2,7 @@
 Admin configuration for containers app.
 """
 from django.contrib import admin
-from .models import Container, ManifestLine, ReceivedLine, UnloadingSession, UnloadingEvent
+from .models import Container, ManifestLine, ReceivedLine, ProductBreakageStat, UnloadingSession, UnloadingEvent
 
 
 @admin.register(Container)
@@ -32,13 +32,29 @@ class ReceivedLineAdmin(admin.ModelAdmin):
     ordering = ['container', 'product__nom']
 
 
+@admin.register(ProductBreakageStat)
+class ProductBreakageStatAdmin(admin.ModelAdmin):
+    """Admin interface for ProductBreakageStat model (maintained automatically)."""
+    list_display = ['product', 'annee', 'nb_conteneurs', 'qty_prevue', 'qty_recue', 'casse', 'taux_casse', 'manquant', 'excedent']
+    list_filter = ['annee']
+    search_fields = ['product__nom']
+    ordering = ['-annee', 'product__nom']
+    readonly_fields = [
+        'product', 'annee', 'nb_conteneurs', 'qty_prevue', 'qty_recue', 'casse', 'manquant', 'excedent', 'updated_at'
+    ]
+
+
 @admin.register(UnloadingSession)
 class UnloadingSessionAdmin(admin.ModelAdmin):
     """Admin interface for UnloadingSession model."""
-    list_display = ['container', 'nb_personnes', 'somme_allouee', 'started_at', 'ended_at', 'created_at']
+    list_display = [
+        'container', 'nb_personnes', 'somme_allouee', 'started_at', 'ended_at',
+        'duree_travail', 'duree_pause', 'qty_dechargee', 'created_at'
+    ]
     list_filter = ['created_at']
     search_fields = ['container__ref']
     ordering = ['-created_at']
+    readonly_fields = ['duree_travail', 'duree_pause', 'nb_pauses', 'en_pause', 'phase_started_at', 'qty_dechargee']
 
 
 @admin.register(UnloadingEvent)
@@ -0,0 +1,155 @@
+"""
+Bulk import of manifest and received lines for containers app.
+
+An uploaded CSV or XLSX file is read row by row (gsa_backend.tabular),
+product names are resolved through an in-memory index of the catalog built
+with one query (apps.catalog.product_index), and every row is validated
+before anything is written. The resulting diff against the
+container's current lines is either returned as a preview (dry run) or
+applied atomically with bulk_create / bulk_update (and a bulk delete of the
+lines missing from the file in replace mode).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.catalog.product_index import ProductIndex
+from gsa_backend.tabular import MAX_INTEGER, ImportFileError, parse_integer, read_rows
+from .models import ManifestLine, ReceivedLine
+
+
+class ImportKind:
+    """What a file describes: the manifest (expected) or the reception (actual)."""
+
+    def __init__(self, name, model, quantity_field, fields, min_qty):
+        self.name = name
+        self.model = model
+        self.quantity_field = quantity_field
+        self.fields = fields
+        self.min_qty = min_qty
+
+
+KINDS = {
+    'manifest': ImportKind('manifest', ManifestLine, 'qty_prevue', ['qty_prevue'], min_qty=1),
+    'reception': ImportKind('reception', ReceivedLine, 'qty_recue', ['qty_recue', 'casse', 'commentaire'], min_qty=0),
+}
+
+# Accepted column names (normalized) for each value
+COLUMNS = {
+    'product_id': {'product_id', 'id_produit', 'id'},
+    'product': {'produit', 'product', 'nom', 'designation', 'article'},
+    'unite': {'unite', 'unite_vente', 'unite_de_vente'},
+    'quantity': {'quantite', 'qte', 'qty', 'quantity'},
+    'qty_prevue': {'qty_prevue', 'quantite_prevue', 'qte_prevue'},
+    'qty_recue': {'qty_recue', 'quantite_recue', 'qte_recue'},
+    'casse': {'casse', 'qty_casse', 'quantite_cassee'},
+    'commentaire': {'commentaire', 'comment', 'remarque'},
+}
+REQUIRED_COLUMNS = [(
+    ('product', 'product_id'), 'Colonne produit introuvable (produit ou product_id)'
+)]
+
+
+def _quantity(values, *columns, required=True, minimum=0):
+    """Return (int, error) from the first non-empty column."""
+    raw = next((values[column] for column in columns if values.get(column) not in (None, '')), '')
+    if raw == '':
+        return (None, 'Quantité manquante') if required else (0, None)
+    try:
+        return parse_integer(raw, minimum=minimum), None
+    except ValueError:
+        return None, f'Quantité invalide : {raw} (entier entre {minimum} et {MAX_INTEGER} attendu)'
+
+
+def parse_lines(uploaded_file, kind):
+    """
+    Validate every row of the file in one pass. Returns ({product_id: field values},
+    [{'line': n, 'error': message}], product index). Raises ImportFileError.
+    """
+    index = ProductIndex()
+    lines, errors, seen = {}, [], {}
+    rows = read_rows(uploaded_file, COLUMNS, REQUIRED_COLUMNS, settings.CONTAINER_IMPORT_MAX_ROWS)
+    for line_number, values in rows:
+        product_id, error = index.resolve(values.get('product_id'), values.get('product'), values.get('unite'))
+        if error:
+            errors.append({'line': line_number, 'error': error})
+            continue
+        if product_id in seen:
+            errors.append({'line': line_number, 'error': f'Produit déjà présent ligne {seen[product_id]}'})
+            continue
+        seen[product_id] = line_number
+
+        quantity, error = _quantity(values, kind.quantity_field, 'quantity', minimum=kind.min_qty)
+        if error:
+            errors.append({'line': line_number, 'error': error})
+            continue
+        fields = {kind.quantity_field: quantity}
+        if kind.name == 'reception':
+            casse, error = _quantity(values, 'casse', required=False)
+            if error is None and casse > quantity:
+                error = f'Casse ({casse}) supérieure à la quantité reçue ({quantity})'
+            if error:
+                errors.append({'line': line_number, 'error': error})
+                continue
+            fields['casse'] = casse
+            fields['commentaire'] = values.get('commentaire', '')
+        lines[product_id] = fields
+    return lines, errors, index
+
+
+def plan_import(container, kind, lines, replace=False):
+    """Diff the parsed lines against the container's current lines."""
+    existing = {line.product_id: line for line in kind.model.objects.filter(container=container)}
+    to_create, to_update, unchanged = [], [], 0
+    for product_id, fields in lines.items():
+        line = existing.get(product_id)
+        if line is None:
+            to_create.append(kind.model(container=container, product_id=product_id, **fields))
+            continue
+        before = {field: getattr(line, field) for field in kind.fields}
+        if kind.name == 'reception' and 'commentaire' in fields and not fields['commentaire']:
+            # An empty comment cell keeps the comment already entered
+            fields = dict(fields, commentaire=line.commentaire)
+        if all(before[field] == fields[field] for field in fields):
+            unchanged += 1
+            continue
+        for field, value in fields.items():
+            setattr(line, field, value)
+        to_update.append((line, before))
+    to_delete = [line for product_id, line in existing.items() if product_id not in lines] if replace else []
+    return {'create': to_create, 'update': to_update, 'delete': to_delete, 'unchanged': unchanged}
+
+
+def describe_plan(plan, kind, index):
+    """JSON-friendly preview of an import plan."""
+    def line_data(line):
+        return {
+            'product': line.product_id,
+            'product_nom': index.by_id.get(line.product_id),
+            **{field: getattr(line, field) for field in kind.fields},
+        }
+
+    return {
+        'created': [line_data(line) for line in plan['create']],
+        'updated': [dict(line_data(line), before=before) for line, before in plan['update']],
+        'deleted': [line_data(line) for line in plan['delete']],
+        'unchanged': plan['unchanged'],
+    }
+
+
+def apply_import(plan, kind):
+    """Write an import plan in one transaction."""
+    with transaction.atomic():
+        if plan['delete']:
+            kind.model.objects.filter(pk__in=[line.pk for line in plan['delete']]).delete()
+        kind.model.objects.bulk_create(plan['create'])
+        if plan['update']:
+            lines = [line for line, _ in plan['update']]
+            fields = list(kind.fields)
+            if kind.model is ReceivedLine:
+                # bulk_update skips auto_now
+                now = timezone.now()
+                for line in lines:
+                    line.updated_at = now
+                fields.append('updated_at')
+            kind.model.objects.bulk_update(lines, fields)
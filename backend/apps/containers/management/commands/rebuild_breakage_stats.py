@@ -0,0 +1,14 @@
+"""
+Rebuild the yearly product breakage statistics (ProductBreakageStat) from validated containers.
+Usage: python manage.py rebuild_breakage_stats
+"""
+from django.core.management.base import BaseCommand
+from apps.containers.reconciliation import rebuild_breakage_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute ProductBreakageStat rows from the manifest and received lines of validated containers.'
+
+    def handle(self, *args, **options):
+        count = rebuild_breakage_stats()
+        self.stdout.write(self.style.SUCCESS(f'{count} statistiques de casse recalculées.'))
@@ -0,0 +1,14 @@
+"""
+Rebuild the unloading session summaries (working time, pauses, unloaded quantity) from their events.
+Usage: python manage.py rebuild_unloading_summaries
+"""
+from django.core.management.base import BaseCommand
+from apps.containers.unloading import rebuild_unloading_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored summary of every UnloadingSession from its events and received lines.'
+
+    def handle(self, *args, **options):
+        count = rebuild_unloading_summaries()
+        self.stdout.write(self.style.SUCCESS(f'{count} sessions de déchargement recalculées.'))
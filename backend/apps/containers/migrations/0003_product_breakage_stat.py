@@ -0,0 +1,36 @@
+# Generated by Django 4.2.8 on 2026-10-19 07:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_add_categorie_to_product'),
+        ('containers', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductBreakageStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.PositiveSmallIntegerField(verbose_name='Année')),
+                ('nb_conteneurs', models.PositiveIntegerField(default=0, verbose_name='Nombre de conteneurs')),
+                ('qty_prevue', models.PositiveIntegerField(default=0, verbose_name='Quantité prévue')),
+                ('qty_recue', models.PositiveIntegerField(default=0, verbose_name='Quantité reçue')),
+                ('casse', models.PositiveIntegerField(default=0, verbose_name='Casse')),
+                ('manquant', models.PositiveIntegerField(default=0, verbose_name='Manquant')),
+                ('excedent', models.PositiveIntegerField(default=0, verbose_name='Excédent')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='breakage_stats', to='catalog.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Statistique de casse',
+                'verbose_name_plural': 'Statistiques de casse',
+                'ordering': ['-annee', 'product__nom'],
+                'unique_together': {('product', 'annee')},
+            },
+        ),
+    ]
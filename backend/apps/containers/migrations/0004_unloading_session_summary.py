@@ -0,0 +1,55 @@
+# Generated by Django 4.2.8 on 2026-10-19 07:06
+
+from django.db import migrations, models
+
+
+def fill_session_summaries(apps, schema_editor):
+    """Replay the events of existing sessions (same as manage.py rebuild_unloading_summaries)."""
+    from apps.containers.unloading import rebuild_unloading_summaries
+
+    rebuild_unloading_summaries(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers', '0003_product_breakage_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unloadingsession',
+            name='duree_pause',
+            field=models.PositiveIntegerField(default=0, verbose_name='Durée des pauses (s)'),
+        ),
+        migrations.AddField(
+            model_name='unloadingsession',
+            name='duree_travail',
+            field=models.PositiveIntegerField(default=0, verbose_name='Durée de travail (s)'),
+        ),
+        migrations.AddField(
+            model_name='unloadingsession',
+            name='en_pause',
+            field=models.BooleanField(default=False, verbose_name='En pause'),
+        ),
+        migrations.AddField(
+            model_name='unloadingsession',
+            name='nb_pauses',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de pauses'),
+        ),
+        migrations.AddField(
+            model_name='unloadingsession',
+            name='phase_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Début de la phase en cours'),
+        ),
+        migrations.AddField(
+            model_name='unloadingsession',
+            name='qty_dechargee',
+            field=models.PositiveIntegerField(default=0, verbose_name='Quantité déchargée'),
+        ),
+        migrations.AddIndex(
+            model_name='unloadingsession',
+            index=models.Index(fields=['started_at'], name='containers__started_2106cb_idx'),
+        ),
+        migrations.RunPython(fill_session_summaries, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,7 +1,12 @@
 """
 Container models - Import management and unloading tracking.
 """
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from apps.catalog.models import Product
 
@@ -14,6 +19,28 @@ class ContainerStatus(models.TextChoices):
     VALIDE = 'VALIDE', 'Validé'
 
 
+class ContainerQuerySet(models.QuerySet):
+    """QuerySet for Container with SQL-side quantity totals."""
+
+    def with_totals(self):
+        """Annotate expected, received and broken quantities so the totals cost no extra query."""
+        def lines_total(model, field):
+            return Coalesce(Subquery(
+                model.objects.filter(container=OuterRef('pk'))
+                .order_by()
+                .values('container')
+                .annotate(total=Sum(field))
+                .values('total'),
+                output_field=IntegerField()
+            ), 0)
+
+        return self.annotate(
+            annotated_qty_prevue=lines_total(ManifestLine, 'qty_prevue'),
+            annotated_qty_recue=lines_total(ReceivedLine, 'qty_recue'),
+            annotated_casse=lines_total(ReceivedLine, 'casse'),
+        )
+
+
 class Container(models.Model):
     """Container model."""
     ref = models.CharField(max_length=100, unique=True, verbose_name='Référence')
@@ -37,6 +64,8 @@ class Container(models.Model):
         verbose_name='Validé par'
     )
 
+    objects = ContainerQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Conteneur'
         verbose_name_plural = 'Conteneurs'
@@ -49,6 +78,32 @@ class Container(models.Model):
     def __str__(self):
         return f"{self.ref} - {self.get_statut_display()}"
 
+    @property
+    def total_qty_prevue(self):
+        """Get total expected quantity from manifest lines."""
+        if hasattr(self, 'annotated_qty_prevue'):
+            return self.annotated_qty_prevue
+        return self.manifest_lines.aggregate(total=Sum('qty_prevue'))['total'] or 0
+
+    @property
+    def total_qty_recue(self):
+        """Get total received quantity from received lines."""
+        if hasattr(self, 'annotated_qty_recue'):
+            return self.annotated_qty_recue
+        return self.received_lines.aggregate(total=Sum('qty_recue'))['total'] or 0
+
+    @property
+    def total_casse(self):
+        """Get total broken quantity from received lines."""
+        if hasattr(self, 'annotated_casse'):
+            return self.annotated_casse
+        return self.received_lines.aggregate(total=Sum('casse'))['total'] or 0
+
+    @property
+    def ecart_qty(self):
+        """Received minus expected quantity (negative: missing goods)."""
+        return self.total_qty_recue - self.total_qty_prevue
+
 
 class ManifestLine(models.Model):
     """Expected quantities in container (manifest)."""
@@ -117,6 +172,46 @@ class ReceivedLine(models.Model):
         return f"{self.container.ref} - {self.product} : {self.qty_recue} reçu"
 
 
+class ProductBreakageStat(models.Model):
+    """
+    Reconciliation totals of a product over the containers validated in a year.
+
+    Incremented by apps.containers.reconciliation when a container is
+    validated, so breakage history reads one row per product and year
+    instead of re-aggregating every container line.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='breakage_stats',
+        verbose_name='Produit'
+    )
+    annee = models.PositiveSmallIntegerField(verbose_name='Année')
+    nb_conteneurs = models.PositiveIntegerField(default=0, verbose_name='Nombre de conteneurs')
+    qty_prevue = models.PositiveIntegerField(default=0, verbose_name='Quantité prévue')
+    qty_recue = models.PositiveIntegerField(default=0, verbose_name='Quantité reçue')
+    casse = models.PositiveIntegerField(default=0, verbose_name='Casse')
+    manquant = models.PositiveIntegerField(default=0, verbose_name='Manquant')
+    excedent = models.PositiveIntegerField(default=0, verbose_name='Excédent')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')
+
+    class Meta:
+        verbose_name = 'Statistique de casse'
+        verbose_name_plural = 'Statistiques de casse'
+        unique_together = [['product', 'annee']]
+        ordering = ['-annee', 'product__nom']
+
+    def __str__(self):
+        return f"{self.product} {self.annee} : {self.casse} cassés / {self.qty_recue} reçus"
+
+    @property
+    def taux_casse(self):
+        """Broken share of the received quantity, in percent."""
+        if not self.qty_recue:
+            return None
+        return round(self.casse * 100 / self.qty_recue, 2)
+
+
 class UnloadingEventType(models.TextChoices):
     """Unloading event types."""
     START = 'START', 'Début'
@@ -149,15 +244,57 @@ class UnloadingSession(models.Model):
     started_at = models.DateTimeField(null=True, blank=True, verbose_name='Début')
     ended_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    # Summary maintained by apps.containers.unloading on each event
+    duree_travail = models.PositiveIntegerField(default=0, verbose_name='Durée de travail (s)')
+    duree_pause = models.PositiveIntegerField(default=0, verbose_name='Durée des pauses (s)')
+    nb_pauses = models.PositiveIntegerField(default=0, verbose_name='Nombre de pauses')
+    en_pause = models.BooleanField(default=False, verbose_name='En pause')
+    phase_started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Début de la phase en cours'
+    )
+    qty_dechargee = models.PositiveIntegerField(default=0, verbose_name='Quantité déchargée')
 
     class Meta:
         verbose_name = 'Session de déchargement'
         verbose_name_plural = 'Sessions de déchargement'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['started_at']),
+        ]
 
     def __str__(self):
         return f"Session {self.container.ref} - {self.created_at}"
 
+    def durations(self, now=None):
+        """
+        (working seconds, pause seconds) including the phase still running,
+        computed from the stored summary without reading the events.
+        """
+        travail, pause = self.duree_travail, self.duree_pause
+        if self.phase_started_at and not self.ended_at:
+            elapsed = max(int(((now or timezone.now()) - self.phase_started_at).total_seconds()), 0)
+            if self.en_pause:
+                pause += elapsed
+            else:
+                travail += elapsed
+        return travail, pause
+
+    @property
+    def cout_heure_personne(self):
+        """Allocated amount per person-hour of effective work."""
+        travail = self.durations()[0]
+        if not travail:
+            return None
+        return round(Decimal(self.somme_allouee) * 3600 / (self.nb_personnes * travail), 2)
+
+    @property
+    def cartons_par_heure(self):
+        """Received quantity per hour of effective work."""
+        travail = self.durations()[0]
+        if not travail:
+            return None
+        return round(self.qty_dechargee * 3600 / travail, 1)
+
 
 class UnloadingEvent(models.Model):
     """Event in unloading session (start, pause, resume, end, edit)."""
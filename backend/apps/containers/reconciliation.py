@@ -0,0 +1,175 @@
+"""
+Manifest vs received reconciliation for containers app.
+
+Each (container, product) pair compares the manifest quantity with the
+received quantity: the missing part is a shortfall (manquant), the extra
+part an overage (excedent), and ``casse`` counts the broken units among the
+received ones. Totals are computed in grouped SQL, by product or by
+container, from two queries: manifest lines joined to their received line,
+and received lines absent from the manifest (pure overage).
+
+Validated containers are also added to the yearly ProductBreakageStat rows,
+so the breakage history of a product never re-reads old containers.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, ExtractYear, Greatest
+from django.utils import timezone
+
+from .models import Container, ContainerStatus, ManifestLine, ProductBreakageStat, ReceivedLine
+
+QUANTITY_FIELDS = ('qty_prevue', 'qty_recue', 'casse', 'manquant', 'excedent')
+
+GROUPINGS = {
+    'product': {'key': 'product', 'label': 'product__nom'},
+    'container': {'key': 'container', 'label': 'container__ref'},
+}
+
+
+def rate(part, total):
+    """Percentage of `part` in `total` (None when total is 0)."""
+    if not total:
+        return None
+    return round(part * 100 / total, 2)
+
+
+def _received(field):
+    """Quantity of the received line matching a manifest line (0 if none)."""
+    received = ReceivedLine.objects.filter(container=OuterRef('container'), product=OuterRef('product'))
+    return Coalesce(Subquery(received.values(field)[:1], output_field=IntegerField()), 0)
+
+
+def _grouped_totals(containers, group_by, **extra_groups):
+    """
+    Return {group values: totals} over the lines of `containers`, grouped by
+    the `group_by` fields plus `extra_groups` expressions.
+    """
+    manifest_rows = (
+        ManifestLine.objects.filter(container__in=containers)
+        .annotate(recue=_received('qty_recue'), casse_recue=_received('casse'), **extra_groups)
+        .annotate(
+            manque=Greatest(F('qty_prevue') - F('recue'), Value(0)),
+            surplus=Greatest(F('recue') - F('qty_prevue'), Value(0)),
+        )
+        .order_by()
+        .values(*group_by, *extra_groups)
+        .annotate(
+            total_conteneurs=Count('container', distinct=True),
+            total_prevue=Sum('qty_prevue'),
+            total_recue=Sum('recue'),
+            total_casse=Sum('casse_recue'),
+            total_manquant=Sum('manque'),
+            total_excedent=Sum('surplus'),
+        )
+    )
+    in_manifest = ManifestLine.objects.filter(container=OuterRef('container'), product=OuterRef('product'))
+    unexpected_rows = (
+        ReceivedLine.objects.filter(container__in=containers)
+        .exclude(Exists(in_manifest))
+        .annotate(**extra_groups)
+        .order_by()
+        .values(*group_by, *extra_groups)
+        .annotate(
+            total_conteneurs=Count('container', distinct=True),
+            total_recue=Sum('qty_recue'),
+            total_casse=Sum('casse'),
+        )
+    )
+
+    keys = [*group_by, *extra_groups]
+    totals = {}
+
+    def totals_for(row):
+        key = tuple(row[name] for name in keys)
+        if key not in totals:
+            totals[key] = {name: row[name] for name in keys}
+            totals[key].update(nb_conteneurs=0, **dict.fromkeys(QUANTITY_FIELDS, 0))
+        return totals[key]
+
+    # A (container, product) pair is in exactly one of the two queries
+    for row in manifest_rows:
+        item = totals_for(row)
+        item['nb_conteneurs'] += row['total_conteneurs']
+        item['qty_prevue'] += row['total_prevue'] or 0
+        item['qty_recue'] += row['total_recue'] or 0
+        item['casse'] += row['total_casse'] or 0
+        item['manquant'] += row['total_manquant'] or 0
+        item['excedent'] += row['total_excedent'] or 0
+    for row in unexpected_rows:
+        item = totals_for(row)
+        item['nb_conteneurs'] += row['total_conteneurs']
+        item['qty_recue'] += row['total_recue'] or 0
+        item['casse'] += row['total_casse'] or 0
+        item['excedent'] += row['total_recue'] or 0
+    return totals
+
+
+def with_rates(item):
+    """Add the breakage, shortfall and overage rates to a totals dict."""
+    item['taux_casse'] = rate(item['casse'], item['qty_recue'])
+    item['taux_manquant'] = rate(item['manquant'], item['qty_prevue'])
+    item['taux_excedent'] = rate(item['excedent'], item['qty_prevue'])
+    return item
+
+
+def variances(containers, group='product'):
+    """
+    Reconciliation of `containers` grouped by 'product' or 'container',
+    sorted by breakage rate (highest first).
+    """
+    grouping = GROUPINGS[group]
+    # Per container, the two queries overlap: the container count only makes sense per product
+    fields = QUANTITY_FIELDS if group == 'container' else ('nb_conteneurs',) + QUANTITY_FIELDS
+    rows = _grouped_totals(containers, [grouping['key'], grouping['label']]).values()
+    rows = [
+        with_rates({
+            'id': row[grouping['key']],
+            'label': row[grouping['label']],
+            **{field: row[field] for field in fields},
+        })
+        for row in rows
+    ]
+    rows.sort(key=lambda row: (row['taux_casse'] or 0, row['casse']), reverse=True)
+    return rows
+
+
+def summarize(rows):
+    """Overall totals and rates of variance rows."""
+    return with_rates({field: sum(row[field] for row in rows) for field in QUANTITY_FIELDS})
+
+
+def validated_containers():
+    """Containers counted in the breakage statistics."""
+    return Container.objects.filter(statut=ContainerStatus.VALIDE, validated_at__isnull=False)
+
+
+def _apply_stats(totals, reset=False):
+    """Add {(product_id, annee): totals} to the ProductBreakageStat rows."""
+    increments = ('nb_conteneurs',) + QUANTITY_FIELDS
+    with transaction.atomic():
+        if reset:
+            ProductBreakageStat.objects.all().delete()
+        ProductBreakageStat.objects.bulk_create(
+            [ProductBreakageStat(product_id=product_id, annee=annee) for product_id, annee in totals],
+            ignore_conflicts=True
+        )
+        for (product_id, annee), item in totals.items():
+            ProductBreakageStat.objects.filter(product_id=product_id, annee=annee).update(
+                **{field: F(field) + item[field] for field in increments}
+            )
+
+
+def record_container_breakage(container):
+    """Add a freshly validated container to the yearly breakage statistics."""
+    annee = timezone.localtime(container.validated_at).year
+    totals = _grouped_totals(Container.objects.filter(pk=container.pk), ['product'])
+    _apply_stats({(product_id, annee): item for (product_id,), item in totals.items()})
+
+
+def rebuild_breakage_stats():
+    """Recompute every ProductBreakageStat row from the validated containers. Returns the row count."""
+    totals = _grouped_totals(
+        validated_containers(), ['product'], annee=ExtractYear('container__validated_at')
+    )
+    _apply_stats(totals, reset=True)
+    return len(totals)
@@ -39,8 +39,10 @@ class ContainerSerializer(serializers.ModelSerializer):
     """Serializer for Container."""
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     validated_by_username = serializers.CharField(source='validated_by.username', read_only=True)
-    total_qty_prevue = serializers.SerializerMethodField()
-    total_qty_recue = serializers.SerializerMethodField()
+    total_qty_prevue = serializers.IntegerField(read_only=True)
+    total_qty_recue = serializers.IntegerField(read_only=True)
+    total_casse = serializers.IntegerField(read_only=True)
+    ecart_qty = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Container
@@ -48,22 +50,10 @@ class ContainerSerializer(serializers.ModelSerializer):
             'id', 'ref', 'date_arrivee_estimee', 'date_arrivee_reelle',
             'statut', 'statut_display', 'validated_at', 'validated_by',
             'validated_by_username', 'total_qty_prevue', 'total_qty_recue',
-            'created_at', 'updated_at'
+            'total_casse', 'ecart_qty', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'validated_at', 'validated_by', 'created_at', 'updated_at']
 
-    def get_total_qty_prevue(self, obj):
-        """Calculate total expected quantity from manifest lines."""
-        from django.db.models import Sum
-        total = obj.manifest_lines.aggregate(total=Sum('qty_prevue'))['total']
-        return total or 0
-
-    def get_total_qty_recue(self, obj):
-        """Calculate total received quantity from received lines."""
-        from django.db.models import Sum
-        total = obj.received_lines.aggregate(total=Sum('qty_recue'))['total']
-        return total or 0
-
 
 class ContainerDetailSerializer(serializers.ModelSerializer):
     """Serializer for Container with manifest and received lines."""
@@ -71,6 +61,10 @@ class ContainerDetailSerializer(serializers.ModelSerializer):
     manifest_lines = ManifestLineSerializer(many=True, read_only=True)
     received_lines = ReceivedLineSerializer(many=True, read_only=True)
     unloading_session = serializers.SerializerMethodField()
+    total_qty_prevue = serializers.IntegerField(read_only=True)
+    total_qty_recue = serializers.IntegerField(read_only=True)
+    total_casse = serializers.IntegerField(read_only=True)
+    ecart_qty = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Container
@@ -78,6 +72,7 @@ class ContainerDetailSerializer(serializers.ModelSerializer):
             'id', 'ref', 'date_arrivee_estimee', 'date_arrivee_reelle',
             'statut', 'statut_display', 'validated_at', 'validated_by',
             'manifest_lines', 'received_lines', 'unloading_session',
+            'total_qty_prevue', 'total_qty_recue', 'total_casse', 'ecart_qty',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'validated_at', 'validated_by', 'created_at', 'updated_at']
@@ -104,14 +99,45 @@ class UnloadingEventSerializer(serializers.ModelSerializer):
 
 
 class UnloadingSessionSerializer(serializers.ModelSerializer):
-    """Serializer for UnloadingSession."""
+    """Serializer for UnloadingSession (stored summary, without events)."""
     container_ref = serializers.CharField(source='container.ref', read_only=True)
-    events = UnloadingEventSerializer(many=True, read_only=True)
+    duree_travail = serializers.SerializerMethodField()
+    duree_pause = serializers.SerializerMethodField()
+    cout_heure_personne = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    cartons_par_heure = serializers.FloatField(read_only=True)
 
     class Meta:
         model = UnloadingSession
         fields = [
             'id', 'container', 'container_ref', 'nb_personnes',
-            'somme_allouee', 'started_at', 'ended_at', 'events', 'created_at'
+            'somme_allouee', 'started_at', 'ended_at', 'created_at',
+            'duree_travail', 'duree_pause', 'nb_pauses', 'en_pause',
+            'qty_dechargee', 'cout_heure_personne', 'cartons_par_heure'
         ]
-        read_only_fields = ['id', 'started_at', 'ended_at', 'created_at']
+        read_only_fields = [
+            'id', 'started_at', 'ended_at', 'created_at', 'nb_pauses', 'en_pause', 'qty_dechargee'
+        ]
+
+    def get_duree_travail(self, obj):
+        """Working seconds, including the phase still running."""
+        return obj.durations()[0]
+
+    def get_duree_pause(self, obj):
+        """Pause seconds, including the pause still running."""
+        return obj.durations()[1]
+
+
+class UnloadingSessionDetailSerializer(UnloadingSessionSerializer):
+    """Serializer for UnloadingSession with its event timeline."""
+    events = UnloadingEventSerializer(many=True, read_only=True)
+
+    class Meta(UnloadingSessionSerializer.Meta):
+        fields = UnloadingSessionSerializer.Meta.fields + ['events']
+
+
+class ContainerLineImportSerializer(serializers.Serializer):
+    """Upload of a manifest or reception file (CSV or XLSX)."""
+    file = serializers.FileField()
+    kind = serializers.ChoiceField(choices=['manifest', 'reception'])
+    dry_run = serializers.BooleanField(default=False)
+    replace = serializers.BooleanField(default=False)
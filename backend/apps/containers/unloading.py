@@ -0,0 +1,112 @@
+"""
+Unloading session summary for containers app.
+
+Each START / PAUSE / RESUME / END event closes the current phase (work or
+pause) of its session and adds its length to the stored totals, so the
+working time, pause time and pause count of a session are read from the
+session row instead of replaying its events. ``qty_dechargee`` copies the
+received quantity of the container (ReceivedLine) for the throughput rates.
+"""
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import ReceivedLine, UnloadingEvent, UnloadingEventType, UnloadingSession
+
+SUMMARY_FIELDS = [
+    'started_at', 'ended_at', 'duree_travail', 'duree_pause', 'nb_pauses', 'en_pause', 'phase_started_at'
+]
+
+
+def _close_phase(session, at):
+    """Add the phase running since phase_started_at to the work or pause total."""
+    if session.phase_started_at is None:
+        return
+    elapsed = max(int((at - session.phase_started_at).total_seconds()), 0)
+    if session.en_pause:
+        session.duree_pause += elapsed
+    else:
+        session.duree_travail += elapsed
+
+
+def apply_event(session, event_type, at):
+    """Update the summary fields of `session` (in memory) for an event at `at`."""
+    if event_type == UnloadingEventType.START:
+        session.started_at = at
+        session.phase_started_at = at
+        session.en_pause = False
+    elif event_type == UnloadingEventType.PAUSE and not session.en_pause:
+        _close_phase(session, at)
+        session.en_pause = True
+        session.nb_pauses += 1
+        session.phase_started_at = at
+    elif event_type == UnloadingEventType.RESUME and session.en_pause:
+        _close_phase(session, at)
+        session.en_pause = False
+        session.phase_started_at = at
+    elif event_type == UnloadingEventType.END:
+        _close_phase(session, at)
+        session.ended_at = at
+        session.en_pause = False
+        session.phase_started_at = None
+
+
+def record_event(session, event_type, user=None, meta=None):
+    """Create an unloading event and update the session summary. Returns the refreshed session."""
+    with transaction.atomic():
+        session = UnloadingSession.objects.select_for_update().select_related('container').get(pk=session.pk)
+        event = UnloadingEvent.objects.create(session=session, type=event_type, user=user, meta=meta or {})
+        apply_event(session, event_type, event.timestamp)
+        fields = list(SUMMARY_FIELDS)
+        if event_type == UnloadingEventType.END:
+            session.qty_dechargee = received_quantity(session.container_id)
+            fields.append('qty_dechargee')
+        session.save(update_fields=fields)
+    return session
+
+
+def received_quantity(container_id):
+    """Total received quantity of a container."""
+    total = ReceivedLine.objects.filter(container_id=container_id).aggregate(total=Sum('qty_recue'))['total']
+    return total or 0
+
+
+def _received_total(received_line=ReceivedLine):
+    return Coalesce(Subquery(
+        received_line.objects.filter(container=OuterRef('container'))
+        .order_by()
+        .values('container')
+        .annotate(total=Sum('qty_recue'))
+        .values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def refresh_unloaded_quantity(container_id):
+    """Copy the received quantity of a container to its unloading session (one UPDATE)."""
+    UnloadingSession.objects.filter(container_id=container_id).update(qty_dechargee=_received_total())
+
+
+def rebuild_unloading_summaries(apps=None):
+    """
+    Recompute every session summary by replaying its events. Returns the session count.
+    `apps` is the app registry of a data migration (historical models).
+    """
+    if apps is not None:
+        unloading_session, received_line = (
+            apps.get_model('containers', 'UnloadingSession'), apps.get_model('containers', 'ReceivedLine')
+        )
+    else:
+        unloading_session, received_line = UnloadingSession, ReceivedLine
+    sessions = unloading_session.objects.prefetch_related('events')
+    count = 0
+    for session in sessions.iterator(chunk_size=500):
+        session.duree_travail = session.duree_pause = session.nb_pauses = 0
+        session.en_pause = False
+        session.phase_started_at = None
+        for event in sorted(session.events.all(), key=lambda event: event.timestamp):
+            apply_event(session, event.type, event.timestamp)
+        session.save(update_fields=SUMMARY_FIELDS)
+        count += 1
+    unloading_session.objects.update(qty_dechargee=_received_total(received_line))
+    return count
@@ -5,7 +5,11 @@ import os
 from datetime import datetime, date
 from django.conf import settings
 from django.template.loader import render_to_string
+from gsa_backend.metrics import track_pdf_render
+from gsa_backend.pdf import PDFUnavailable, is_pdf_available, render_pdf, unavailable_reason
+from gsa_backend.periods import date_range_q
 from .models import Container
+from .reconciliation import summarize, variances
 
 
 def get_containers_at_date(target_date, date_field='created_at'):
@@ -14,40 +18,27 @@ def get_containers_at_date(target_date, date_field='created_at'):
     date_field can be 'created_at', 'date_arrivee_estimee', or 'date_arrivee_reelle'
     Returns a list of Container objects.
     """
-    if date_field == 'created_at':
-        containers = Container.objects.filter(created_at__date__lte=target_date)
-    elif date_field == 'date_arrivee_estimee':
+    if date_field == 'date_arrivee_estimee':
         containers = Container.objects.filter(date_arrivee_estimee__lte=target_date)
     elif date_field == 'date_arrivee_reelle':
         containers = Container.objects.filter(date_arrivee_reelle__lte=target_date)
     else:
-        containers = Container.objects.filter(created_at__date__lte=target_date)
+        containers = Container.objects.filter(date_range_q('created_at', end=target_date))
     
-    return containers.select_related('validated_by').prefetch_related(
-        'manifest_lines__product',
-        'received_lines__product'
-    ).order_by('-date_arrivee_estimee', '-created_at')
+    return containers.select_related('validated_by').with_totals().order_by('-date_arrivee_estimee', '-created_at')
 
 
+@track_pdf_render('containers_report')
 def generate_containers_pdf(target_date, date_field='created_at'):
     """
     Generate PDF for containers report at a specific date.
     Returns the file path relative to MEDIA_ROOT.
     Raises Exception if WeasyPrint is not available.
     """
-    # Try to import WeasyPrint
-    try:
-        from weasyprint import HTML, CSS
-        from weasyprint.text.fonts import FontConfiguration
-        WEASYPRINT_AVAILABLE = True
-    except (ImportError, OSError) as e:
-        WEASYPRINT_AVAILABLE = False
-        WEASYPRINT_ERROR = str(e)
-    
-    if not WEASYPRINT_AVAILABLE:
-        raise Exception(
+    if not is_pdf_available():
+        raise PDFUnavailable(
             f"PDF generation is not available. WeasyPrint dependencies are missing. "
-            f"Error: {WEASYPRINT_ERROR if 'WEASYPRINT_ERROR' in locals() else 'Unknown error'}"
+            f"Error: {unavailable_reason() or 'Unknown error'}"
         )
     
     # Ensure reports directory exists
@@ -57,17 +48,22 @@ def generate_containers_pdf(target_date, date_field='created_at'):
     # Get containers data
     containers = get_containers_at_date(target_date, date_field)
     
-    # Calculate totals for each container
-    containers_data = []
-    for container in containers:
-        from django.db.models import Sum
-        total_prevue = container.manifest_lines.aggregate(total=Sum('qty_prevue'))['total'] or 0
-        total_recue = container.received_lines.aggregate(total=Sum('qty_recue'))['total'] or 0
-        containers_data.append({
+    # Totals are annotated on the queryset
+    containers_data = [
+        {
             'container': container,
-            'total_prevue': total_prevue,
-            'total_recue': total_recue,
-        })
+            'total_prevue': container.total_qty_prevue,
+            'total_recue': container.total_qty_recue,
+            'total_casse': container.total_casse,
+            'ecart': container.ecart_qty,
+        }
+        for container in containers
+    ]
+    # Products with a shortfall, an overage or breakage, worst breakage rate first
+    product_variances = [
+        row for row in variances(containers)
+        if row['manquant'] or row['excedent'] or row['casse']
+    ]
     
     # Format date for filename
     date_str = target_date.strftime('%Y-%m-%d')
@@ -77,20 +73,15 @@ def generate_containers_pdf(target_date, date_field='created_at'):
     # Render HTML template
     html_content = render_to_string('containers/containers_report.html', {
         'containers_data': containers_data,
+        'product_variances': product_variances,
+        'variance_totals': summarize(product_variances),
         'target_date': target_date,
         'date_str': date_str,
         'date_field': date_field,
     })
     
     # Generate PDF
-    font_config = FontConfiguration()
-    pdf_file = HTML(string=html_content)
-    
-    # Generate PDF
-    pdf_file.write_pdf(
-        target=filepath,
-        font_config=font_config
-    )
+    render_pdf(html_content, filepath)
     
     # Return relative path
     relative_path = f"reports/{filename}"
@@ -1,33 +1,44 @@
 """
 Views for containers app.
 """
+from decimal import Decimal
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from .models import (
     Container, ManifestLine, ReceivedLine,
-    UnloadingSession, UnloadingEvent, UnloadingEventType
+    UnloadingSession, UnloadingEventType
 )
 from .serializers import (
     ContainerSerializer,
     ContainerDetailSerializer,
     ManifestLineSerializer,
     ReceivedLineSerializer,
+    ContainerLineImportSerializer,
     UnloadingSessionSerializer,
+    UnloadingSessionDetailSerializer,
     UnloadingEventSerializer
 )
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsReadOnlyOrAuthenticated, IsLogistique
 from apps.audit.utils import create_audit_log
-from .models import ContainerStatus
+from gsa_backend.concurrency import document_endpoint
+from gsa_backend.periods import date_range_q, parse_date
+from .models import ContainerStatus, ProductBreakageStat
+from .reconciliation import (
+    GROUPINGS, rate, record_container_breakage, summarize, validated_containers, variances
+)
+from .unloading import record_event, refresh_unloaded_quantity
 
 
 class ContainerViewSet(viewsets.ModelViewSet):
     """ViewSet for Container management."""
-    queryset = Container.objects.all()
+    queryset = Container.objects.select_related('validated_by').with_totals()
     serializer_class = ContainerSerializer
     permission_classes = [IsReadOnlyOrAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -36,6 +47,15 @@ class ContainerViewSet(viewsets.ModelViewSet):
     ordering_fields = ['date_arrivee_estimee', 'created_at']
     ordering = ['-date_arrivee_estimee', '-created_at']
 
+    def get_queryset(self):
+        """Prefetch the lines only where they are serialized."""
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                'manifest_lines__product__base_price', 'received_lines__product__base_price'
+            )
+        return queryset
+
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == 'retrieve':
@@ -44,114 +64,234 @@ class ContainerViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         """Set permissions based on action."""
-        if self.action in ['create', 'update', 'partial_update', 'validate']:
+        if self.action in ['create', 'update', 'partial_update', 'validate', 'import_lines']:
             return [IsAuthenticated(), IsLogistique()]
         return [IsReadOnlyOrAuthenticated()]
 
     @action(detail=True, methods=['post'])
     def validate(self, request, pk=None):
         """Validate container and create stock movements."""
-        container = self.get_object()
+        # One transaction: movements, status and breakage stats are all written or none
+        with transaction.atomic():
+            container = self.get_object()
+            # Lock the row: two concurrent validations cannot both create the movements
+            container = Container.objects.select_for_update().get(pk=container.pk)
+        
+            if container.statut == ContainerStatus.VALIDE:
+                return Response(
+                    {'error': 'Container already validated'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+            # Check that received lines exist
+            received_lines = container.received_lines.all()
+            if not received_lines.exists():
+                return Response(
+                    {'error': 'No received lines found. Please fill received quantities first.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+            # Import here to avoid circular import
+            from apps.stock.models import StockMovement, MovementType
         
+            # Create stock movements for each received line
+            movements_created = []
+            for received_line in received_lines:
+                if received_line.qty_recue > 0:
+                    movement = StockMovement.objects.create(
+                        product=received_line.product,
+                        qty_signee=received_line.qty_recue,
+                        type=MovementType.RECEPTION,
+                        reference=f"CONT-{container.ref}",
+                        created_by=request.user
+                    )
+                    movements_created.append(movement)
+        
+            # Update container status
+            container.statut = ContainerStatus.VALIDE
+            container.validated_at = timezone.now()
+            container.validated_by = request.user
+            container.save()
+            record_container_breakage(container)
+        
+            # Log audit
+            create_audit_log(
+                instance=container,
+                action='VALIDATE_CONTAINER',
+                user=request.user,
+                after_data=ContainerSerializer(container).data,
+                reason=f'Validation conteneur {container.ref} - {len(movements_created)} mouvements créés',
+                request=request
+            )
+        
+            serializer = self.get_serializer(container)
+            return Response({
+                'message': f'Container validated. {len(movements_created)} stock movements created.',
+                'container': serializer.data
+            })
+
+    @action(detail=True, methods=['post'], url_path='import')
+    def import_lines(self, request, pk=None):
+        """
+        Import manifest or received lines from a CSV/XLSX file (multipart).
+        All rows are validated first: any error rejects the whole file.
+        dry_run=true returns the changes without writing them; replace=true
+        also deletes the lines absent from the file.
+        """
+        from .imports import KINDS, ImportFileError, apply_import, describe_plan, parse_lines, plan_import
+
+        container = self.get_object()
         if container.statut == ContainerStatus.VALIDE:
             return Response(
-                {'error': 'Container already validated'},
+                {'error': 'Conteneur déjà validé : import impossible'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Check that received lines exist
-        received_lines = container.received_lines.all()
-        if not received_lines.exists():
+        serializer = ContainerLineImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        kind = KINDS[data['kind']]
+
+        try:
+            lines, errors, index = parse_lines(data['file'], kind)
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if errors:
             return Response(
-                {'error': 'No received lines found. Please fill received quantities first.'},
+                {'error': f'{len(errors)} ligne(s) invalide(s) : aucune modification enregistrée', 'errors': errors},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Import here to avoid circular import
-        from apps.stock.models import StockMovement, MovementType
-        
-        # Create stock movements for each received line
-        movements_created = []
-        for received_line in received_lines:
-            if received_line.qty_recue > 0:
-                movement = StockMovement.objects.create(
-                    product=received_line.product,
-                    qty_signee=received_line.qty_recue,
-                    type=MovementType.RECEPTION,
-                    reference=f"CONT-{container.ref}",
-                    created_by=request.user
-                )
-                movements_created.append(movement)
-        
-        # Update container status
-        container.statut = ContainerStatus.VALIDE
-        container.validated_at = timezone.now()
-        container.validated_by = request.user
-        container.save()
-        
-        # Log audit
+
+        plan = plan_import(container, kind, lines, replace=data['replace'])
+        preview = describe_plan(plan, kind, index)
+        summary = {
+            'created': len(plan['create']),
+            'updated': len(plan['update']),
+            'deleted': len(plan['delete']),
+            'unchanged': plan['unchanged'],
+        }
+        if data['dry_run']:
+            return Response({'dry_run': True, 'kind': kind.name, 'summary': summary, **preview})
+
+        apply_import(plan, kind)
+        if kind.model is ReceivedLine:
+            refresh_unloaded_quantity(container.id)
         create_audit_log(
             instance=container,
-            action='VALIDATE_CONTAINER',
+            action=f'IMPORT_{kind.name.upper()}',
             user=request.user,
-            after_data=ContainerSerializer(container).data,
-            reason=f'Validation conteneur {container.ref} - {len(movements_created)} mouvements créés',
+            after_data={'file': data['file'].name, 'replace': data['replace'], **summary},
+            reason=f'Import {kind.name} conteneur {container.ref} ({data["file"].name})',
             request=request
         )
-        
-        serializer = self.get_serializer(container)
+        return Response({'dry_run': False, 'kind': kind.name, 'summary': summary})
+
+    @action(detail=True, methods=['get'])
+    def reconciliation(self, request, pk=None):
+        """Manifest vs received variance of a container, per product."""
+        container = self.get_object()
+        rows = variances(Container.objects.filter(pk=container.pk))
+        return Response({
+            'container': container.id,
+            'ref': container.ref,
+            'totals': summarize(rows),
+            'products': rows,
+        })
+
+    @action(detail=False, methods=['get'])
+    def variance(self, request):
+        """
+        Variance of the validated containers, grouped by product (default) or container.
+        Optional filters: start_date / end_date (YYYY-MM-DD, on the validation date).
+        """
+        group = request.query_params.get('group', 'product')
+        if group not in GROUPINGS:
+            return Response(
+                {'error': f"group must be one of: {', '.join(GROUPINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start_date = parse_date(request.query_params['start_date']) if request.query_params.get('start_date') else None
+            end_date = parse_date(request.query_params['end_date']) if request.query_params.get('end_date') else None
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        containers = validated_containers().filter(date_range_q('validated_at', start_date, end_date))
+        rows = variances(containers, group)
         return Response({
-            'message': f'Container validated. {len(movements_created)} stock movements created.',
-            'container': serializer.data
+            'group': group,
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+            'totals': summarize(rows),
+            'rows': rows,
         })
 
     @action(detail=False, methods=['get'])
+    def breakage_stats(self, request):
+        """
+        Breakage history per product from the yearly statistics, worst rate first.
+        Optional filters: annee, product, min_qty (minimum received quantity);
+        par_annee=1 keeps one row per product and year.
+        """
+        from django.db.models import Min, Max, Sum
+
+        stats = ProductBreakageStat.objects.all()
+        for param, lookup in (('annee', 'annee'), ('product', 'product_id')):
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    return Response({'error': f'{param} must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+                stats = stats.filter(**{lookup: int(value)})
+
+        group_by = ['product', 'product__nom']
+        if request.query_params.get('par_annee') in ('1', 'true'):
+            group_by.append('annee')
+        rows = stats.order_by().values(*group_by).annotate(
+            nb_conteneurs=Sum('nb_conteneurs'),
+            qty_prevue=Sum('qty_prevue'),
+            qty_recue=Sum('qty_recue'),
+            casse=Sum('casse'),
+            manquant=Sum('manquant'),
+            excedent=Sum('excedent'),
+            premiere_annee=Min('annee'),
+            derniere_annee=Max('annee'),
+        )
+        min_qty = request.query_params.get('min_qty')
+        if min_qty and min_qty.isdigit():
+            rows = rows.filter(qty_recue__gte=int(min_qty))
+
+        results = []
+        for row in rows:
+            row['taux_casse'] = rate(row['casse'], row['qty_recue'])
+            row['taux_manquant'] = rate(row['manquant'], row['qty_prevue'])
+            results.append(row)
+        results.sort(key=lambda row: (row['taux_casse'] or 0, row['casse']), reverse=True)
+        return Response({'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['get'])
+    @document_endpoint('containers_report')
     def print_containers(self, request):
         """Generate PDF report of containers at a specific date."""
         from .utils import generate_containers_pdf
-        from django.http import FileResponse
+        from gsa_backend.sendfile import file_response
+        from gsa_backend.periods import report_date_param
         from django.conf import settings
-        from datetime import datetime
-        from calendar import monthrange
         import os
         
         date_param = request.query_params.get('date', None)
         date_field = request.query_params.get('date_field', 'created_at')
         
-        if not date_param:
-            return Response(
-                {'error': 'Date parameter is required (format: YYYY-MM-DD, YYYY-MM, or YYYY)'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Parse date parameter
-        try:
-            if len(date_param) == 4:  # YYYY
-                target_date = datetime.strptime(date_param, '%Y').date().replace(month=12, day=31)
-            elif len(date_param) == 7:  # YYYY-MM
-                target_date = datetime.strptime(date_param, '%Y-%m').date()
-                # Get last day of month
-                last_day = monthrange(target_date.year, target_date.month)[1]
-                target_date = target_date.replace(day=last_day)
-            elif len(date_param) == 10:  # YYYY-MM-DD
-                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-            else:
-                raise ValueError("Invalid date format")
-        except ValueError as e:
-            return Response(
-                {'error': f'Invalid date format: {str(e)}. Use YYYY-MM-DD, YYYY-MM, or YYYY'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        target_date, error_response = report_date_param(request)
+        if error_response:
+            return error_response
         
         try:
             pdf_path = generate_containers_pdf(target_date, date_field)
             full_path = os.path.join(settings.MEDIA_ROOT, pdf_path)
             
-            return FileResponse(
-                open(full_path, 'rb'),
-                content_type='application/pdf',
-                filename=f"containers_{date_param}.pdf"
-            )
+            return file_response(full_path, 'application/pdf', f"containers_{date_param}.pdf", as_attachment=False)
         except Exception as e:
             return Response(
                 {'error': f'Error generating PDF: {str(e)}'},
@@ -192,6 +332,7 @@ class ReceivedLineViewSet(viewsets.ModelViewSet):
                 'Cannot add received lines to a validated container'
             )
         serializer.save()
+        refresh_unloaded_quantity(container.id)
 
     def perform_update(self, serializer):
         """Update received line and check container status."""
@@ -202,16 +343,36 @@ class ReceivedLineViewSet(viewsets.ModelViewSet):
                 'Cannot modify received lines of a validated container'
             )
         serializer.save()
+        refresh_unloaded_quantity(instance.container_id)
+
+    def perform_destroy(self, instance):
+        """Delete received line and update the unloaded quantity."""
+        container_id = instance.container_id
+        instance.delete()
+        refresh_unloaded_quantity(container_id)
 
 
 class UnloadingSessionViewSet(viewsets.ModelViewSet):
     """ViewSet for UnloadingSession management."""
-    queryset = UnloadingSession.objects.select_related('container').prefetch_related('events').all()
+    queryset = UnloadingSession.objects.select_related('container').all()
     serializer_class = UnloadingSessionSerializer
     permission_classes = [IsReadOnlyOrAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['container']
 
+    def get_queryset(self):
+        """Prefetch the events only where they are serialized."""
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('events__user')
+        return queryset
+
+    def get_serializer_class(self):
+        """Return appropriate serializer based on action."""
+        if self.action == 'retrieve':
+            return UnloadingSessionDetailSerializer
+        return UnloadingSessionSerializer
+
     def get_permissions(self):
         """Set permissions based on action."""
         if self.action in ['create', 'update', 'partial_update', 'start', 'pause', 'resume', 'end']:
@@ -228,15 +389,7 @@ class UnloadingSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        session.started_at = timezone.now()
-        session.save()
-        
-        UnloadingEvent.objects.create(
-            session=session,
-            type=UnloadingEventType.START,
-            user=request.user,
-            meta={'action': 'start'}
-        )
+        session = record_event(session, UnloadingEventType.START, request.user, {'action': 'start'})
         
         return Response(UnloadingSessionSerializer(session).data)
 
@@ -249,13 +402,13 @@ class UnloadingSessionViewSet(viewsets.ModelViewSet):
                 {'error': 'Session not started or already ended'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if session.en_pause:
+            return Response(
+                {'error': 'Session already paused'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        UnloadingEvent.objects.create(
-            session=session,
-            type=UnloadingEventType.PAUSE,
-            user=request.user,
-            meta={'action': 'pause'}
-        )
+        session = record_event(session, UnloadingEventType.PAUSE, request.user, {'action': 'pause'})
         
         return Response(UnloadingSessionSerializer(session).data)
 
@@ -268,13 +421,13 @@ class UnloadingSessionViewSet(viewsets.ModelViewSet):
                 {'error': 'Session not started or already ended'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not session.en_pause:
+            return Response(
+                {'error': 'Session not paused'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        UnloadingEvent.objects.create(
-            session=session,
-            type=UnloadingEventType.RESUME,
-            user=request.user,
-            meta={'action': 'resume'}
-        )
+        session = record_event(session, UnloadingEventType.RESUME, request.user, {'action': 'resume'})
         
         return Response(UnloadingSessionSerializer(session).data)
 
@@ -293,14 +446,61 @@ class UnloadingSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        session.ended_at = timezone.now()
-        session.save()
-        
-        UnloadingEvent.objects.create(
-            session=session,
-            type=UnloadingEventType.END,
-            user=request.user,
-            meta={'action': 'end'}
-        )
+        session = record_event(session, UnloadingEventType.END, request.user, {'action': 'end'})
         
         return Response(UnloadingSessionSerializer(session).data)
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        Working time, cost and throughput of the ended sessions, read from the
+        stored session summaries (no event is loaded).
+        Optional filters: date_from, date_to (YYYY-MM-DD, on the start date), container.
+        """
+        sessions = UnloadingSession.objects.filter(ended_at__isnull=False)
+        try:
+            date_from = parse_date(request.query_params['date_from']) if request.query_params.get('date_from') else None
+            date_to = parse_date(request.query_params['date_to']) if request.query_params.get('date_to') else None
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        sessions = sessions.filter(date_range_q('started_at', date_from, date_to))
+        container = request.query_params.get('container')
+        if container:
+            if not container.isdigit():
+                return Response({'error': 'container must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            sessions = sessions.filter(container_id=int(container))
+
+        rows = []
+        for session in sessions.select_related('container').order_by('-started_at'):
+            rows.append({
+                'id': session.id,
+                'container': session.container_id,
+                'container_ref': session.container.ref,
+                'started_at': session.started_at,
+                'ended_at': session.ended_at,
+                'nb_personnes': session.nb_personnes,
+                'somme_allouee': session.somme_allouee,
+                'duree_travail': session.duree_travail,
+                'duree_pause': session.duree_pause,
+                'nb_pauses': session.nb_pauses,
+                'qty_dechargee': session.qty_dechargee,
+                'cout_heure_personne': session.cout_heure_personne,
+                'cartons_par_heure': session.cartons_par_heure,
+            })
+
+        totals = {
+            'nb_sessions': len(rows),
+            'duree_travail': sum(row['duree_travail'] for row in rows),
+            'duree_pause': sum(row['duree_pause'] for row in rows),
+            'nb_pauses': sum(row['nb_pauses'] for row in rows),
+            'qty_dechargee': sum(row['qty_dechargee'] for row in rows),
+            'somme_allouee': sum((row['somme_allouee'] for row in rows), Decimal('0')),
+        }
+        secondes_personne = sum(row['nb_personnes'] * row['duree_travail'] for row in rows)
+        totals['cout_heure_personne'] = (
+            round(totals['somme_allouee'] * 3600 / secondes_personne, 2) if secondes_personne else None
+        )
+        totals['cartons_par_heure'] = (
+            round(totals['qty_dechargee'] * 3600 / totals['duree_travail'], 1) if totals['duree_travail'] else None
+        )
+        return Response({'totals': totals, 'sessions': rows})
@@ -0,0 +1,76 @@
+"""
+Local stand-in for a Prometheus scraper: fetch /metrics and summarize it.
+Usage: python manage.py scrape_metrics [--url URL] [--count N] [--interval SECONDS]
+
+Without --url the endpoint is called in-process through the Django test
+client, so no server, Prometheus or Redis instance is required.
+"""
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = 'Scrape the /metrics endpoint (in-process or over HTTP) and print a summary.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Scrape a running server instead, e.g. http://localhost:8000/metrics')
+        parser.add_argument('--count', type=int, default=1, help='Number of scrapes (default: 1).')
+        parser.add_argument('--interval', type=float, default=15.0, help='Seconds between scrapes (default: 15).')
+        parser.add_argument('--raw', action='store_true', help='Print the raw exposition text.')
+
+    def handle(self, *args, **options):
+        try:
+            from prometheus_client.parser import text_string_to_metric_families
+        except ImportError:
+            raise CommandError('prometheus_client is not installed.')
+
+        for scrape in range(options['count']):
+            if scrape:
+                time.sleep(options['interval'])
+            text = self.fetch(options['url'])
+            if options['raw']:
+                self.stdout.write(text)
+                continue
+            self.summarize(list(text_string_to_metric_families(text)))
+
+    def fetch(self, url):
+        """Return the exposition text of the metrics endpoint."""
+        headers = {}
+        if settings.METRICS_AUTH_TOKEN:
+            headers['Authorization'] = f'Bearer {settings.METRICS_AUTH_TOKEN}'
+        if url:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.read().decode('utf-8')
+
+        response = Client().get('/metrics', headers=headers, SERVER_NAME='localhost')
+        if response.status_code == 403 and not settings.METRICS_AUTH_TOKEN:
+            raise CommandError('/metrics returned HTTP 403: set METRICS_AUTH_TOKEN (required outside DEBUG)')
+        if response.status_code != 200:
+            raise CommandError(f'/metrics returned HTTP {response.status_code}')
+        return response.content.decode('utf-8')
+
+    def summarize(self, families):
+        """Print one line per GSA metric family and the cache hit ratios."""
+        self.stdout.write(f'--- scrape at {time.strftime("%H:%M:%S")}')
+        cache_counts = {}
+        for family in families:
+            if not family.name.startswith('gsa_') or family.name.endswith('_created'):
+                continue
+            samples = [s for s in family.samples if not s.name.endswith(('_bucket', '_created'))]
+            self.stdout.write(f'{family.name} ({family.type}): {len(samples)} samples')
+            for sample in samples:
+                labels = ','.join(f'{k}={v}' for k, v in sorted(sample.labels.items()))
+                self.stdout.write(f'    {sample.name}{{{labels}}} {sample.value:g}')
+                if sample.name == 'gsa_cache_requests_total':
+                    hits, total = cache_counts.get(sample.labels['cache'], (0, 0))
+                    cache_counts[sample.labels['cache']] = (
+                        hits + (sample.value if sample.labels['result'] == 'hit' else 0),
+                        total + sample.value,
+                    )
+        for cache_name, (hits, total) in sorted(cache_counts.items()):
+            self.stdout.write(f'cache {cache_name}: hit ratio {hits / total:.1%} ({int(hits)}/{int(total)})')
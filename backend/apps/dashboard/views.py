@@ -7,7 +7,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.db.models import Sum, Q, Count
-from datetime import datetime, timedelta
+from datetime import timedelta
+from gsa_backend.periods import date_range_q, parse_date
 # Models imported in methods to avoid circular imports
 
 
@@ -17,29 +18,10 @@ class DashboardViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def stock_value(self, request):
-        """Get current stock value (sum of stock * base_price for all products)."""
-        from apps.stock.models import StockMovement
-        from apps.catalog.models import Product, BasePrice
-        
-        products = Product.objects.filter(actif=True).select_related('base_price')
-        total_value = 0
-        stock_details = []
+        """Get current stock value at weighted-average cost (maintained on every movement)."""
+        from apps.stock.valuation import current_valuation
         
-        for product in products:
-            stock = StockMovement.get_current_stock(product)
-            base_price = getattr(product, 'base_price', None)
-            price = float(base_price.prix_base) if base_price else 0
-            value = stock * price
-            
-            total_value += value
-            if stock > 0:
-                stock_details.append({
-                    'product_id': product.id,
-                    'product_name': product.nom,
-                    'stock': stock,
-                    'price': price,
-                    'value': value,
-                })
+        total_value, stock_details = current_valuation()
         
         return Response({
             'total_value': total_value,
@@ -48,47 +30,22 @@ class DashboardViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def stock_value_at_date(self, request):
-        """Get stock value at a specific date."""
-        from apps.stock.models import StockMovement
-        from apps.catalog.models import Product, BasePrice
+        """Get stock value at weighted-average cost at the end of a specific date."""
+        from apps.stock.valuation import valuation_at
         
         date_param = request.query_params.get('date', None)
         if not date_param:
             target_date = timezone.now().date()
         else:
             try:
-                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
+                target_date = parse_date(date_param)
             except ValueError:
                 return Response(
                     {'error': 'Invalid date format. Use YYYY-MM-DD.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        products = Product.objects.filter(actif=True).select_related('base_price')
-        total_value = 0
-        stock_details = []
-        
-        for product in products:
-            # Get stock at target date
-            movements = StockMovement.objects.filter(
-                product=product,
-                created_at__date__lte=target_date
-            )
-            stock = movements.aggregate(total=Sum('qty_signee'))['total'] or 0
-            
-            base_price = getattr(product, 'base_price', None)
-            price = float(base_price.prix_base) if base_price else 0
-            value = stock * price
-            
-            total_value += value
-            if stock > 0:
-                stock_details.append({
-                    'product_id': product.id,
-                    'product_name': product.nom,
-                    'stock': stock,
-                    'price': price,
-                    'value': value,
-                })
+        total_value, stock_details = valuation_at(target_date)
         
         return Response({
             'date': target_date.isoformat(),
@@ -96,6 +53,37 @@ class DashboardViewSet(viewsets.ViewSet):
             'stock_details': stock_details,
         })
 
+    @action(detail=False, methods=['get'])
+    def margins(self, request):
+        """Gross margin per product (revenue minus average cost of the goods sold) by period."""
+        from apps.stock.valuation import margins
+        
+        start_date = request.query_params.get('start_date', None)
+        end_date = request.query_params.get('end_date', None)
+        
+        if not start_date or not end_date:
+            # Default to last 30 days
+            end_date = timezone.now().date()
+            start_date = end_date - timedelta(days=30)
+        else:
+            try:
+                start_date = parse_date(start_date)
+                end_date = parse_date(end_date)
+            except ValueError:
+                return Response(
+                    {'error': 'Invalid date format. Use YYYY-MM-DD.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        totals, products = margins(start_date, end_date)
+        
+        return Response({
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            **totals,
+            'products': products,
+        })
+
     @action(detail=False, methods=['get'])
     def sales_revenue(self, request):
         """Get sales revenue (chiffre d'affaires) by period."""
@@ -111,8 +99,8 @@ class DashboardViewSet(viewsets.ViewSet):
             start_date = end_date - timedelta(days=30)
         else:
             try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+                start_date = parse_date(start_date)
+                end_date = parse_date(end_date)
             except ValueError:
                 return Response(
                     {'error': 'Invalid date format. Use YYYY-MM-DD.'},
@@ -121,9 +109,8 @@ class DashboardViewSet(viewsets.ViewSet):
         
         # Get validated invoices in date range
         invoices = Invoice.objects.filter(
-            statut=InvoiceStatus.VALIDEE,
-            validated_at__date__gte=start_date,
-            validated_at__date__lte=end_date
+            date_range_q('validated_at', start_date, end_date),
+            statut=InvoiceStatus.VALIDEE
         )
         
         total_revenue = invoices.aggregate(total=Sum('total_ttc'))['total'] or 0
@@ -134,7 +121,7 @@ class DashboardViewSet(viewsets.ViewSet):
         if period == 'day':
             current_date = start_date
             while current_date <= end_date:
-                day_invoices = invoices.filter(validated_at__date=current_date)
+                day_invoices = invoices.filter(date_range_q('validated_at', current_date, current_date))
                 day_revenue = day_invoices.aggregate(total=Sum('total_ttc'))['total'] or 0
                 chart_data.append({
                     'date': current_date.isoformat(),
@@ -147,10 +134,7 @@ class DashboardViewSet(viewsets.ViewSet):
             current_date = start_date
             while current_date <= end_date:
                 week_end = min(current_date + timedelta(days=6), end_date)
-                week_invoices = invoices.filter(
-                    validated_at__date__gte=current_date,
-                    validated_at__date__lte=week_end
-                )
+                week_invoices = invoices.filter(date_range_q('validated_at', current_date, week_end))
                 week_revenue = week_invoices.aggregate(total=Sum('total_ttc'))['total'] or 0
                 chart_data.append({
                     'period': f"{current_date.isoformat()} - {week_end.isoformat()}",
@@ -168,10 +152,7 @@ class DashboardViewSet(viewsets.ViewSet):
                     next_month = current_date.replace(month=current_date.month + 1, day=1)
                 month_end = min(next_month - timedelta(days=1), end_date)
                 
-                month_invoices = invoices.filter(
-                    validated_at__date__gte=current_date,
-                    validated_at__date__lte=month_end
-                )
+                month_invoices = invoices.filter(date_range_q('validated_at', current_date, month_end))
                 month_revenue = month_invoices.aggregate(total=Sum('total_ttc'))['total'] or 0
                 chart_data.append({
                     'period': current_date.strftime('%Y-%m'),
@@ -205,15 +186,15 @@ class DashboardViewSet(viewsets.ViewSet):
         
         if start_date:
             try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                invoice_lines = invoice_lines.filter(invoice__validated_at__date__gte=start_date)
+                start_date = parse_date(start_date)
+                invoice_lines = invoice_lines.filter(date_range_q('invoice__validated_at', start=start_date))
             except ValueError:
                 pass
         
         if end_date:
             try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                invoice_lines = invoice_lines.filter(invoice__validated_at__date__lte=end_date)
+                end_date = parse_date(end_date)
+                invoice_lines = invoice_lines.filter(date_range_q('invoice__validated_at', end=end_date))
             except ValueError:
                 pass
         
@@ -231,8 +212,7 @@ class DashboardViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def company_status(self, request):
         """Get company status: total due, total received, stock value."""
-        from apps.stock.models import StockMovement
-        from apps.catalog.models import Product, BasePrice
+        from apps.stock.models import ProductCost
         from apps.billing.models import Invoice, InvoiceStatus, Payment
         
         # Total due (unpaid invoices)
@@ -246,14 +226,8 @@ class DashboardViewSet(viewsets.ViewSet):
         all_payments = Payment.objects.all()
         total_received = all_payments.aggregate(total=Sum('montant'))['total'] or 0
         
-        # Stock value
-        products = Product.objects.filter(actif=True).select_related('base_price')
-        stock_value = 0
-        for product in products:
-            stock = StockMovement.get_current_stock(product)
-            base_price = getattr(product, 'base_price', None)
-            price = float(base_price.prix_base) if base_price else 0
-            stock_value += stock * price
+        # Stock value (weighted-average cost)
+        stock_value = ProductCost.objects.aggregate(total=Sum('valeur'))['total'] or 0
         
         # Total sales (all validated invoices)
         total_sales = Invoice.objects.filter(
@@ -280,17 +254,17 @@ class DashboardViewSet(viewsets.ViewSet):
         
         if start_date:
             try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                movements = movements.filter(created_at__date__gte=start_date)
+                start_date = parse_date(start_date)
+                movements = movements.filter(date_range_q('created_at', start=start_date))
             except ValueError:
-                pass
+                start_date = None
         
         if end_date:
             try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                movements = movements.filter(created_at__date__lte=end_date)
+                end_date = parse_date(end_date)
+                movements = movements.filter(date_range_q('created_at', end=end_date))
             except ValueError:
-                pass
+                end_date = None
         
         # Group by type
         movement_stats = movements.values('type').annotate(
@@ -388,8 +362,8 @@ class DashboardViewSet(viewsets.ViewSet):
             start_date = end_date
         else:
             try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+                start_date = parse_date(start_date)
+                end_date = parse_date(end_date)
             except ValueError:
                 return Response(
                     {'error': 'Invalid date format. Use YYYY-MM-DD.'},
@@ -397,9 +371,8 @@ class DashboardViewSet(viewsets.ViewSet):
                 )
         
         invoices = Invoice.objects.filter(
-            statut=InvoiceStatus.VALIDEE,
-            validated_at__date__gte=start_date,
-            validated_at__date__lte=end_date
+            date_range_q('validated_at', start_date, end_date),
+            statut=InvoiceStatus.VALIDEE
         )
         
         total_ca = invoices.aggregate(total=Sum('total_ttc'))['total'] or 0
@@ -455,12 +428,12 @@ class DashboardViewSet(viewsets.ViewSet):
         # Containers in progress
         in_progress = Container.objects.filter(
             statut__in=[ContainerStatus.EN_COURS, ContainerStatus.DECHARGE]
-        ).order_by('date_arrivee_estimee')
+        ).with_totals().order_by('date_arrivee_estimee')
         
         # Upcoming containers (PREVU)
         upcoming = Container.objects.filter(
             statut=ContainerStatus.PREVU
-        ).order_by('date_arrivee_estimee')[:5]  # Next 5
+        ).with_totals().order_by('date_arrivee_estimee')[:5]  # Next 5
         
         in_progress_list = []
         for container in in_progress:
@@ -471,6 +444,10 @@ class DashboardViewSet(viewsets.ViewSet):
                 'statut_display': container.get_statut_display(),
                 'date_arrivee_estimee': container.date_arrivee_estimee.isoformat(),
                 'date_arrivee_reelle': container.date_arrivee_reelle.isoformat() if container.date_arrivee_reelle else None,
+                'total_qty_prevue': container.total_qty_prevue,
+                'total_qty_recue': container.total_qty_recue,
+                'total_casse': container.total_casse,
+                'ecart_qty': container.ecart_qty,
             })
         
         upcoming_list = []
@@ -481,12 +458,13 @@ class DashboardViewSet(viewsets.ViewSet):
                 'statut': container.statut,
                 'statut_display': container.get_statut_display(),
                 'date_arrivee_estimee': container.date_arrivee_estimee.isoformat(),
+                'total_qty_prevue': container.total_qty_prevue,
             })
         
         return Response({
-            'in_progress_count': in_progress.count(),
+            'in_progress_count': len(in_progress_list),
             'in_progress': in_progress_list,
-            'upcoming_count': upcoming.count(),
+            'upcoming_count': len(upcoming_list),
             'upcoming': upcoming_list,
         })
 
@@ -605,51 +583,49 @@ class DashboardViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def pending_reminders(self, request):
-        """Get pending reminders (invoices to follow up)."""
+        """Get pending reminders (invoices to follow up). Read-only: dates are computed, not saved."""
         from apps.billing.models import Invoice, InvoiceStatus
-        from datetime import timedelta
+        from django.conf import settings
+        from django.db.models import DateTimeField, ExpressionWrapper, F
+        from django.db.models.functions import Coalesce, TruncDate
         
         limit = int(request.query_params.get('limit', 10))
         today = timezone.now().date()
         
-        # Get all validated invoices with reste > 0
+        # Reminder date, or the first reminder date for invoices that have none yet
+        first_delay = timedelta(days=settings.INVOICE_REMINDER_FIRST_DELAY)
         reminders = Invoice.objects.filter(
             statut=InvoiceStatus.VALIDEE,
-            reste__gt=0
-        ).select_related('client').order_by('prochaine_date_relance', '-validated_at')
+            reste__gt=0,
+            relances_suspendues__isnull=True  # Client unreachable: not a pending reminder
+        ).annotate(
+            date_relance=Coalesce(
+                'prochaine_date_relance',
+                TruncDate(ExpressionWrapper(F('validated_at') + first_delay, output_field=DateTimeField()))
+            )
+        ).filter(
+            date_relance__isnull=False
+        ).select_related('client').order_by('date_relance', '-validated_at')[:limit]
         
+        # Ordered by date: overdue first, then today, then future
         reminders_list = []
         for invoice in reminders:
-            # Calculate reminder date if not set
-            if not invoice.prochaine_date_relance and invoice.validated_at:
-                invoice.prochaine_date_relance = (invoice.validated_at + timedelta(days=30)).date()
-                invoice.save(update_fields=['prochaine_date_relance'])
-            
-            # Calculate reminder date if validated_at exists but prochaine_date_relance is None
-            if not invoice.prochaine_date_relance and invoice.validated_at:
-                calculated_date = (invoice.validated_at + timedelta(days=30)).date()
-            else:
-                calculated_date = invoice.prochaine_date_relance
+            calculated_date = invoice.date_relance
+            is_overdue = calculated_date < today
+            is_due_today = calculated_date == today
             
-            # Include all invoices with reste > 0, prioritizing those with reminder date <= today
-            if calculated_date:
-                is_overdue = calculated_date < today
-                is_due_today = calculated_date == today
-                
-                reminders_list.append({
-                    'id': invoice.id,
-                    'numero': invoice.numero or f'Brouillon-{invoice.id}',
-                    'client': invoice.client.nom_complet,
-                    'reste': float(invoice.reste),
-                    'date_relance': calculated_date.isoformat(),
-                    'is_overdue': is_overdue,
-                    'is_due_today': is_due_today,
-                    'priority': 0 if is_overdue else (1 if is_due_today else 2),  # Priority: overdue > today > future
-                })
-        
-        # Sort by priority (overdue first, then today, then future) and then by date
-        reminders_list.sort(key=lambda x: (x['priority'], x['date_relance']))
-        reminders_list = reminders_list[:limit]
+            reminders_list.append({
+                'id': invoice.id,
+                'numero': invoice.numero or f'Brouillon-{invoice.id}',
+                'client': invoice.client.nom_complet,
+                'reste': float(invoice.reste),
+                'date_relance': calculated_date.isoformat(),
+                'nb_relances': invoice.nb_relances,
+                'derniere_relance': invoice.derniere_relance.isoformat() if invoice.derniere_relance else None,
+                'is_overdue': is_overdue,
+                'is_due_today': is_due_today,
+                'priority': 0 if is_overdue else (1 if is_due_today else 2),  # Priority: overdue > today > future
+            })
         
         return Response({
             'reminders': reminders_list,
@@ -2,7 +2,7 @@
 Admin configuration for stock app.
 """
 from django.contrib import admin
-from .models import StockMovement
+from .models import StockMovement, ProductCost, MovementCost
 
 
 @admin.register(StockMovement)
@@ -13,3 +13,26 @@ class StockMovementAdmin(admin.ModelAdmin):
     search_fields = ['product__nom', 'reference', 'reason']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
+
+
+@admin.register(ProductCost)
+class ProductCostAdmin(admin.ModelAdmin):
+    """Admin interface for ProductCost model (maintained automatically)."""
+    list_display = ['product', 'qty', 'cout_moyen', 'valeur', 'updated_at']
+    search_fields = ['product__nom']
+    ordering = ['product__nom']
+    readonly_fields = ['product', 'qty', 'cout_moyen', 'valeur', 'updated_at']
+
+
+@admin.register(MovementCost)
+class MovementCostAdmin(admin.ModelAdmin):
+    """Admin interface for MovementCost model (maintained automatically)."""
+    list_display = ['movement', 'qty', 'cout_unitaire', 'valeur', 'cout_estime', 'qty_apres', 'cout_moyen_apres', 'valeur_apres']
+    list_filter = ['cout_estime', 'created_at']
+    search_fields = ['product__nom', 'movement__reference']
+    ordering = ['-created_at', '-id']
+    raw_id_fields = ['movement']
+    readonly_fields = [
+        'movement', 'product', 'created_at', 'qty', 'cout_unitaire', 'valeur', 'cout_estime',
+        'qty_apres', 'cout_moyen_apres', 'valeur_apres'
+    ]
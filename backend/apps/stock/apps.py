@@ -5,3 +5,7 @@ class StockConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.stock'
     verbose_name = 'Stock'
+
+    def ready(self):
+        """Import signals when app is ready."""
+        import apps.stock.signals  # noqa
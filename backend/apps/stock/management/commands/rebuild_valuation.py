@@ -0,0 +1,16 @@
+"""
+Rebuild the stock valuation at weighted-average cost (ProductCost, MovementCost) from the stock movements.
+Usage: python manage.py rebuild_valuation
+"""
+from django.core.management.base import BaseCommand
+from apps.stock.valuation import rebuild_valuation
+
+
+class Command(BaseCommand):
+    help = 'Recompute the average cost of every product and the cost of every stock movement.'
+
+    def handle(self, *args, **options):
+        products, movements = rebuild_valuation()
+        self.stdout.write(self.style.SUCCESS(
+            f'{movements} mouvements valorisés, coût moyen recalculé pour {products} produits.'
+        ))
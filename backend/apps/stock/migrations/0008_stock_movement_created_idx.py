@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-19 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0007_alter_purchase_fournisseur_purchasepayment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at'], name='stock_movement_created_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.8 on 2026-10-19 07:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def value_existing_stock(apps, schema_editor):
+    """Value the movements recorded before this migration (same replay as manage.py rebuild_valuation)."""
+    from apps.stock.valuation import rebuild_valuation
+
+    rebuild_valuation(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_add_categorie_to_product'),
+        ('stock', '0008_stock_movement_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.IntegerField(default=0, verbose_name='Quantité en stock')),
+                ('cout_moyen', models.DecimalField(decimal_places=4, default=0, max_digits=12, verbose_name='Coût moyen pondéré')),
+                ('valeur', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valeur du stock')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cost', to='catalog.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Coût produit',
+                'verbose_name_plural': 'Coûts produits',
+                'ordering': ['product__nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovementCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Date du mouvement')),
+                ('qty', models.IntegerField(verbose_name='Quantité signée')),
+                ('cout_unitaire', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Coût unitaire')),
+                ('valeur', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Valeur du mouvement')),
+                ('cout_estime', models.BooleanField(default=False, help_text="Entrée sans prix d'achat connu, valorisée au coût moyen ou au dernier prix d'achat", verbose_name='Coût estimé')),
+                ('qty_apres', models.IntegerField(verbose_name='Quantité après')),
+                ('cout_moyen_apres', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Coût moyen après')),
+                ('valeur_apres', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Valeur après')),
+                ('movement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cost', to='stock.stockmovement', verbose_name='Mouvement')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movement_costs', to='catalog.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Coût de mouvement',
+                'verbose_name_plural': 'Coûts de mouvements',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['product', 'created_at', 'id'], name='movement_cost_product_idx')],
+            },
+        ),
+        migrations.RunPython(value_existing_stock, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 """
 Stock models - Stock movements only (no direct quantity field).
 """
+from decimal import Decimal
 from django.db import models
-from django.db.models import Sum, Q
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Q
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from apps.catalog.models import Product
@@ -14,6 +16,32 @@ class PurchaseStatus(models.TextChoices):
     VALIDE = 'VALIDE', 'Validé'
 
 
+class PurchaseQuerySet(models.QuerySet):
+    """QuerySet for Purchase with SQL-side totals."""
+
+    def with_totals(self):
+        """Annotate line total and paid amount so total/paye/reste cost no extra query."""
+        amount = DecimalField(max_digits=12, decimal_places=2)
+        lines_total = (
+            PurchaseLine.objects.filter(purchase=OuterRef('pk'))
+            .order_by()
+            .values('purchase')
+            .annotate(total=Sum(ExpressionWrapper(F('qty') * F('prix_unitaire'), output_field=amount)))
+            .values('total')
+        )
+        payments_total = (
+            PurchasePayment.objects.filter(purchase=OuterRef('pk'))
+            .order_by()
+            .values('purchase')
+            .annotate(total=Sum('montant'))
+            .values('total')
+        )
+        return self.annotate(
+            annotated_total=Coalesce(Subquery(lines_total, output_field=amount), Decimal('0')),
+            annotated_paye=Coalesce(Subquery(payments_total, output_field=amount), Decimal('0')),
+        )
+
+
 class Purchase(models.Model):
     """Purchase model for direct purchases from suppliers (without container)."""
     fournisseur = models.ForeignKey(
@@ -52,6 +80,8 @@ class Purchase(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
 
+    objects = PurchaseQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Achat'
         verbose_name_plural = 'Achats'
@@ -92,11 +122,15 @@ class Purchase(models.Model):
     @property
     def total(self):
         """Get total amount from purchase lines."""
+        if hasattr(self, 'annotated_total'):
+            return self.annotated_total
         return sum(line.qty * line.prix_unitaire for line in self.purchase_lines.all())
     
     @property
     def paye(self):
         """Get total paid amount."""
+        if hasattr(self, 'annotated_paye'):
+            return self.annotated_paye
         return self.payments.aggregate(total=Sum('montant'))['total'] or 0
     
     @property
@@ -230,6 +264,7 @@ class StockMovement(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['created_at'], name='stock_movement_created_idx'),
             models.Index(fields=['type']),
             models.Index(fields=['reference']),
         ]
@@ -260,3 +295,72 @@ class StockMovement(models.Model):
             .annotate(total=Sum('qty_signee'))
         )
         return {item['product']: item['total'] or 0 for item in results}
+
+
+class ProductCost(models.Model):
+    """
+    Running weighted-average cost of a product.
+
+    Maintained by apps.stock.valuation on every stock movement, so the
+    current stock value is read from one row per product.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='cost',
+        verbose_name='Produit'
+    )
+    qty = models.IntegerField(default=0, verbose_name='Quantité en stock')
+    cout_moyen = models.DecimalField(max_digits=12, decimal_places=4, default=0, verbose_name='Coût moyen pondéré')
+    valeur = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Valeur du stock')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')
+
+    class Meta:
+        verbose_name = 'Coût produit'
+        verbose_name_plural = 'Coûts produits'
+        ordering = ['product__nom']
+
+    def __str__(self):
+        return f"{self.product} : {self.qty} × {self.cout_moyen} = {self.valeur} €"
+
+
+class MovementCost(models.Model):
+    """
+    Cost of a stock movement and the product valuation right after it.
+    The last row of a product before a date gives its valuation at that date.
+    """
+    movement = models.OneToOneField(
+        StockMovement,
+        on_delete=models.CASCADE,
+        related_name='cost',
+        verbose_name='Mouvement'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='movement_costs',
+        verbose_name='Produit'
+    )
+    created_at = models.DateTimeField(verbose_name='Date du mouvement')
+    qty = models.IntegerField(verbose_name='Quantité signée')
+    cout_unitaire = models.DecimalField(max_digits=12, decimal_places=4, verbose_name='Coût unitaire')
+    valeur = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valeur du mouvement')
+    cout_estime = models.BooleanField(
+        default=False,
+        verbose_name='Coût estimé',
+        help_text='Entrée sans prix d\'achat connu, valorisée au coût moyen ou au dernier prix d\'achat'
+    )
+    qty_apres = models.IntegerField(verbose_name='Quantité après')
+    cout_moyen_apres = models.DecimalField(max_digits=12, decimal_places=4, verbose_name='Coût moyen après')
+    valeur_apres = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valeur après')
+
+    class Meta:
+        verbose_name = 'Coût de mouvement'
+        verbose_name_plural = 'Coûts de mouvements'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='movement_cost_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movement} : {self.valeur} €"
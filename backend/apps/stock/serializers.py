@@ -6,21 +6,27 @@ from .models import StockMovement, MovementType, Purchase, PurchaseLine, Purchas
 from apps.catalog.serializers import ProductSerializer
 from apps.users.serializers import UserListSerializer
 from apps.clients.serializers import ClientSerializer
+from gsa_backend.expansion import Expandable, SparseFieldsMixin
 
 
-class StockMovementSerializer(serializers.ModelSerializer):
-    """Serializer for StockMovement model."""
+class StockMovementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for StockMovement model (?expand=product_detail,created_by_detail)."""
     type_display = serializers.CharField(source='get_type_display', read_only=True)
-    product_detail = ProductSerializer(source='product', read_only=True)
-    created_by_detail = UserListSerializer(source='created_by', read_only=True)
+    product_nom = serializers.CharField(source='product.nom', read_only=True)
+    product_unite_vente_display = serializers.CharField(source='product.get_unite_vente_display', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
 
     class Meta:
         model = StockMovement
         fields = [
-            'id', 'product', 'product_detail', 'qty_signee', 'type', 'type_display',
-            'reference', 'created_by', 'created_by_detail', 'reason', 'created_at'
+            'id', 'product', 'product_nom', 'product_unite_vente_display', 'qty_signee', 'type', 'type_display',
+            'reference', 'created_by', 'created_by_username', 'reason', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+        expandable_fields = {
+            'product_detail': Expandable(ProductSerializer, 'product', related=['product__base_price']),
+            'created_by_detail': Expandable(UserListSerializer, 'created_by'),
+        }
 
 
 class StockCurrentSerializer(serializers.Serializer):
@@ -51,12 +57,20 @@ class PurchaseLineSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class PurchaseSerializer(serializers.ModelSerializer):
-    """Serializer for Purchase model."""
+def fournisseur_display_name(purchase):
+    """Display name of the supplier of a purchase."""
+    fournisseur = purchase.fournisseur
+    if fournisseur is None:
+        return None
+    return fournisseur.entreprise or fournisseur.nom_complet
+
+
+class PurchaseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Purchase model (?expand=fournisseur_detail)."""
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     validated_by_username = serializers.CharField(source='validated_by.username', read_only=True)
-    fournisseur_detail = ClientSerializer(source='fournisseur', read_only=True)
+    fournisseur_nom = serializers.SerializerMethodField()
     total_achat = serializers.DecimalField(source='total', max_digits=10, decimal_places=2, read_only=True)
     total_paye = serializers.DecimalField(source='paye', max_digits=10, decimal_places=2, read_only=True)
     reste_a_payer = serializers.DecimalField(source='reste', max_digits=10, decimal_places=2, read_only=True)
@@ -64,7 +78,7 @@ class PurchaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Purchase
         fields = [
-            'id', 'fournisseur', 'fournisseur_detail', 'date_achat', 'reference', 'statut', 'statut_display',
+            'id', 'fournisseur', 'fournisseur_nom', 'date_achat', 'reference', 'statut', 'statut_display',
             'created_by', 'created_by_username', 'validated_at', 'validated_by',
             'validated_by_username', 'created_at', 'updated_at', 'total_achat', 'total_paye', 'reste_a_payer'
         ]
@@ -72,6 +86,12 @@ class PurchaseSerializer(serializers.ModelSerializer):
             'id', 'reference', 'statut', 'validated_at', 'validated_by', 'created_at', 'updated_at',
             'total_achat', 'total_paye', 'reste_a_payer'
         ]
+        expandable_fields = {
+            'fournisseur_detail': Expandable(ClientSerializer, 'fournisseur'),
+        }
+
+    def get_fournisseur_nom(self, obj):
+        return fournisseur_display_name(obj)
 
 
 class PurchasePaymentSerializer(serializers.ModelSerializer):
@@ -93,6 +113,7 @@ class PurchaseDetailSerializer(serializers.ModelSerializer):
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     validated_by_username = serializers.CharField(source='validated_by.username', read_only=True)
+    fournisseur_nom = serializers.SerializerMethodField()
     fournisseur_detail = ClientSerializer(source='fournisseur', read_only=True)
     purchase_lines = PurchaseLineSerializer(many=True, read_only=True)
     payments = PurchasePaymentSerializer(many=True, read_only=True)
@@ -103,8 +124,8 @@ class PurchaseDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Purchase
         fields = [
-            'id', 'fournisseur', 'fournisseur_detail', 'date_achat', 'reference', 'statut', 'statut_display',
-            'created_by', 'created_by_username', 'validated_at', 'validated_by',
+            'id', 'fournisseur', 'fournisseur_nom', 'fournisseur_detail', 'date_achat', 'reference', 'statut',
+            'statut_display', 'created_by', 'created_by_username', 'validated_at', 'validated_by',
             'validated_by_username', 'purchase_lines', 'payments', 'total_achat', 'total_paye', 'reste_a_payer',
             'created_at', 'updated_at'
         ]
@@ -112,3 +133,6 @@ class PurchaseDetailSerializer(serializers.ModelSerializer):
             'id', 'reference', 'statut', 'validated_at', 'validated_by', 'created_at', 'updated_at',
             'total_achat', 'total_paye', 'reste_a_payer'
         ]
+
+    def get_fournisseur_nom(self, obj):
+        return fournisseur_display_name(obj)
@@ -0,0 +1,14 @@
+"""
+Signals for stock app - value every new stock movement (valuation.py).
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import StockMovement
+from .valuation import record_movement
+
+
+@receiver(post_save, sender=StockMovement)
+def stock_movement_created(sender, instance, created=False, raw=False, **kwargs):
+    """Value a new movement and update the running cost of its product."""
+    if created and not raw:
+        record_movement(instance)
@@ -6,19 +6,12 @@ from datetime import datetime, date
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.db.models import Sum
+from gsa_backend.metrics import track_pdf_render
+from gsa_backend.pdf import PDFUnavailable, is_pdf_available, render_pdf, unavailable_reason
+from gsa_backend.periods import date_range_q
 from .models import StockMovement
 from apps.catalog.models import Product
 
-# Try to import WeasyPrint, but make it optional
-try:
-    from weasyprint import HTML, CSS
-    from weasyprint.text.fonts import FontConfiguration
-    WEASYPRINT_AVAILABLE = True
-except (ImportError, OSError) as e:
-    WEASYPRINT_AVAILABLE = False
-    WEASYPRINT_ERROR = str(e)
-
-
 def get_stock_at_date(target_date):
     """
     Calculate stock for all products at a specific date.
@@ -30,8 +23,8 @@ def get_stock_at_date(target_date):
     for product in products:
         # Get all movements up to and including the target date
         movements = StockMovement.objects.filter(
-            product=product,
-            created_at__date__lte=target_date
+            date_range_q('created_at', end=target_date),
+            product=product
         )
         stock = movements.aggregate(total=Sum('qty_signee'))['total'] or 0
         stock_data.append({
@@ -42,16 +35,17 @@ def get_stock_at_date(target_date):
     return stock_data
 
 
+@track_pdf_render('stock_report')
 def generate_stock_pdf(target_date):
     """
     Generate PDF for stock report at a specific date.
     Returns the file path relative to MEDIA_ROOT.
     Raises Exception if WeasyPrint is not available.
     """
-    if not WEASYPRINT_AVAILABLE:
-        raise Exception(
+    if not is_pdf_available():
+        raise PDFUnavailable(
             f"PDF generation is not available. WeasyPrint dependencies are missing. "
-            f"Error: {WEASYPRINT_ERROR if 'WEASYPRINT_ERROR' in globals() else 'Unknown error'}"
+            f"Error: {unavailable_reason() or 'Unknown error'}"
         )
     
     # Ensure reports directory exists
@@ -97,14 +91,7 @@ def generate_stock_pdf(target_date):
     })
     
     # Generate PDF
-    font_config = FontConfiguration()
-    pdf_file = HTML(string=html_content)
-    
-    # Generate PDF
-    pdf_file.write_pdf(
-        target=filepath,
-        font_config=font_config
-    )
+    render_pdf(html_content, filepath)
     
     # Return relative path
     relative_path = f"reports/{filename}"
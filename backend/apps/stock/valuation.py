@@ -0,0 +1,272 @@
+"""
+Inventory valuation at weighted-average cost for stock app.
+
+Every stock movement is valued when it is created (signals.py):
+
+- an entry from a purchase (RECEPTION "ACHAT-<reference>") comes in at the
+  purchase price of its PurchaseLine and updates the weighted-average cost;
+- any other entry (container reception, positive adjustment) comes in at the
+  current average cost, or at the last purchase price of the product when
+  it has no cost yet; receptions without a purchase price are flagged as
+  estimated;
+- exits (VENTE, CASSE, negative adjustment) go out at the average cost.
+
+ProductCost holds the running quantity, average cost and value of each
+product (current valuation = one row per product). MovementCost keeps the
+cost of each movement and the valuation right after it, so the valuation at
+any date is the last MovementCost row of each product before that date.
+``rebuild_valuation`` replays every movement (manage.py rebuild_valuation).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Concat
+
+from apps.catalog.models import Product
+from gsa_backend.periods import date_range_q
+from .models import MovementCost, MovementType, ProductCost, PurchaseLine, PurchaseStatus, StockMovement
+
+CENT = Decimal('0.01')
+COST_PLACES = Decimal('0.0001')
+PURCHASE_PREFIX = 'ACHAT-'
+SALE_PREFIX = 'FACT-'
+
+
+def purchase_unit_cost(reference, product_id):
+    """Purchase price of a product for an 'ACHAT-<reference>' movement, or None."""
+    if not reference or not reference.startswith(PURCHASE_PREFIX):
+        return None
+    return PurchaseLine.objects.filter(
+        purchase__reference=reference[len(PURCHASE_PREFIX):], product_id=product_id
+    ).values_list('prix_unitaire', flat=True).first()
+
+
+def last_purchase_cost(product_id):
+    """Price of the most recent validated purchase of a product, or None."""
+    return PurchaseLine.objects.filter(
+        product_id=product_id, purchase__statut=PurchaseStatus.VALIDE
+    ).order_by('-purchase__validated_at', '-id').values_list('prix_unitaire', flat=True).first()
+
+
+def apply_movement(state, qty, unit_cost=None, fallback_cost=None):
+    """
+    Apply a movement of `qty` units to `state` (a ProductCost, updated in place).
+
+    `unit_cost` is the known cost of an entry; without it an entry is valued at
+    the average cost, else at `fallback_cost()` (last purchase price).
+    Returns (unit cost, movement value).
+    """
+    if qty > 0:
+        if unit_cost is None:
+            unit_cost = state.cout_moyen or (fallback_cost() if fallback_cost else None) or Decimal('0')
+        unit_cost = Decimal(unit_cost)
+        valeur = (qty * unit_cost).quantize(CENT)
+        if state.qty <= 0:
+            # Nothing left to average with (or negative stock): start again at the entry cost
+            state.qty += qty
+            state.cout_moyen = unit_cost.quantize(COST_PLACES)
+            state.valeur = (state.qty * unit_cost).quantize(CENT)
+        else:
+            state.qty += qty
+            state.valeur += valeur
+            state.cout_moyen = (state.valeur / state.qty).quantize(COST_PLACES)
+        return unit_cost, valeur
+
+    unit_cost = state.cout_moyen
+    if qty == 0:
+        return unit_cost, Decimal('0.00')
+    if state.qty + qty == 0:
+        # Last units out: take the whole remaining value (no rounding residue)
+        valeur = -state.valeur
+    else:
+        valeur = (qty * unit_cost).quantize(CENT)
+    state.qty += qty
+    state.valeur += valeur
+    return unit_cost, valeur
+
+
+def _movement_cost(movement_id, product_id, created_at, qty, unit_cost, valeur, estimated, state, model=MovementCost):
+    return model(
+        movement_id=movement_id,
+        product_id=product_id,
+        created_at=created_at,
+        qty=qty,
+        cout_unitaire=Decimal(unit_cost).quantize(COST_PLACES),
+        valeur=valeur,
+        cout_estime=estimated,
+        qty_apres=state.qty,
+        cout_moyen_apres=state.cout_moyen,
+        valeur_apres=state.valeur,
+    )
+
+
+def record_movement(movement):
+    """Value a new stock movement and update the running cost of its product."""
+    with transaction.atomic():
+        ProductCost.objects.get_or_create(product_id=movement.product_id)
+        state = ProductCost.objects.select_for_update().get(product_id=movement.product_id)
+        unit_cost = None
+        is_reception = movement.type == MovementType.RECEPTION and movement.qty_signee > 0
+        if is_reception:
+            unit_cost = purchase_unit_cost(movement.reference, movement.product_id)
+        cost, valeur = apply_movement(
+            state, movement.qty_signee, unit_cost, lambda: last_purchase_cost(movement.product_id)
+        )
+        _movement_cost(
+            movement.pk, movement.product_id, movement.created_at, movement.qty_signee,
+            cost, valeur, is_reception and unit_cost is None, state
+        ).save()
+        state.save()
+
+
+def rebuild_valuation(batch_size=1000, apps=None):
+    """
+    Recompute every ProductCost and MovementCost row by replaying the stock
+    movements in order. Returns (product count, movement count).
+
+    `apps` is the app registry of a data migration (historical models).
+    """
+    if apps is not None:
+        stock_movement, purchase_line, product_cost, movement_cost = (
+            apps.get_model('stock', name) for name in ('StockMovement', 'PurchaseLine', 'ProductCost', 'MovementCost')
+        )
+    else:
+        stock_movement, purchase_line, product_cost, movement_cost = (
+            StockMovement, PurchaseLine, ProductCost, MovementCost
+        )
+    purchase_costs = {
+        (f'{PURCHASE_PREFIX}{reference}', product_id): prix
+        for reference, product_id, prix in purchase_line.objects.filter(
+            purchase__reference__isnull=False
+        ).values_list('purchase__reference', 'product_id', 'prix_unitaire')
+    }
+    movements = stock_movement.objects.order_by('product_id', 'created_at', 'id').values_list(
+        'id', 'product_id', 'qty_signee', 'type', 'reference', 'created_at'
+    )
+
+    states, last_costs, rows, count = {}, {}, [], 0
+    with transaction.atomic():
+        movement_cost.objects.all().delete()
+        product_cost.objects.all().delete()
+        for movement_id, product_id, qty, movement_type, reference, created_at in movements.iterator(chunk_size=batch_size):
+            state = states.get(product_id)
+            if state is None:
+                state = states[product_id] = product_cost(
+                    product_id=product_id, qty=0, cout_moyen=Decimal('0'), valeur=Decimal('0')
+                )
+            is_reception = movement_type == MovementType.RECEPTION and qty > 0
+            unit_cost = purchase_costs.get((reference, product_id)) if is_reception else None
+            if unit_cost is not None:
+                last_costs[product_id] = unit_cost
+            cost, valeur = apply_movement(state, qty, unit_cost, lambda: last_costs.get(product_id))
+            rows.append(_movement_cost(
+                movement_id, product_id, created_at, qty, cost, valeur, is_reception and unit_cost is None, state,
+                model=movement_cost
+            ))
+            if len(rows) >= batch_size:
+                movement_cost.objects.bulk_create(rows)
+                count += len(rows)
+                rows = []
+        movement_cost.objects.bulk_create(rows)
+        count += len(rows)
+        product_cost.objects.bulk_create(states.values(), batch_size=batch_size)
+    return len(states), count
+
+
+def current_valuation():
+    """Current value of the stock at average cost: (total, rows per product in stock)."""
+    costs = ProductCost.objects.filter(~Q(qty=0) | ~Q(valeur=0)).select_related('product').order_by('product__nom')
+    rows = [
+        {
+            'product_id': cost.product_id,
+            'product_name': cost.product.nom,
+            'stock': cost.qty,
+            'cout_moyen': cost.cout_moyen,
+            'value': cost.valeur,
+        }
+        for cost in costs
+    ]
+    return sum((row['value'] for row in rows), Decimal('0.00')), rows
+
+
+def valuation_at(day):
+    """Value of the stock at the end of `day`: (total, rows per product in stock)."""
+    last = MovementCost.objects.filter(
+        date_range_q('created_at', end=day), product=OuterRef('pk')
+    ).order_by('-created_at', '-id')
+    products = (
+        Product.objects
+        .annotate(
+            stock=Subquery(last.values('qty_apres')[:1]),
+            cout=Subquery(last.values('cout_moyen_apres')[:1]),
+            value=Subquery(last.values('valeur_apres')[:1]),
+        )
+        .filter(stock__isnull=False)
+        .exclude(stock=0, value=0)
+        .order_by('nom')
+        .values('id', 'nom', 'stock', 'cout', 'value')
+    )
+    rows = [
+        {
+            'product_id': product['id'],
+            'product_name': product['nom'],
+            'stock': product['stock'],
+            'cout_moyen': product['cout'],
+            'value': product['value'],
+        }
+        for product in products
+    ]
+    return sum((row['value'] for row in rows), Decimal('0.00')), rows
+
+
+def margins(start, end):
+    """
+    Gross margin per product of the invoices validated between `start` and `end`:
+    revenue of the invoice lines minus the average cost of their sale movements.
+    Returns (totals, rows sorted by margin).
+    """
+    from apps.billing.models import Invoice, InvoiceLine, InvoiceStatus
+
+    invoices = Invoice.objects.filter(
+        date_range_q('validated_at', start, end),
+        statut__in=[InvoiceStatus.VALIDEE, InvoiceStatus.ACCEPTEE, InvoiceStatus.CONTESTEE]
+    )
+    sales = (
+        InvoiceLine.objects.filter(invoice__in=invoices)
+        .order_by()
+        .values('product', 'product__nom')
+        .annotate(qty_vendue=Sum('qty'), chiffre_affaires=Sum('total_ligne'))
+    )
+    references = invoices.annotate(movement_reference=Concat(Value(SALE_PREFIX), F('numero'))).values('movement_reference')
+    costs = dict(
+        MovementCost.objects.filter(
+            movement__type=MovementType.VENTE, movement__reference__in=references
+        ).order_by().values('product').annotate(total=Sum('valeur')).values_list('product', 'total')
+    )
+
+    rows = []
+    for sale in sales:
+        chiffre_affaires = sale['chiffre_affaires'] or Decimal('0')
+        cout = -(costs.get(sale['product']) or Decimal('0'))
+        marge = chiffre_affaires - cout
+        rows.append({
+            'product_id': sale['product'],
+            'product_name': sale['product__nom'],
+            'qty_vendue': sale['qty_vendue'],
+            'chiffre_affaires': chiffre_affaires,
+            'cout_revient': cout,
+            'marge': marge,
+            'taux_marge': round(marge * 100 / chiffre_affaires, 2) if chiffre_affaires else None,
+        })
+    rows.sort(key=lambda row: row['marge'], reverse=True)
+
+    chiffre_affaires = sum((row['chiffre_affaires'] for row in rows), Decimal('0'))
+    cout = sum((row['cout_revient'] for row in rows), Decimal('0'))
+    totals = {
+        'chiffre_affaires': chiffre_affaires,
+        'cout_revient': cout,
+        'marge': chiffre_affaires - cout,
+        'taux_marge': round((chiffre_affaires - cout) * 100 / chiffre_affaires, 2) if chiffre_affaires else None,
+    }
+    return totals, rows
@@ -21,12 +21,14 @@ from .serializers import (
 from apps.catalog.models import Product
 from apps.users.permissions import IsReadOnlyOrAuthenticated, IsLogistique
 from apps.audit.utils import create_audit_log
-from django.http import FileResponse
-from datetime import datetime, date
+from gsa_backend.concurrency import document_endpoint
+from gsa_backend.expansion import ExpandableQuerysetMixin
+from gsa_backend.periods import report_date_param
+from gsa_backend.sendfile import file_response
 import os
 
 
-class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
+class StockMovementViewSet(ExpandableQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing stock movements."""
     queryset = StockMovement.objects.select_related('product', 'created_by').all()
     serializer_class = StockMovementSerializer
@@ -83,7 +85,7 @@ class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
         
         try:
             product = Product.objects.get(pk=product_id)
-            movements = StockMovement.objects.filter(product=product).order_by('-created_at')
+            movements = StockMovement.objects.filter(product=product).select_related('product', 'created_by').order_by('-created_at')
             serializer = StockMovementSerializer(movements, many=True)
             
             # Add running total
@@ -161,39 +163,19 @@ class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer_response.data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
+    @document_endpoint('stock_report')
     def print_stock(self, request):
         """Generate PDF report of stock at a specific date."""
-        from .utils import generate_stock_pdf, WEASYPRINT_AVAILABLE
+        from .utils import generate_stock_pdf
+        from gsa_backend.pdf import is_pdf_available
         from django.conf import settings
         
         date_param = request.query_params.get('date', None)
-        if not date_param:
-            return Response(
-                {'error': 'Date parameter is required (format: YYYY-MM-DD, YYYY-MM, or YYYY)'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Parse date parameter
-        try:
-            if len(date_param) == 4:  # YYYY
-                target_date = datetime.strptime(date_param, '%Y').date().replace(month=12, day=31)
-            elif len(date_param) == 7:  # YYYY-MM
-                target_date = datetime.strptime(date_param, '%Y-%m').date()
-                # Get last day of month
-                from calendar import monthrange
-                last_day = monthrange(target_date.year, target_date.month)[1]
-                target_date = target_date.replace(day=last_day)
-            elif len(date_param) == 10:  # YYYY-MM-DD
-                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-            else:
-                raise ValueError("Invalid date format")
-        except ValueError as e:
-            return Response(
-                {'error': f'Invalid date format: {str(e)}. Use YYYY-MM-DD, YYYY-MM, or YYYY'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        target_date, error_response = report_date_param(request)
+        if error_response:
+            return error_response
         
-        if not WEASYPRINT_AVAILABLE:
+        if not is_pdf_available():
             return Response(
                 {'error': 'PDF generation is not available. WeasyPrint system dependencies are missing.'},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
@@ -203,11 +185,7 @@ class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
             pdf_path = generate_stock_pdf(target_date)
             full_path = os.path.join(settings.MEDIA_ROOT, pdf_path)
             
-            return FileResponse(
-                open(full_path, 'rb'),
-                content_type='application/pdf',
-                filename=f"stock_{date_param}.pdf"
-            )
+            return file_response(full_path, 'application/pdf', f"stock_{date_param}.pdf", as_attachment=False)
         except Exception as e:
             return Response(
                 {'error': f'Error generating PDF: {str(e)}'},
@@ -215,9 +193,9 @@ class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
             )
 
 
-class PurchaseViewSet(viewsets.ModelViewSet):
+class PurchaseViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet for Purchase management."""
-    queryset = Purchase.objects.select_related('created_by', 'validated_by', 'fournisseur').prefetch_related('purchase_lines__product').all()
+    queryset = Purchase.objects.select_related('created_by', 'validated_by', 'fournisseur').with_totals()
     permission_classes = [IsReadOnlyOrAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['statut', 'fournisseur', 'created_by']
@@ -225,6 +203,13 @@ class PurchaseViewSet(viewsets.ModelViewSet):
     ordering_fields = ['date_achat', 'created_at']
     ordering = ['-date_achat', '-created_at']
 
+    def get_queryset(self):
+        """Prefetch lines and payments only where they are serialized."""
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('purchase_lines__product', 'payments__created_by')
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return PurchaseDetailSerializer
@@ -278,45 +263,59 @@ class PurchaseViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def supplier_debts(self, request):
         """Get unpaid invoices for suppliers (clients who are also suppliers)."""
+        from django.db.models import Count, F, Window
+        from django.db.models.functions import RowNumber
         from apps.billing.models import Invoice, InvoiceStatus
-        from apps.clients.models import Client
-        
-        # Get all clients who have purchases (suppliers)
-        suppliers = Client.objects.filter(purchases_as_supplier__isnull=False).distinct()
-        
-        debts_data = []
-        for supplier in suppliers:
-            # Get unpaid invoices for this supplier
-            unpaid_invoices = Invoice.objects.filter(
-                client=supplier,
-                statut=InvoiceStatus.VALIDEE,
-                reste__gt=0
+
+        # Unpaid invoices of clients who have purchases (suppliers)
+        unpaid_invoices = Invoice.objects.filter(
+            client__in=Purchase.objects.filter(fournisseur__isnull=False).values('fournisseur'),
+            statut=InvoiceStatus.VALIDEE,
+            reste__gt=0
+        )
+
+        # One grouped query for the per-supplier totals
+        totals = unpaid_invoices.values(
+            'client_id', 'client__nom', 'client__prenom', 'client__entreprise'
+        ).annotate(
+            total_due=Sum('reste'),
+            invoice_count=Count('id')
+        ).filter(total_due__gt=0).order_by('client__nom', 'client__prenom')
+
+        # One query for the 10 most recent unpaid invoices per supplier
+        recent_invoices = {}
+        recent = unpaid_invoices.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('client_id')],
+                order_by=F('created_at').desc()
             )
-            
-            total_due = unpaid_invoices.aggregate(total=Sum('reste'))['total'] or 0
-            invoice_count = unpaid_invoices.count()
-            
-            if total_due > 0:
-                debts_data.append({
-                    'supplier': {
-                        'id': supplier.id,
-                        'nom_complet': supplier.nom_complet,
-                        'entreprise': supplier.entreprise,
-                    },
-                    'total_due': float(total_due),
-                    'invoice_count': invoice_count,
-                    'invoices': [
-                        {
-                            'id': inv.id,
-                            'numero': inv.numero,
-                            'date': inv.created_at,
-                            'total': float(inv.total_ttc),
-                            'reste': float(inv.reste),
-                        }
-                        for inv in unpaid_invoices[:10]  # Limit to 10 most recent
-                    ]
-                })
-        
+        ).filter(row_number__lte=10).order_by('client_id', '-created_at').values(
+            'client_id', 'id', 'numero', 'created_at', 'total_ttc', 'reste'
+        )
+        for inv in recent:
+            recent_invoices.setdefault(inv['client_id'], []).append({
+                'id': inv['id'],
+                'numero': inv['numero'],
+                'date': inv['created_at'],
+                'total': float(inv['total_ttc']),
+                'reste': float(inv['reste']),
+            })
+
+        debts_data = [
+            {
+                'supplier': {
+                    'id': row['client_id'],
+                    'nom_complet': f"{row['client__nom']} {row['client__prenom']}".strip(),
+                    'entreprise': row['client__entreprise'],
+                },
+                'total_due': float(row['total_due']),
+                'invoice_count': row['invoice_count'],
+                'invoices': recent_invoices.get(row['client_id'], []),
+            }
+            for row in totals
+        ]
+
         return Response(debts_data, status=status.HTTP_200_OK)
 
 
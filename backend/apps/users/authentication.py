@@ -0,0 +1,131 @@
+"""
+JWT authentication with a cached user record.
+
+simplejwt's JWTAuthentication loads the User row on every request. Here a
+compact record of the user (the fields needed by permissions and /users/me/)
+is kept in the Django cache for ``settings.AUTH_USER_CACHE_TIMEOUT`` seconds
+and turned back into a User instance with deferred fields.
+
+The record key carries a per-user version, replaced whenever the user is
+saved or deleted (signals.py). A request that read the old row just before a
+deactivation can only write it under the previous version, which is never
+read again, so deactivations, role and password changes take effect on the
+next request. The user's permission version is read in the same round trip.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Fields kept in the cached record, in model order (as Model.from_db expects);
+# any other field is loaded from the database on access
+CACHED_USER_FIELDS = [
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {
+        'id', 'username', 'email', 'first_name', 'last_name', 'role',
+        'is_active', 'is_staff', 'is_superuser', 'created_at', 'updated_at',
+    }
+]
+
+
+def _version_key(user_id):
+    return f'auth_user_version:{user_id}'
+
+
+def _user_key(user_id, version):
+    return f'auth_user:{user_id}:{version}'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # No version yet (or evicted): start a new one so older records are never reused
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _load_record(user_id):
+    """Build the cache record of a user from the database, or None."""
+    values = User.objects.filter(pk=user_id).values_list(*CACHED_USER_FIELDS, 'password').first()
+    if values is None:
+        return None
+    return {
+        'values': values[:-1],
+        'password_hash': get_md5_hash_password(values[-1]),
+    }
+
+
+def get_cached_user(user_id):
+    """Return the User for an id from the cache (loading it on a miss), or None."""
+    from gsa_backend.metrics import record_cache_access
+    from .utils import get_permissions_version, permissions_version_key
+
+    record = None
+    permissions_version = None
+    try:
+        versions = cache.get_many([_version_key(user_id), permissions_version_key(user_id)])
+        version = versions.get(_version_key(user_id)) or _version(_version_key(user_id))
+        permissions_version = versions.get(permissions_version_key(user_id)) or get_permissions_version(user_id)
+        key = _user_key(user_id, version)
+        record = cache.get(key)
+        record_cache_access('auth_user', hit=record is not None)
+        if record is None:
+            record = _load_record(user_id)
+            if record is not None:
+                cache.set(key, record, settings.AUTH_USER_CACHE_TIMEOUT)
+    except Exception as e:
+        # Cache unavailable: fall back to the database
+        logger.warning(f"User cache unavailable: {e}")
+        if record is None:
+            record = _load_record(user_id)
+    if record is None:
+        return None
+
+    user = User.from_db('default', CACHED_USER_FIELDS, record['values'])
+    user._password_hash = record['password_hash']
+    user._permissions_version = permissions_version
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """Start a new record version for a user; the previous record is never read again."""
+    try:
+        cache.set(_version_key(user_id), uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.error(f"Could not invalidate cached user {user_id}: {e}")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading the user from the cache instead of the database."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user._password_hash:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
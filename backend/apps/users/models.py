@@ -59,13 +59,9 @@ class User(AbstractUser):
         return self.role == Role.LECTURE
     
     def has_custom_permission(self, permission_name):
-        """Check if user has a specific custom permission."""
-        try:
-            custom_perms = self.custom_permissions
-            return custom_perms.has_permission(permission_name)
-        except UserPermission.DoesNotExist:
-            # No custom permissions, use role defaults
-            return self._get_role_default_permission(permission_name)
+        """Check if user has a specific custom permission (cached resolved set)."""
+        from .utils import user_has_permission
+        return user_has_permission(self, permission_name)
     
     def _get_role_default_permission(self, permission_name):
         """Get default permission value based on user role."""
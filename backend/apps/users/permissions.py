@@ -58,8 +58,15 @@ class IsReadOnlyOrAuthenticated(permissions.BasePermission):
 
 
 class HasCustomPermission(permissions.BasePermission):
-    """Check if user has a specific custom permission."""
+    """
+    Check if user has a specific custom permission.
+    Use HasCustomPermission('can_xxx') in get_permissions() or subclass with permission_name.
+    """
     permission_name = None
+
+    def __init__(self, permission_name=None):
+        if permission_name:
+            self.permission_name = permission_name
     
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
@@ -46,6 +46,18 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
+class CurrentUserSerializer(UserSerializer):
+    """Serializer for the connected user, with the resolved permission set."""
+    permissions = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['permissions']
+
+    def get_permissions(self, obj):
+        from .utils import get_user_permissions
+        return get_user_permissions(obj)
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating users (requires password)."""
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
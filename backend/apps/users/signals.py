@@ -1,10 +1,16 @@
 """
-Signals for users app - auto-create super admin.
+Signals for users app - auto-create super admin, invalidate cached users and permissions.
 """
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from .models import User, Role
+from .models import User, Role, UserPermission
+from .authentication import invalidate_cached_user
+from .utils import invalidate_user_permissions
+
+# User fields that never change the resolved permissions
+PERMISSION_NEUTRAL_FIELDS = {'last_login', 'password'}
 
 
 @receiver(post_migrate)
@@ -25,3 +31,30 @@ def create_super_admin(sender, **kwargs):
             )
             print(f"Super admin créé : {email}")
 
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    """Invalidate the cached user record and, if needed, its permissions."""
+    if created:
+        return
+    user_id = instance.pk
+    if update_fields and set(update_fields) <= PERMISSION_NEUTRAL_FIELDS:
+        # Password change or login: only the authentication record is affected
+        transaction.on_commit(lambda: invalidate_cached_user(user_id))
+    else:
+        transaction.on_commit(lambda: invalidate_user_permissions(user_id))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Drop the cached record of a deleted user."""
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def user_permission_changed(sender, instance, **kwargs):
+    """Invalidate cached permissions when custom permissions change."""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_permissions(user_id))
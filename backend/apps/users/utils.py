@@ -1,7 +1,104 @@
 """
 Utility functions for user permissions.
+
+The permissions of a user (custom overrides resolved against the role
+defaults) are computed once and cached under a per-user version key. The
+version is replaced whenever the user's UserPermission row or role changes
+(see signals.py), so stale entries are never read again and simply expire.
+A failed invalidation is logged as an error; the entry then lives at most
+``settings.PERMISSIONS_CACHE_TIMEOUT`` seconds (5 minutes by default).
+Within a request the resolved set is also kept on the user instance.
 """
-from .models import User, UserPermission
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Role, UserPermission
+
+logger = logging.getLogger(__name__)
+
+# Every custom permission flag (can_create_invoices, can_manage_stock, ...)
+PERMISSION_NAMES = [
+    field.name for field in UserPermission._meta.get_fields() if field.name.startswith('can_')
+]
+
+
+def permissions_version_key(user_id):
+    return f'user_perms_version:{user_id}'
+
+
+def _permissions_key(user_id, version):
+    return f'user_perms:{user_id}:{version}'
+
+
+def resolve_user_permissions(user):
+    """Compute the permission set of a user from the database (one query at most)."""
+    if user.role == Role.SUPER_ADMIN:
+        return {name: True for name in PERMISSION_NAMES}
+    try:
+        custom_perms = UserPermission.objects.get(user=user)
+    except UserPermission.DoesNotExist:
+        return {name: user._get_role_default_permission(name) for name in PERMISSION_NAMES}
+    custom_perms.user = user
+    return {name: bool(custom_perms.has_permission(name)) for name in PERMISSION_NAMES}
+
+
+def get_permissions_version(user_id):
+    """Return the current permission cache version of a user."""
+    version = cache.get(permissions_version_key(user_id))
+    if version is None:
+        # No version yet (or evicted): start a new one so older entries are never reused
+        cache.add(permissions_version_key(user_id), uuid.uuid4().hex, timeout=None)
+        version = cache.get(permissions_version_key(user_id))
+    return version
+
+
+def get_user_permissions(user):
+    """
+    Return the resolved permission dict of a user.
+    Memoized on the user instance (one lookup per request), then cached.
+    """
+    if not user or not user.is_authenticated:
+        return {name: False for name in PERMISSION_NAMES}
+    cached = getattr(user, '_resolved_permissions', None)
+    if cached is not None:
+        return cached
+
+    from gsa_backend.metrics import record_cache_access
+
+    permissions = None
+    try:
+        # The cached authentication record already carries the version
+        version = getattr(user, '_permissions_version', None) or get_permissions_version(user.pk)
+        key = _permissions_key(user.pk, version)
+        permissions = cache.get(key)
+        record_cache_access('user_permissions', hit=permissions is not None)
+        if permissions is None:
+            permissions = resolve_user_permissions(user)
+            cache.set(key, permissions, settings.PERMISSIONS_CACHE_TIMEOUT)
+    except Exception as e:
+        # Cache unavailable: fall back to the database
+        logger.warning(f"Permission cache unavailable: {e}")
+        if permissions is None:
+            permissions = resolve_user_permissions(user)
+
+    user._resolved_permissions = permissions
+    return permissions
+
+
+def invalidate_user_permissions(user_id):
+    """Start a new permission version for a user; the previous cache entry is orphaned."""
+    from .authentication import invalidate_cached_user
+
+    try:
+        cache.set(permissions_version_key(user_id), uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        # Revoked permissions stay cached until PERMISSIONS_CACHE_TIMEOUT: make it visible
+        logger.error(f"Could not invalidate cached permissions of user {user_id}: {e}")
+    # The cached authentication record holds the role
+    invalidate_cached_user(user_id)
 
 
 def user_has_permission(user, permission_name):
@@ -11,16 +108,9 @@ def user_has_permission(user, permission_name):
     """
     if not user or not user.is_authenticated:
         return False
-    
+
     # Super admin always has all permissions
     if user.role == 'SUPER_ADMIN':
         return True
-    
-    # Check custom permissions
-    try:
-        custom_perms = user.custom_permissions
-        return custom_perms.has_permission(permission_name)
-    except UserPermission.DoesNotExist:
-        # No custom permissions, use role defaults
-        return user._get_role_default_permission(permission_name)
 
+    return get_user_permissions(user).get(permission_name, False)
@@ -8,7 +8,7 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from .models import User, UserPermission
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserListSerializer,
-    UserDetailSerializer, UserPermissionSerializer
+    UserDetailSerializer, UserPermissionSerializer, CurrentUserSerializer
 )
 from .permissions import IsSuperAdmin, IsAdminGSA
 
@@ -36,6 +36,8 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserListSerializer
         elif self.action == 'retrieve':
             return UserDetailSerializer
+        elif self.action == 'me':
+            return CurrentUserSerializer
         return UserSerializer
 
     def get_permissions(self):
@@ -12,6 +12,12 @@ done
 
 echo "PostgreSQL is up - executing commands"
 
+# Reset Prometheus multiprocess samples from a previous run
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 # Run migrations
 echo "Running database migrations..."
 python manage.py migrate --noinput
@@ -16,6 +16,10 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Export task durations and outcomes to Prometheus.
+from gsa_backend.metrics import connect_celery_signals  # noqa: E402
+connect_celery_signals()
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
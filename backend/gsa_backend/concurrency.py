@@ -0,0 +1,64 @@
+"""
+Document generation slots for GSA Manager.
+
+PDF and report rendering is CPU-bound and slow (WeasyPrint), while the rest
+of the API is short, database-bound requests. Each process allows at most
+``settings.DOCUMENT_RENDER_CONCURRENCY`` renders at a time; the remaining
+gthread threads stay free for API requests. A document request that cannot
+get a slot within ``settings.DOCUMENT_RENDER_WAIT`` seconds is answered with
+503 and a Retry-After header instead of queueing; the frontend API client
+retries such responses after the Retry-After delay.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from gsa_backend.metrics import record_document_slot_rejection
+
+_slots = threading.BoundedSemaphore(max(1, settings.DOCUMENT_RENDER_CONCURRENCY))
+
+
+class DocumentSlotBusy(Exception):
+    """Raised when no document generation slot is free."""
+
+
+@contextmanager
+def document_slot(wait=None):
+    """Hold a document generation slot; raise DocumentSlotBusy after `wait` seconds."""
+    wait = settings.DOCUMENT_RENDER_WAIT if wait is None else wait
+    acquired = _slots.acquire(timeout=wait) if wait > 0 else _slots.acquire(blocking=False)
+    if not acquired:
+        raise DocumentSlotBusy()
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+def slot_busy_response(document):
+    """503 response (with Retry-After) for a document request that got no slot."""
+    record_document_slot_rejection(document)
+    response = Response(
+        {'error': 'Génération de documents en cours, veuillez réessayer dans quelques secondes.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(settings.DOCUMENT_RENDER_RETRY_AFTER)
+    return response
+
+
+def document_endpoint(document):
+    """Run a viewset action inside a document slot, answering 503 when saturated."""
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            try:
+                with document_slot():
+                    return view_func(self, request, *args, **kwargs)
+            except DocumentSlotBusy:
+                return slot_busy_response(document)
+        return wrapper
+    return decorator
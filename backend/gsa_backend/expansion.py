@@ -0,0 +1,108 @@
+"""
+Sparse fieldsets and expansions for GSA Manager list endpoints.
+
+List serializers return IDs and display strings only. Nested objects are
+opt-in: a serializer lists them in ``Meta.expandable_fields`` and a client
+asks for them with ``?expand=product_detail,created_by_detail``. ``?fields=``
+restricts the response to the named top-level fields. The viewset mixin adds
+the select_related / prefetch_related needed by the requested expansions, so
+an expanded list still costs a constant number of queries.
+"""
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+class Expandable:
+    """
+    A nested field added on request.
+    `related` lists the relations to load with it (default: `source`).
+    """
+
+    def __init__(self, serializer_class, source, related=None):
+        self.serializer_class = serializer_class
+        self.source = source
+        self.related = tuple(related) if related is not None else (source,)
+
+    def build(self):
+        return self.serializer_class(source=self.source, read_only=True)
+
+
+def _param_names(request, name):
+    """Return the set of comma-separated names of a query parameter, or None."""
+    if request is None or not hasattr(request, 'query_params'):
+        return None
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def get_expandable_fields(serializer_class):
+    meta = getattr(serializer_class, 'Meta', None)
+    return getattr(meta, 'expandable_fields', {})
+
+
+def requested_expansions(request, serializer_class):
+    """Names of the expandable fields of `serializer_class` requested with ?expand=."""
+    expandable = get_expandable_fields(serializer_class)
+    requested = _param_names(request, EXPAND_PARAM) or set()
+    return [name for name in expandable if name in requested]
+
+
+def _crosses_many_relation(model, path):
+    """True if the relation path goes through a many-valued relation (needs prefetch_related)."""
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.many_to_many or field.one_to_many:
+            return True
+        model = field.related_model
+    return False
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for ?fields= and ?expand=.
+    Only the top-level serializer of a read request is affected.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD') or not self._is_top_level():
+            return fields
+
+        expandable = get_expandable_fields(type(self))
+        expanded = requested_expansions(request, type(self))
+        for name in expanded:
+            fields[name] = expandable[name].build()
+
+        only = _param_names(request, FIELDS_PARAM)
+        if only:
+            for name in list(fields):
+                if name not in only and name not in expanded:
+                    fields.pop(name)
+        return fields
+
+    def _is_top_level(self):
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+
+class ExpandableQuerysetMixin:
+    """Viewset mixin loading the relations of the expansions requested with ?expand=."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        expandable = get_expandable_fields(serializer_class)
+        for name in requested_expansions(self.request, serializer_class):
+            for path in expandable[name].related:
+                if _crosses_many_relation(queryset.model, path):
+                    queryset = queryset.prefetch_related(path)
+                else:
+                    queryset = queryset.select_related(path)
+        return queryset
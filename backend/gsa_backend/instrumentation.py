@@ -0,0 +1,189 @@
+"""
+Request instrumentation for GSA Manager.
+
+Records, for every request, the SQL query count, the time spent in the
+database, in DRF serializers and in response rendering. The figures are
+exposed as a ``Server-Timing`` header and as structured log fields, and
+checked against the per-view query budgets of ``settings.QUERY_BUDGETS``.
+"""
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics as prometheus_metrics
+
+logger = logging.getLogger('gsa_backend.instrumentation')
+
+_current_metrics = ContextVar('gsa_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a view issues more queries than its budget."""
+
+
+class RequestMetrics:
+    """Counters collected while a single request is processed."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+        self.serializer_depth = 0
+        self.connections_opened = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their duration."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def _count_new_connection(sender, connection=None, **kwargs):
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.connections_opened += 1
+
+
+def get_current_metrics():
+    """Return the metrics of the request being processed, if any."""
+    return _current_metrics.get()
+
+
+def _timed_data(prop):
+    """Wrap a serializer ``data`` property so its evaluation time is recorded."""
+    def data(self):
+        metrics = _current_metrics.get()
+        if metrics is None or metrics.serializer_depth:
+            return prop.fget(self)
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            metrics.serializer_depth -= 1
+    data._gsa_timed = True
+    return property(data)
+
+
+def install_serializer_timer():
+    """Time ``Serializer.data`` / ``ListSerializer.data`` (idempotent)."""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, '_gsa_timed', False):
+            cls.data = _timed_data(prop)
+
+
+def get_query_budget(view_name):
+    """Return the query budget configured for a view name, or None."""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if view_name in budgets:
+        return budgets[view_name]
+    return getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+
+
+class RequestInstrumentationMiddleware:
+    """Measure queries, DB time, serializer time and render time per request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timer()
+        connection_created.connect(
+            _count_new_connection, weak=False, dispatch_uid='gsa_instrumentation_connection_created'
+        )
+        prometheus_metrics.connect_database_signals()
+
+    def __call__(self, request):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', True):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total_time = time.perf_counter() - start
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            response['Server-Timing'] = self.server_timing(metrics, total_time)
+        self.log(request, response, view_name, metrics, total_time)
+        prometheus_metrics.observe_request(
+            view_name, request.method, response.status_code, total_time, metrics.queries, metrics.db_time
+        )
+        self.check_budget(request, view_name, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        """Start the render timer; the post-render callback stops it."""
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+
+            def stop_render_timer(rendered):
+                metrics.render_time += time.perf_counter() - metrics.render_started
+
+            response.add_post_render_callback(stop_render_timer)
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total_time):
+        """Build the Server-Timing header value (durations in milliseconds)."""
+        return ', '.join([
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries, '
+            f'{metrics.connections_opened} new connections"',
+            f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+            f'render;dur={metrics.render_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ])
+
+    @staticmethod
+    def log(request, response, view_name, metrics, total_time):
+        """Emit one structured log record for the request."""
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'new_connections': metrics.connections_opened,
+            'serializer_ms': round(metrics.serializer_time * 1000, 1),
+            'render_ms': round(metrics.render_time * 1000, 1),
+            'total_ms': round(total_time * 1000, 1),
+        }
+        logger.info(
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra=fields
+        )
+
+    @staticmethod
+    def check_budget(request, view_name, metrics):
+        """Warn (or raise in strict mode) when the view exceeds its query budget."""
+        budget = get_query_budget(view_name)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = (
+            f'Query budget exceeded for {view_name or request.path}: '
+            f'{metrics.queries} queries (budget {budget})'
+        )
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={'view': view_name, 'queries': metrics.queries, 'budget': budget})
@@ -0,0 +1,289 @@
+"""
+Prometheus metrics for GSA Manager.
+
+Metrics are recorded by the request instrumentation middleware, the PDF
+generators, the Celery signal handlers below and the cache helpers, and
+exposed on ``/metrics``. When ``PROMETHEUS_MULTIPROC_DIR`` is set (gunicorn
+and Celery workers), every process writes its samples to that directory and
+the endpoint aggregates the directories listed in
+``settings.PROMETHEUS_MULTIPROC_DIRS``.
+"""
+import functools
+import glob
+import hmac
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+# prometheus_client is optional: without it every helper is a no-op
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client.multiprocess import MultiProcessCollector
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+PDF_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+TASK_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900)
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_LATENCY = Histogram(
+        'gsa_http_request_duration_seconds', 'Request latency per view (DRF action).',
+        ['view', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    REQUEST_QUERIES = Histogram(
+        'gsa_http_request_db_queries', 'SQL queries issued per request.',
+        ['view'], buckets=QUERY_BUCKETS
+    )
+    REQUEST_DB_TIME = Histogram(
+        'gsa_http_request_db_duration_seconds', 'Time spent in the database per request.',
+        ['view'], buckets=LATENCY_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        'gsa_cache_requests_total', 'Cache lookups by cache name and result (hit/miss).',
+        ['cache', 'result']
+    )
+    PDF_RENDER_DURATION = Histogram(
+        'gsa_pdf_render_duration_seconds', 'PDF generation time per document type.',
+        ['document'], buckets=PDF_BUCKETS
+    )
+    PDF_RENDER_FAILURES = Counter(
+        'gsa_pdf_render_failures_total', 'Failed PDF generations per document type.',
+        ['document']
+    )
+    DOCUMENT_SLOT_REJECTIONS = Counter(
+        'gsa_document_slot_rejections_total', 'Document requests refused (503) because all render slots were busy.',
+        ['document']
+    )
+    DB_CONNECTIONS_OPENED = Counter(
+        'gsa_db_connections_opened_total', 'Database connections opened (persistent connections are reused).',
+        ['alias']
+    )
+    TASK_DURATION = Histogram(
+        'gsa_celery_task_duration_seconds', 'Celery task run time by task and final state.',
+        ['task', 'state'], buckets=TASK_BUCKETS
+    )
+    TASK_LAST_SUCCESS = Gauge(
+        'gsa_celery_task_last_success_timestamp_seconds', 'Unix time of the last successful run of a task.',
+        ['task'], multiprocess_mode='max'
+    )
+
+
+def observe_request(view, method, status, duration, queries, db_time):
+    """Record the latency and database figures of one request."""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    view = view or 'unresolved'
+    REQUEST_LATENCY.labels(view, method, str(status)).observe(duration)
+    REQUEST_QUERIES.labels(view).observe(queries)
+    REQUEST_DB_TIME.labels(view).observe(db_time)
+
+
+def record_cache_access(cache_name, hit):
+    """Count a cache lookup; the hit ratio is hits / (hits + misses)."""
+    if PROMETHEUS_AVAILABLE:
+        CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def track_pdf_render(document):
+    """Decorator timing a PDF generator and counting its failures."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROMETHEUS_AVAILABLE:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                PDF_RENDER_FAILURES.labels(document).inc()
+                raise
+            finally:
+                PDF_RENDER_DURATION.labels(document).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_document_slot_rejection(document):
+    """Count a document request turned away for lack of a render slot."""
+    if PROMETHEUS_AVAILABLE:
+        DOCUMENT_SLOT_REJECTIONS.labels(document).inc()
+
+
+def _connection_created(sender, connection=None, **kwargs):
+    if PROMETHEUS_AVAILABLE and connection is not None:
+        DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+
+
+def connect_database_signals():
+    """Count new database connections (idempotent)."""
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_connection_created, weak=False, dispatch_uid='gsa_metrics_connection_created')
+
+
+# Celery ---------------------------------------------------------------------
+
+_task_started = {}
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    start = _task_started.pop(task_id, None)
+    if start is None or not PROMETHEUS_AVAILABLE:
+        return
+    TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - start)
+    if state == 'SUCCESS':
+        TASK_LAST_SUCCESS.labels(task.name).set(time.time())
+
+
+def _worker_process_shutdown(pid=None, **kwargs):
+    if PROMETHEUS_AVAILABLE and os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def connect_celery_signals():
+    """Record task durations and outcomes from the Celery worker signals."""
+    from celery import signals
+
+    signals.task_prerun.connect(_task_prerun, weak=False)
+    signals.task_postrun.connect(_task_postrun, weak=False)
+    signals.worker_process_shutdown.connect(_worker_process_shutdown, weak=False)
+    connect_database_signals()
+
+
+class CeleryQueueCollector:
+    """Read the Redis broker queue lengths at scrape time."""
+
+    def collect(self):
+        metric = GaugeMetricFamily(
+            'gsa_celery_queue_length', 'Messages waiting in a Celery queue.', labels=['queue']
+        )
+        broker_url = getattr(settings, 'CELERY_BROKER_URL', '')
+        if broker_url.startswith(('redis://', 'rediss://')):
+            try:
+                import redis
+                client = redis.Redis.from_url(broker_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                for queue in getattr(settings, 'CELERY_METRICS_QUEUES', ['celery']):
+                    metric.add_metric([queue], client.llen(queue))
+            except Exception as e:
+                logger.warning(f"Could not read Celery queue length: {e}")
+        yield metric
+
+
+class PgBouncerCollector:
+    """Read the pgbouncer pool state (SHOW POOLS) at scrape time."""
+
+    COLUMNS = {
+        'cl_active': 'Client connections linked to a server connection.',
+        'cl_waiting': 'Client connections waiting for a server connection.',
+        'sv_active': 'Server connections in use by a client.',
+        'sv_idle': 'Server connections idle and ready for reuse.',
+        'sv_used': 'Server connections idle but not yet checked.',
+    }
+
+    def collect(self):
+        gauges = {
+            column: GaugeMetricFamily(f'gsa_pgbouncer_{column}', help_text, labels=['database'])
+            for column, help_text in self.COLUMNS.items()
+        }
+        maxwait = GaugeMetricFamily(
+            'gsa_pgbouncer_maxwait_seconds', 'Age of the oldest waiting client.', labels=['database']
+        )
+        try:
+            import psycopg2
+            conn = psycopg2.connect(
+                host=settings.PGBOUNCER_STATS_HOST, port=settings.PGBOUNCER_STATS_PORT,
+                user=settings.PGBOUNCER_STATS_USER, password=settings.PGBOUNCER_STATS_PASSWORD,
+                dbname='pgbouncer', connect_timeout=2,
+            )
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute('SHOW POOLS')
+                    names = [col[0] for col in cursor.description]
+                    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+            finally:
+                conn.close()
+            for row in rows:
+                if row['database'] == 'pgbouncer':
+                    continue
+                for column, gauge in gauges.items():
+                    gauge.add_metric([row['database']], row.get(column) or 0)
+                maxwait.add_metric(
+                    [row['database']], (row.get('maxwait') or 0) + (row.get('maxwait_us') or 0) / 1e6
+                )
+        except Exception as e:
+            logger.warning(f"Could not read pgbouncer pools: {e}")
+        yield from gauges.values()
+        yield maxwait
+
+
+# Exposition -----------------------------------------------------------------
+
+class MultiProcessDirsCollector:
+    """Aggregate the sample files of several multiprocess directories."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def collect(self):
+        files = []
+        for path in self.paths:
+            files.extend(glob.glob(os.path.join(path, '*.db')))
+        return MultiProcessCollector.merge(files, accumulate=True)
+
+
+class _RegistryProxy:
+    """Expose the default in-process registry inside another registry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        return self.registry.collect()
+
+
+def build_registry():
+    """Return the registry to expose for this process configuration."""
+    registry = CollectorRegistry()
+    paths = getattr(settings, 'PROMETHEUS_MULTIPROC_DIRS', [])
+    if paths:
+        registry.register(MultiProcessDirsCollector(paths))
+    else:
+        registry.register(_RegistryProxy(REGISTRY))
+    registry.register(CeleryQueueCollector())
+    if getattr(settings, 'PGBOUNCER_STATS_HOST', ''):
+        registry.register(PgBouncerCollector())
+    return registry
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition endpoint. Requires the METRICS_AUTH_TOKEN bearer
+    token; without a configured token it only answers in DEBUG.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return HttpResponse('prometheus_client is not installed\n', status=503, content_type='text/plain')
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(build_registry()), content_type=CONTENT_TYPE_LATEST)
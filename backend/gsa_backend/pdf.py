@@ -0,0 +1,75 @@
+"""
+PDF rendering for GSA Manager.
+
+WeasyPrint pulls in Pango, Cairo/HarfBuzz and fontTools, which makes it the
+most expensive import of the project. It is only imported by the first
+render in a process, so gunicorn/Celery workers and management commands
+that never produce a PDF do not pay for it. ``probe()`` reports whether
+rendering can work without importing WeasyPrint (exposed by /api/health/).
+"""
+import ctypes.util
+import functools
+import importlib.util
+import threading
+
+_lock = threading.Lock()
+_weasyprint = None
+_import_error = None
+
+# Native libraries WeasyPrint loads through cffi
+NATIVE_LIBRARIES = ['gobject-2.0', 'pango-1.0', 'pangoft2-1.0', 'harfbuzz', 'fontconfig']
+
+
+class PDFUnavailable(Exception):
+    """Raised when WeasyPrint or its system libraries are missing."""
+
+
+def _load():
+    """Import WeasyPrint once per process; return the module or None."""
+    global _weasyprint, _import_error
+    if _weasyprint is not None or _import_error is not None:
+        return _weasyprint
+    with _lock:
+        if _weasyprint is None and _import_error is None:
+            try:
+                import weasyprint
+                import weasyprint.text.fonts  # noqa: F401
+                _weasyprint = weasyprint
+            except (ImportError, OSError) as e:
+                _import_error = str(e)
+    return _weasyprint
+
+
+def is_pdf_available():
+    """Return True if PDFs can be rendered (imports WeasyPrint on first call)."""
+    return _load() is not None
+
+
+def unavailable_reason():
+    """Return the WeasyPrint import error, if any (imports WeasyPrint on first call)."""
+    _load()
+    return _import_error
+
+
+@functools.lru_cache(maxsize=1)
+def probe():
+    """Check the PDF dependencies without importing WeasyPrint."""
+    libraries = {name: ctypes.util.find_library(name) for name in NATIVE_LIBRARIES}
+    installed = importlib.util.find_spec('weasyprint') is not None
+    return {
+        'available': installed and all(libraries.values()),
+        'weasyprint_installed': installed,
+        'libraries': libraries,
+    }
+
+
+def render_pdf(html_content, target):
+    """Render an HTML string to a PDF file at `target`."""
+    weasyprint = _load()
+    if weasyprint is None:
+        raise PDFUnavailable(
+            f"PDF generation is not available. WeasyPrint dependencies are missing. "
+            f"Error: {_import_error or 'Unknown error'}"
+        )
+    font_config = weasyprint.text.fonts.FontConfiguration()
+    weasyprint.HTML(string=html_content).write_pdf(target=target, font_config=font_config)
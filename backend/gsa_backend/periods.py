@@ -0,0 +1,75 @@
+"""
+Date ranges for GSA Manager queries and reports.
+
+A ``field__date`` lookup casts the timestamp of every row to a local date, so
+the database cannot use an index on the column. These helpers turn dates into
+half-open ranges of aware datetimes in the configured timezone
+(``start <= field < end``), which an index range scan can answer. They also
+parse the report period parameters (YYYY, YYYY-MM or YYYY-MM-DD).
+"""
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+PERIOD_FORMATS = 'YYYY-MM-DD, YYYY-MM, or YYYY'
+
+
+def start_of_day(day):
+    """Aware datetime of midnight at the start of `day` (current timezone)."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_range_q(field, start=None, end=None):
+    """Q matching `field` between the dates `start` and `end` (both inclusive, either optional)."""
+    q = Q()
+    if start is not None:
+        q &= Q(**{f'{field}__gte': start_of_day(start)})
+    if end is not None:
+        q &= Q(**{f'{field}__lt': start_of_day(end + timedelta(days=1))})
+    return q
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD string. Raises ValueError."""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_period(value):
+    """
+    Parse a period (YYYY, YYYY-MM or YYYY-MM-DD) into its first and last day.
+    Raises ValueError.
+    """
+    if len(value) == 4:  # YYYY
+        year = datetime.strptime(value, '%Y').year
+        return date(year, 1, 1), date(year, 12, 31)
+    if len(value) == 7:  # YYYY-MM
+        first = datetime.strptime(value, '%Y-%m').date()
+        return first, first.replace(day=monthrange(first.year, first.month)[1])
+    if len(value) == 10:  # YYYY-MM-DD
+        day = parse_date(value)
+        return day, day
+    raise ValueError("Invalid date format")
+
+
+def report_date_param(request, name='date'):
+    """
+    Read the period parameter of a report: returns (last day of the period, None),
+    or (None, error Response) if it is missing or invalid.
+    """
+    value = request.query_params.get(name, None)
+    if not value:
+        return None, Response(
+            {'error': f'Date parameter is required (format: {PERIOD_FORMATS})'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        return parse_period(value)[1], None
+    except ValueError as e:
+        return None, Response(
+            {'error': f'Invalid date format: {str(e)}. Use {PERIOD_FORMATS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
@@ -0,0 +1,51 @@
+"""
+File delivery for GSA Manager.
+
+Generated documents (invoice PDFs, reports, export archives) are private:
+Django checks the permissions, then either streams the file itself or, with
+``settings.SENDFILE_MODE = 'x-accel'``, answers with an empty response and an
+``X-Accel-Redirect`` header naming the file. The reverse proxy (Caddy, see
+docker/prod/Caddyfile) then serves the bytes from the media volume, so slow
+downloads do not hold an application worker.
+"""
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
+
+ACCEL_HEADER = 'X-Accel-Redirect'
+
+
+def _media_relative_path(path):
+    """Return `path` relative to MEDIA_ROOT, or None if it is outside of it."""
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    real_path = os.path.realpath(path)
+    if os.path.commonpath([media_root, real_path]) != media_root:
+        return None
+    return os.path.relpath(real_path, media_root).replace(os.sep, '/')
+
+
+def file_response(path, content_type, filename=None, as_attachment=True):
+    """
+    Return a response delivering the file at `path`.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    relative_path = _media_relative_path(path) if settings.SENDFILE_MODE == 'x-accel' else None
+    if relative_path is None:
+        return FileResponse(
+            open(path, 'rb'),
+            content_type=content_type,
+            as_attachment=as_attachment,
+            filename=filename or os.path.basename(path)
+        )
+
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    response = HttpResponse(content_type=content_type)
+    response[ACCEL_HEADER] = settings.SENDFILE_URL_PREFIX + quote(relative_path)
+    response['Content-Disposition'] = content_disposition_header(
+        as_attachment, filename or os.path.basename(path)
+    )
+    return response
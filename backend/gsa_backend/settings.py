@@ -2,6 +2,7 @@
 Django settings for gsa_backend project.
 """
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -51,9 +52,11 @@ INSTALLED_APPS = [
     'apps.billing',
     'apps.audit',
     'apps.dashboard',
+    'apps.benchmarks',
 ]
 
 MIDDLEWARE = [
+    'gsa_backend.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -93,6 +96,12 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'gsa_password'),
         'HOST': os.getenv('POSTGRES_HOST', 'postgres'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Persistent connections: seconds a connection is reused across requests/tasks (0 = one per request)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Check a persistent connection is still alive before reusing it
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+        # Required behind pgbouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False').lower() == 'true',
     }
 }
 
@@ -126,6 +135,11 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Delivery of generated files: '' streams them from Django, 'x-accel' hands them
+# to the reverse proxy with an X-Accel-Redirect header (see gsa_backend.sendfile)
+SENDFILE_MODE = os.getenv('SENDFILE_MODE', '')
+SENDFILE_URL_PREFIX = os.getenv('SENDFILE_URL_PREFIX', '/')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -135,7 +149,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -173,6 +187,30 @@ else:
     CORS_ALLOWED_ORIGINS = [origin.strip() for origin in CORS_ALLOWED_ORIGINS if origin.strip()]
 
 CORS_ALLOW_CREDENTIALS = True
+# Let the frontend read Retry-After (document slots busy) on cross-origin deployments
+CORS_EXPOSE_HEADERS = ['Retry-After']
+
+# Cache (Redis; CACHE_URL=locmem:// for a per-process in-memory cache without Redis)
+CACHE_URL = os.getenv('CACHE_URL', os.getenv('REDIS_URL', 'redis://redis:6379/0'))
+if CACHE_URL.startswith('locmem://'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'gsa',
+            'TIMEOUT': 3600,
+            'OPTIONS': {'socket_connect_timeout': 1, 'socket_timeout': 1},
+        }
+    }
+# Lifetime of a cached resolved permission set (invalidated on change through a version key;
+# also the longest a revoked permission can survive a failed invalidation)
+PERMISSIONS_CACHE_TIMEOUT = int(os.getenv('PERMISSIONS_CACHE_TIMEOUT', 300))
+# Lifetime of the cached user record used by JWT authentication (invalidated on user save)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 300))
+# Lifetime of a cached client price list (invalidated on ClientPrice / BasePrice change)
+PRICE_LIST_CACHE_TIMEOUT = int(os.getenv('PRICE_LIST_CACHE_TIMEOUT', 3600))
 
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
@@ -190,7 +228,80 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.billing.tasks.send_invoice_reminders',
         'schedule': crontab(hour=9, minute=0),  # Daily at 9 AM
     },
+    'purge-invoice-exports': {
+        'task': 'apps.billing.tasks.purge_invoice_exports',
+        'schedule': crontab(hour=3, minute=30),  # Daily at 3:30 AM
+    },
+    'fail-stale-invoice-exports': {
+        'task': 'apps.billing.tasks.fail_stale_invoice_exports',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    },
+}
+
+# Automatic invoice reminders: first reminder N days after validation, then the
+# escalation intervals (days, the last one repeats) up to INVOICE_REMINDER_MAX reminders
+INVOICE_REMINDER_FIRST_DELAY = int(os.getenv('INVOICE_REMINDER_FIRST_DELAY', 30))
+INVOICE_REMINDER_INTERVALS = [int(days) for days in os.getenv('INVOICE_REMINDER_INTERVALS', '7,14,30').split(',')]
+INVOICE_REMINDER_MAX = int(os.getenv('INVOICE_REMINDER_MAX', 5))
+INVOICE_REMINDER_BATCH_SIZE = int(os.getenv('INVOICE_REMINDER_BATCH_SIZE', 200))
+INVOICE_REMINDER_TRANSPORT = os.getenv('INVOICE_REMINDER_TRANSPORT', 'apps.billing.reminders.LogTransport')
+
+# Batch invoice PDF exports: invoices rendered per Celery task, days the archives are kept,
+# minutes after which an unfinished export is marked as failed
+INVOICE_EXPORT_CHUNK_SIZE = int(os.getenv('INVOICE_EXPORT_CHUNK_SIZE', 25))
+INVOICE_EXPORT_RETENTION_DAYS = int(os.getenv('INVOICE_EXPORT_RETENTION_DAYS', 7))
+INVOICE_EXPORT_TIMEOUT_MINUTES = int(os.getenv('INVOICE_EXPORT_TIMEOUT_MINUTES', 120))
+
+# Bulk manifest / reception import (CSV or XLSX): maximum data rows per file
+CONTAINER_IMPORT_MAX_ROWS = int(os.getenv('CONTAINER_IMPORT_MAX_ROWS', 5000))
+# Bulk client price import (CSV or XLSX): maximum data rows per file
+CLIENT_PRICE_IMPORT_MAX_ROWS = int(os.getenv('CLIENT_PRICE_IMPORT_MAX_ROWS', 20000))
+
+# Request instrumentation (query count, DB / serializer / render time)
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', 'True').lower() == 'true'
+# Server-Timing exposes per-request DB / render timings to any client: off unless DEBUG
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', str(DEBUG)).lower() == 'true'
+# Maximum number of SQL queries per view (keyed by URL name); None = no default budget
+QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT')) if os.getenv('QUERY_BUDGET_DEFAULT') else None
+QUERY_BUDGETS = {
+    'client-list': 4,
+    'client-detail': 5,
+    'client-total-due': 4,
+    'client-total-owed-to-client': 4,
+    'purchase-list': 4,
+    'purchase-supplier-debts': 4,
+    'invoice-list': 4,
 }
+# Raise instead of logging a warning when a budget is exceeded (always on under `manage.py test` and pytest)
+QUERY_BUDGET_STRICT = (
+    os.getenv('QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+    or sys.argv[1:2] == ['test']
+    or 'pytest' in sys.modules
+)
+
+# Prometheus metrics (/metrics)
+# Multiprocess directories to aggregate (gunicorn workers, Celery workers), comma-separated.
+# Defaults to PROMETHEUS_MULTIPROC_DIR; empty = single-process in-memory registry.
+PROMETHEUS_MULTIPROC_DIRS = [
+    path.strip()
+    for path in os.getenv('PROMETHEUS_MULTIPROC_DIRS', os.getenv('PROMETHEUS_MULTIPROC_DIR', '')).split(',')
+    if path.strip()
+]
+# Bearer token required to scrape /metrics (empty = endpoint only available in DEBUG)
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+# Celery queues whose length is exported
+CELERY_METRICS_QUEUES = ['celery']
+# pgbouncer admin console exported as pool metrics (empty host = disabled); the user must be in stats_users
+PGBOUNCER_STATS_HOST = os.getenv('PGBOUNCER_STATS_HOST', '')
+PGBOUNCER_STATS_PORT = os.getenv('PGBOUNCER_STATS_PORT', '6432')
+PGBOUNCER_STATS_USER = os.getenv('PGBOUNCER_STATS_USER', os.getenv('POSTGRES_USER', 'gsa_user'))
+PGBOUNCER_STATS_PASSWORD = os.getenv('PGBOUNCER_STATS_PASSWORD', os.getenv('POSTGRES_PASSWORD', 'gsa_password'))
+
+# Document generation (PDF/reports): concurrent renders per process, seconds a
+# request waits for a free slot before getting 503, and the Retry-After sent back
+DOCUMENT_RENDER_CONCURRENCY = int(os.getenv('DOCUMENT_RENDER_CONCURRENCY', 2))
+DOCUMENT_RENDER_WAIT = float(os.getenv('DOCUMENT_RENDER_WAIT', 2))
+DOCUMENT_RENDER_RETRY_AFTER = int(os.getenv('DOCUMENT_RENDER_RETRY_AFTER', 5))
 
 # Super Admin creation
 SUPER_ADMIN_EMAIL = os.getenv('SUPER_ADMIN_EMAIL', 'admin@gsa.fr')
@@ -244,5 +355,10 @@ if not DEBUG:
                 'level': 'INFO',
                 'propagate': False,
             },
+            'gsa_backend': {
+                'handlers': ['console'],
+                'level': 'INFO',
+                'propagate': False,
+            },
         },
     }
@@ -0,0 +1,109 @@
+"""
+CSV / XLSX uploads for GSA Manager bulk imports.
+
+Files are read row by row: a csv reader over the upload stream (UTF-8 with
+or without BOM, ``;`` or ``,`` separator), or openpyxl in read-only mode for
+XLSX files (optional dependency, imported on first use). Header titles are
+matched against accepted aliases after normalization, so "Quantité",
+"quantite" and "QTE" name the same column.
+"""
+import codecs
+import csv
+import math
+import re
+import unicodedata
+
+XLSX_CONTENT_TYPES = ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',)
+# Largest value of an integer column (PositiveIntegerField, ids)
+MAX_INTEGER = 2147483647
+
+
+class ImportFileError(Exception):
+    """Raised when the uploaded file cannot be read (format, header, size)."""
+
+
+def normalize(value):
+    """Lowercase, accent-free, single-spaced form of a label."""
+    value = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', value).strip().lower()
+
+
+def parse_integer(raw, minimum=0, maximum=MAX_INTEGER):
+    """
+    Whole number of a cell ("12", "12.0", "12,0": XLSX cells hold floats)
+    between `minimum` and `maximum`. Raises ValueError (also for nan / inf).
+    """
+    number = float(str(raw).replace(',', '.'))
+    if not math.isfinite(number) or number != int(number) or not minimum <= number <= maximum:
+        raise ValueError(f'Invalid integer: {raw}')
+    return int(number)
+
+
+def _column_key(header):
+    return normalize(header).replace(' ', '_').replace('-', '_')
+
+
+def _csv_rows(uploaded_file):
+    stream = codecs.getreader('utf-8-sig')(uploaded_file, errors='replace')
+    first_line = stream.readline()
+    delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
+    yield from csv.reader(_prepend(first_line, stream), delimiter=delimiter)
+
+
+def _prepend(first_line, stream):
+    yield first_line
+    yield from stream
+
+
+def _xlsx_rows(uploaded_file):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError('Import XLSX indisponible (openpyxl non installé). Utilisez un fichier CSV.')
+    try:
+        workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f'Fichier XLSX illisible : {e}')
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(uploaded_file, columns, required, max_rows):
+    """
+    Yield (line number, {column: value}) for each non-empty data row of a CSV or XLSX upload.
+
+    `columns` maps each column to its accepted (normalized) titles; `required`
+    lists (alternative columns, error message) pairs checked on the header.
+    Raises ImportFileError.
+    """
+    name = (uploaded_file.name or '').lower()
+    is_xlsx = name.endswith('.xlsx') or getattr(uploaded_file, 'content_type', None) in XLSX_CONTENT_TYPES
+    rows = _xlsx_rows(uploaded_file) if is_xlsx else _csv_rows(uploaded_file)
+
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError('Fichier vide')
+    positions = {}
+    for position, title in enumerate(header):
+        key = _column_key(title)
+        for column, aliases in columns.items():
+            if key in aliases and column not in positions:
+                positions[column] = position
+    for alternatives, message in required:
+        if not any(column in positions for column in alternatives):
+            raise ImportFileError(message)
+
+    count = 0
+    for line_number, row in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in row):
+            continue
+        count += 1
+        if count > max_rows:
+            raise ImportFileError(f'Fichier trop volumineux (maximum {max_rows} lignes)')
+        yield line_number, {
+            column: str(row[position]).strip() if position < len(row) else ''
+            for column, position in positions.items()
+        }
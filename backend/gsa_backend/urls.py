@@ -7,14 +7,17 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from gsa_backend.metrics import metrics_view
+from gsa_backend.pdf import probe
 
 def health_check(request):
-    """Simple health check endpoint."""
-    return JsonResponse({'status': 'ok'})
+    """Simple health check endpoint; also reports whether PDF rendering is available."""
+    return JsonResponse({'status': 'ok', 'pdf': probe()['available']})
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/health/', health_check, name='health'),
+    path('metrics', metrics_view, name='metrics'),
     path('api/auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/users/', include('apps.users.urls')),
@@ -1,6 +1,13 @@
 """
 Gunicorn configuration for production deployment.
 Optimized for VPS Hetzner CX33 (4 vCPU, 8GB RAM)
+
+Worker models (GUNICORN_WORKER_CLASS):
+- gthread (default): each process serves GUNICORN_THREADS requests at once,
+  so a PDF render only blocks one thread instead of a whole worker.
+- sync: one request per process (previous behaviour).
+- uvicorn.workers.UvicornWorker: ASGI path, requires uvicorn and
+  GUNICORN_APP=gsa_backend.asgi:application.
 """
 import multiprocessing
 import os
@@ -9,9 +16,18 @@ import os
 bind = "0.0.0.0:8000"
 backlog = 2048
 
+# Application (WSGI by default, gsa_backend.asgi:application for uvicorn workers)
+wsgi_app = os.getenv('GUNICORN_APP', 'gsa_backend.wsgi:application')
+
 # Worker processes
-workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
-worker_class = "sync"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'sync':
+    workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+else:
+    # Threads/event loop handle concurrency: fewer processes for the same memory
+    workers = int(os.getenv('GUNICORN_WORKERS', max(2, multiprocessing.cpu_count() // 2)))
+# gunicorn runs "sync" with threads > 1 as gthread: keep sync single-threaded by default
+threads = int(os.getenv('GUNICORN_THREADS', 1 if worker_class == 'sync' else 4))
 worker_connections = 1000
 timeout = 120  # Important pour génération PDF avec WeasyPrint
 keepalive = 5
@@ -26,6 +42,12 @@ errorlog = "-"   # Log to stderr
 loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
 
+# Prometheus multiprocess mode: drop the live samples of exited workers
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
 # Process naming
 proc_name = 'gsa_backend'
 
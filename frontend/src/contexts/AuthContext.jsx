@@ -78,11 +78,19 @@ export const AuthProvider = ({ children }) => {
     setUser(null)
   }
 
+  // Permissions résolues côté serveur (rôle + surcharges), renvoyées par /users/me/
+  const hasPermission = useCallback(
+    (permission) => !!user?.permissions?.[permission],
+    [user]
+  )
+
   const value = {
     user,
     loading,
     login,
     logout,
+    fetchUser,
+    hasPermission,
     isAuthenticated: !!token,
   }
 
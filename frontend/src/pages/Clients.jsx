@@ -824,12 +824,10 @@ export default function Clients() {
                 <DataTable
                   columns={[
                     {
-                      id: 'product_detail',
+                      id: 'product_nom',
                       label: 'Produit',
-                      format: (value) =>
-                        value
-                          ? `${value.nom} (${value.unite_vente_display || value.unite_vente || 'N/A'})`
-                          : '-',
+                      format: (value, row) =>
+                        value ? `${value} (${row.product_unite_vente_display || 'N/A'})` : '-',
                     },
                     { id: 'prix', label: 'Prix', type: 'currency', align: 'right' },
                   ]}
@@ -280,6 +280,13 @@ export default function Containers() {
     },
     { id: 'total_qty_prevue', label: 'Qté prévue', align: 'right' },
     { id: 'total_qty_recue', label: 'Qté reçue', align: 'right' },
+    { id: 'total_casse', label: 'Casse', align: 'right' },
+    {
+      id: 'ecart_qty',
+      label: 'Écart',
+      align: 'right',
+      format: (value) => (value > 0 ? `+${value}` : value ?? 0),
+    },
   ]
 
   return (
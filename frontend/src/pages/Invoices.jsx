@@ -51,7 +51,7 @@ import ConfirmDialog from '../components/ConfirmDialog'
 import { formatDate, formatCurrency, formatInvoiceStatus } from '../utils/formatters'
 
 export default function Invoices() {
-  const { user } = useAuth()
+  const { user, hasPermission } = useAuth()
   const { showSuccess, showError } = useToast()
   const [invoices, setInvoices] = useState([])
   const [clients, setClients] = useState([])
@@ -96,6 +96,8 @@ export default function Invoices() {
   const canEdit =
     user?.role !== 'LECTURE' &&
     (user?.role === 'COMMERCIAL' || user?.role === 'ADMIN_GSA' || user?.role === 'SUPER_ADMIN')
+  const canCreate = hasPermission('can_create_invoices')
+  const canValidate = hasPermission('can_validate_invoices')
 
   const fetchInvoices = useCallback(async () => {
     try {
@@ -422,9 +424,9 @@ export default function Invoices() {
   const columns = [
     { id: 'numero', label: 'Numéro' },
     {
-      id: 'client_detail',
+      id: 'client_nom',
       label: 'Client',
-      format: (value) => value?.nom_complet || value?.nom || '-',
+      format: (value) => value || '-',
     },
     {
       id: 'statut',
@@ -462,7 +464,7 @@ export default function Invoices() {
             title="Factures"
             subtitle="Gestion des factures et paiements"
             actions={
-              canEdit && (
+              canCreate && (
                 <Button
                   variant="contained"
                   startIcon={<Add />}
@@ -508,14 +510,14 @@ export default function Invoices() {
             }}
             emptyMessage="Aucune facture trouvée"
             emptyActionLabel="Créer une facture"
-            onEmptyAction={canEdit ? handleCreate : undefined}
+            onEmptyAction={canCreate ? handleCreate : undefined}
           />
         </>
       ) : (
         <Box>
           <PageHeader
             title={`Facture ${selectedInvoice.numero || `#${selectedInvoice.id}`}`}
-            subtitle={`Client: ${selectedInvoice.client_detail?.nom_complet || selectedInvoice.client_detail?.nom || '-'}`}
+            subtitle={`Client: ${selectedInvoice.client_detail?.nom_complet || selectedInvoice.client_nom || '-'}`}
             actions={
               <Box display="flex" gap={1}>
                 {selectedInvoice.statut === 'VALIDEE' && (
@@ -529,21 +531,23 @@ export default function Invoices() {
                 )}
                 {canEdit && selectedInvoice.statut === 'BROUILLON' && (
                   <>
-                    <Button
-                      variant="contained"
-                      color="success"
-                      startIcon={validating ? <CheckCircle /> : <CheckCircle />}
-                      onClick={handleValidate}
-                      disabled={validating}
-                      sx={{
-                        bgcolor: '#10b981',
-                        '&:hover': {
-                          bgcolor: '#059669',
-                        },
-                      }}
-                    >
-                      {validating ? 'Validation...' : 'Valider'}
-                    </Button>
+                    {canValidate && (
+                      <Button
+                        variant="contained"
+                        color="success"
+                        startIcon={validating ? <CheckCircle /> : <CheckCircle />}
+                        onClick={handleValidate}
+                        disabled={validating}
+                        sx={{
+                          bgcolor: '#10b981',
+                          '&:hover': {
+                            bgcolor: '#059669',
+                          },
+                        }}
+                      >
+                        {validating ? 'Validation...' : 'Valider'}
+                      </Button>
+                    )}
                     <Button
                       variant="outlined"
                       color="error"
@@ -731,7 +735,7 @@ export default function Invoices() {
                     </Typography>
                     <Typography variant="body1" sx={{ fontWeight: 500 }}>
                       {selectedInvoice.client_detail?.nom_complet ||
-                        selectedInvoice.client_detail?.nom ||
+                        selectedInvoice.client_nom ||
                         '-'}
                     </Typography>
                   </Grid>
@@ -314,10 +314,10 @@ export default function Purchases() {
   const columns = [
     { id: 'reference', label: 'Référence', minWidth: 150 },
     {
-      id: 'fournisseur_detail',
+      id: 'fournisseur_nom',
       label: 'Fournisseur',
       minWidth: 200,
-      format: (value) => value ? (value.entreprise || value.nom_complet) : '-',
+      format: (value) => value || '-',
     },
     {
       id: 'date_achat',
@@ -488,7 +488,7 @@ export default function Purchases() {
                   />
                   <TextField
                     label="Fournisseur"
-                    value={selectedPurchase.fournisseur_detail ? (selectedPurchase.fournisseur_detail.entreprise || selectedPurchase.fournisseur_detail.nom_complet) : (selectedPurchase.fournisseur || '')}
+                    value={selectedPurchase.fournisseur_nom || selectedPurchase.fournisseur || ''}
                     disabled
                     fullWidth
                   />
@@ -241,9 +241,9 @@ export default function Stock() {
 
   const movementColumns = [
     {
-      id: 'product_detail',
+      id: 'product_nom',
       label: 'Produit',
-      format: (value) => value?.nom || '-',
+      format: (value) => value || '-',
     },
     {
       id: 'type',
@@ -6,6 +6,9 @@ import axios from 'axios'
 // Get base URL from environment variable (production) or use relative path (development)
 const baseURL = import.meta.env.VITE_API_URL || '/api'
 
+// Retries of a request answered 503 + Retry-After (PDF generation busy)
+const MAX_BUSY_RETRIES = 3
+
 // Create axios instance
 const api = axios.create({
   baseURL: baseURL,
@@ -63,6 +66,14 @@ api.interceptors.response.use(
       }
     }
 
+    // Handle 503 with Retry-After - document generation slots busy, retry after the delay
+    const retryAfter = Number(error.response?.headers?.['retry-after'])
+    if (error.response?.status === 503 && retryAfter > 0 && (originalRequest._busyRetries || 0) < MAX_BUSY_RETRIES) {
+      originalRequest._busyRetries = (originalRequest._busyRetries || 0) + 1
+      await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+      return api(originalRequest)
+    }
+
     // Handle 403 Forbidden - permission denied
     if (error.response?.status === 403) {
       const errorMessage =